@@ -1,25 +1,51 @@
 """FastAPI version for Vercel deployment."""
-from fastapi import FastAPI, Query, HTTPException
+from fastapi import FastAPI, Query, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List, Union
 import os
+import time
+from contextlib import asynccontextmanager
 
-from models import get_db
+from database import get_database
 from search import (
     search_doelzinnen,
+    search_doelzinnen_batch,
     search_uitwerkingen, 
-    search_combined,
-    get_doelzin_with_uitwerkingen
+    get_doelzin_with_uitwerkingen,
+    get_doelzinnen_with_uitwerkingen
 )
-from rerank import rerank_results
-from qb_cosine import enhance_with_qb_cosine
+from related import get_related
+from suggest import get_suggester, record_query, MAX_LIMIT as SUGGEST_MAX_LIMIT
+from querylog import log_search
+from pipeline import run_search, stream_search
+from paging import search_page
 from config import config
+from http_cache import check_etag, skip_caching
+from corpus import get_stats
+from embedding_versions import get_active, list_versions
+from responses import ORJSONResponse, dumps, json_response, parse_fields, select_fields
+from timing import begin_request, end_request, server_timing, observe_request, render_metrics
+from profiling import requested_token, start_profile, finish_profile
+from filters import Filters, parse_filters, filter_key
+from budget import Budget
+import warmup
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start warming up in the background; the DB connects lazily on first use."""
+    warmup.start()
+    yield
+
 
 app = FastAPI(
     title="SLO Curriculum Search API",
     version="0.1.0",
-    description="Semantic search over Dutch curriculum data"
+    description="Semantic search over Dutch curriculum data",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # CORS
@@ -31,37 +57,78 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize DB once at startup
-db = None
-
-def init_db():
-    """Initialize database schema once with auto-recovery for orphaned .table files."""
-    global db
-    import psycopg2.errors
+@app.middleware("http")
+async def add_server_timing(request: Request, call_next):
+    """Collect per-stage timings for the Server-Timing header; profile when asked to."""
+    profile = None
+    if config.PROFILE_TOKEN and requested_token(request):
+        try:
+            profile = start_profile(request)
+        except PermissionError as e:
+            return ORJSONResponse({"detail": str(e)}, status_code=403)
+        except ValueError as e:
+            return ORJSONResponse({"detail": str(e)}, status_code=400)
     
+    token = begin_request(profile)
+    start = time.perf_counter()
     try:
-        db = get_db()
-    except psycopg2.errors.DuplicateTable:
-        # Tables exist but .table files were deleted - use fake_migrate to recreate them
-        print("⚠️  Detected orphaned .table files. Running fake_migrate to recover...")
-        db = get_db(fake_migrate=True)
-        print("✅ Database schema recovered successfully")
+        response = await call_next(request)
+        if profile:
+            return await finish_profile(profile, request, response, start)
+        response.headers['Server-Timing'] = server_timing()
+        # Label by route template (/api/doelzin/{doelzin_id}), not by raw path
+        route = request.scope.get('route')
+        observe_request(
+            request.method,
+            route.path if route else 'unmatched',
+            response.status_code,
+            time.perf_counter() - start
+        )
+        return response
+    finally:
+        if profile:
+            profile.stop()
+        end_request(token)
 
-def get_database():
-    """Get database connection - assumes db already initialized."""
-    if db is None:
-        raise RuntimeError("Database not initialized. Call init_db() first.")
-    return db
 
-# Startup: initialize database
-init_db()
+class SearchFilters(BaseModel):
+    # Each filter is a list or a comma-separated string of accepted values
+    prefix: Optional[Union[str, List[str]]] = None
+    soort: Optional[Union[str, List[str]]] = None
+    status: Optional[Union[str, List[str]]] = None
+    niveau_ids: Optional[Union[str, List[str]]] = None
 
 
-class SearchRequest(BaseModel):
+class SearchRequest(SearchFilters):
     query: str
     limit: Optional[int] = 100  # High enough to capture all relevant results
     threshold: Optional[float] = 0.6  # Filter to fair+ quality
     weight: Optional[float] = 0.7
+    page_size: Optional[int] = None  # Paginated search (see /api/search)
+    cursor: Optional[str] = None
+    budget_ms: Optional[float] = None  # Latency budget (default SEARCH_BUDGET_MS, 0 = none)
+
+
+class BatchSearchRequest(SearchFilters):
+    queries: List[str]
+    limit: Optional[int] = 10
+    threshold: Optional[float] = 0.0
+    view: Optional[str] = 'full'
+    fields: Optional[str] = None
+
+
+def request_filters(body: Optional[SearchFilters], prefix=None, soort=None, status=None, niveau_ids=None) -> Filters:
+    """Filters from the JSON body when there is one, else from the query string."""
+    if body:
+        prefix, soort, status, niveau_ids = body.prefix, body.soort, body.status, body.niveau_ids
+    return parse_filters(prefix=prefix, soort=soort, status=status, niveau_ids=niveau_ids)
+
+
+def request_budget(body: Optional[SearchRequest], budget_ms: Optional[float]) -> Budget:
+    """Latency budget from the body or query string, else SEARCH_BUDGET_MS."""
+    if body and body.budget_ms is not None:
+        budget_ms = body.budget_ms
+    return Budget(config.SEARCH_BUDGET_MS if budget_ms is None else budget_ms)
 
 
 @app.get("/")
@@ -72,10 +139,19 @@ def root():
         "version": "0.1.0",
         "endpoints": {
             "/api/search": "Combined search (GET/POST)",
+            "/api/search/stream": "Combined search, streamed progressively (NDJSON/SSE)",
             "/api/search/doelzinnen": "Search doelzinnen only",
+            "/api/search/doelzinnen/batch": "Search doelzinnen for many queries (POST)",
             "/api/search/uitwerkingen": "Search uitwerkingen only",
+            "/api/suggest?q=": "Typeahead suggestions (no embedding call)",
             "/api/doelzin/{id}": "Get full doelzin",
-            "/api/stats": "Database statistics"
+            "/api/doelzin/{id}/related": "Most similar doelzinnen (precomputed)",
+            "/api/doelzinnen?ids=1,2,3": "Get many full doelzinnen at once",
+            "/api/stats": "Database statistics",
+            "/api/embedding-versions": "Embedding versions with backfill progress",
+            "/metrics": "Prometheus metrics",
+            "/healthz": "Liveness",
+            "/readyz": "Readiness (database connected, clients and index warm)"
         },
         "docs": "/docs"
     }
@@ -84,63 +160,225 @@ def root():
 @app.get("/api/search")
 @app.post("/api/search")
 def api_search(
+    request: Request,
+    response: Response,
     q: Optional[str] = Query(None),
     query: Optional[str] = None,
     limit: int = Query(100),
     threshold: float = Query(0.6),
     weight: float = Query(0.7),
     rerank: bool = Query(True, description="Use LLM re-ranking for better results"),
+    view: str = Query('full', description="compact drops uitwerking texts and intermediate scores"),
+    fields: Optional[str] = Query(None, description="Comma-separated result fields to return"),
+    prefix: Optional[str] = Query(None, description="Comma-separated prefixes to include"),
+    soort: Optional[str] = Query(None, description="Comma-separated soorten to include"),
+    status: Optional[str] = Query(None, description="Comma-separated statuses to include"),
+    niveau_ids: Optional[str] = Query(None, description="Comma-separated niveau ids (of linked uitwerkingen)"),
+    page_size: Optional[int] = Query(None, ge=1, description="Return one page of this size, with a next_cursor"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    budget_ms: Optional[float] = Query(None, ge=0, description="Latency budget in ms (0 = none); stages degrade to meet it"),
     body: Optional[SearchRequest] = None
 ):
-    """Combined search across doelzinnen and uitwerkingen."""
+    """Combined search across doelzinnen and uitwerkingen.
+    
+    With page_size (or a cursor) the results come one page at a time: the
+    first page ranks and caches all `limit` candidates, later pages slice
+    that set, and only the results on a page are reranked. The paged search
+    applies the threshold to the vector + qb_cosine scores, before the LLM
+    rerank; without paging it applies to the reranked scores. The two can
+    therefore return different results for the same query. An altered cursor,
+    or one from before the last ingest, is rejected with a 400.
+    
+    The search runs within a latency budget: when it runs low, rerank is
+    truncated or skipped and qb_cosine is skipped, as listed in
+    `degradations`. If the query cannot even be embedded in time: 504.
+    """
+    budget = request_budget(body, budget_ms)
     db = get_database()
     
     # Handle both query params and JSON body
     search_query = q or (body.query if body else None) or query
-    if not search_query:
+    search_cursor = (body.cursor if body else None) or cursor
+    if not search_query and not search_cursor:
         raise HTTPException(400, "Missing query parameter")
+    if not search_cursor:
+        record_query(search_query)
     
     search_limit = body.limit if body else limit
     search_threshold = body.threshold if body else threshold
     search_weight = body.weight if body else weight
+    search_filters = request_filters(body, prefix, soort, status, niveau_ids)
+    search_page_size = (body.page_size if body else None) or page_size
+    if search_page_size is not None and search_page_size < 1:
+        raise HTTPException(400, "page_size must be at least 1")
+    keep = parse_fields(view, fields)
     
-    results = search_combined(
-        db, 
-        search_query, 
-        limit=search_limit,
-        threshold=search_threshold,
-        doelzin_weight=search_weight
+    if search_page_size or search_cursor:
+        not_modified = check_etag(
+            request, response, db,
+            'search/page', search_query, search_limit, search_threshold, search_weight, rerank, keep,
+            filter_key(search_filters), search_page_size, search_cursor, budget.ms
+        )
+        if not_modified:
+            return not_modified
+        
+        try:
+            payload = search_page(
+                db,
+                search_query,
+                limit=search_limit,
+                threshold=search_threshold,
+                weight=search_weight,
+                rerank=rerank,
+                filters=search_filters,
+                page_size=search_page_size or 10,
+                cursor=search_cursor,
+                budget=budget
+            )
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        except TimeoutError as e:
+            raise HTTPException(504, str(e))
+        if not search_cursor:
+            log_search('search/page', search_query, {
+                'limit': search_limit,
+                'threshold': search_threshold,
+                'weight': search_weight,
+                'rerank': rerank,
+                'filters': search_filters,
+                'page_size': search_page_size or 10,
+            }, payload['total'], payload['degradations'])
+        if payload['degradations']:
+            skip_caching(response)
+        payload['results'] = select_fields(payload['results'], keep)
+        return json_response(payload, response)
+    
+    not_modified = check_etag(
+        request, response, db,
+        'search', search_query, search_limit, search_threshold, search_weight, rerank, keep,
+        filter_key(search_filters), budget.ms
     )
+    if not_modified:
+        return not_modified
     
-    # Optional LLM re-ranking
-    if rerank:
-        results = rerank_results(search_query, results, limit=search_limit)
+    try:
+        payload = run_search(
+            db,
+            search_query,
+            limit=search_limit,
+            threshold=search_threshold,
+            weight=search_weight,
+            rerank=rerank,
+            filters=search_filters,
+            budget=budget
+        )
+    except TimeoutError as e:
+        raise HTTPException(504, str(e))
+    log_search('search', search_query, {
+        'limit': search_limit,
+        'threshold': search_threshold,
+        'weight': search_weight,
+        'rerank': rerank,
+        'filters': search_filters,
+    }, payload['count'], payload['degradations'])
+    if payload['degradations']:
+        skip_caching(response)
+    payload['results'] = select_fields(payload['results'], keep)
     
-    # Apply query-boosted cosine for hybrid semantic + lexical search
-    results = enhance_with_qb_cosine(search_query, results)
+    return json_response(payload, response)
+
+
+@app.get("/api/search/stream")
+@app.post("/api/search/stream")
+def api_search_stream(
+    request: Request,
+    q: Optional[str] = Query(None),
+    query: Optional[str] = None,
+    limit: int = Query(100),
+    threshold: float = Query(0.6),
+    weight: float = Query(0.7),
+    rerank: bool = Query(True, description="Use LLM re-ranking for better results"),
+    format: Optional[str] = Query(None, description="ndjson (default) or sse"),
+    view: str = Query('full', description="compact drops uitwerking texts and intermediate scores"),
+    fields: Optional[str] = Query(None, description="Comma-separated result fields to return"),
+    prefix: Optional[str] = Query(None, description="Comma-separated prefixes to include"),
+    soort: Optional[str] = Query(None, description="Comma-separated soorten to include"),
+    status: Optional[str] = Query(None, description="Comma-separated statuses to include"),
+    niveau_ids: Optional[str] = Query(None, description="Comma-separated niveau ids (of linked uitwerkingen)"),
+    budget_ms: Optional[float] = Query(None, ge=0, description="Latency budget in ms (0 = none); stages degrade to meet it"),
+    body: Optional[SearchRequest] = None
+):
+    """Combined search that streams the vector ranking first, then rerank progress.
     
-    # Apply threshold filtering after all enhancements
-    results = [r for r in results if r['similarity'] >= search_threshold]
+    Emits `results`, `rerank` (one per LLM score) and `final` events as
+    newline-delimited JSON, or as Server-Sent Events when requested with
+    `format=sse` or `Accept: text/event-stream`. Retrieval finishes before
+    the stream starts: if the query cannot be embedded in time: 504.
+    """
+    budget = request_budget(body, budget_ms)
+    db = get_database()
     
-    # Limit results
-    results = results[:search_limit]
+    search_query = q or (body.query if body else None) or query
+    if not search_query:
+        raise HTTPException(400, "Missing query parameter")
+    record_query(search_query)
     
-    return {
-        "query": search_query,
-        "count": len(results),
-        "results": results,
-        "reranked": rerank,
-        "enhanced": True
+    keep = parse_fields(view, fields)
+    params = {
+        'limit': body.limit if body else limit,
+        'threshold': body.threshold if body else threshold,
+        'weight': body.weight if body else weight,
+        'rerank': rerank,
+        'filters': request_filters(body, prefix, soort, status, niveau_ids),
     }
+    try:
+        # Retrieval runs here, so a timeout is still a 504 rather than a cut-off stream
+        events = stream_search(db, search_query, budget=budget, **params)
+    except TimeoutError as e:
+        raise HTTPException(504, str(e))
+    
+    def encode(event):
+        if event['event'] == 'final':
+            log_search('search/stream', search_query, params, len(event['results']), event['degradations'])
+        if 'results' in event:
+            event['results'] = select_fields(event['results'], keep)
+        return dumps(event)
+    
+    sse = format == 'sse' or (
+        format is None and 'text/event-stream' in request.headers.get('accept', '')
+    )
+    if sse:
+        media_type = "text/event-stream"
+        lines = (
+            b"event: " + event['event'].encode() + b"\ndata: " + encode(event) + b"\n\n"
+            for event in events
+        )
+    else:
+        media_type = "application/x-ndjson"
+        lines = (encode(event) + b"\n" for event in events)
+    
+    return StreamingResponse(
+        lines,
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @app.get("/api/search/doelzinnen")
 @app.post("/api/search/doelzinnen")
 def api_search_doelzinnen(
+    request: Request,
+    response: Response,
     q: Optional[str] = Query(None),
     query: Optional[str] = None,
     limit: int = Query(10),
     threshold: float = Query(0.0),
+    view: str = Query('full', description="compact drops uitwerking texts and intermediate scores"),
+    fields: Optional[str] = Query(None, description="Comma-separated result fields to return"),
+    prefix: Optional[str] = Query(None, description="Comma-separated prefixes to include"),
+    soort: Optional[str] = Query(None, description="Comma-separated soorten to include"),
+    status: Optional[str] = Query(None, description="Comma-separated statuses to include"),
+    niveau_ids: Optional[str] = Query(None, description="Comma-separated niveau ids (of linked uitwerkingen)"),
     body: Optional[SearchRequest] = None
 ):
     """Search doelzinnen by lesson description."""
@@ -152,78 +390,242 @@ def api_search_doelzinnen(
     
     search_limit = body.limit if body else limit
     search_threshold = body.threshold if body else threshold
+    search_filters = request_filters(body, prefix, soort, status, niveau_ids)
+    keep = parse_fields(view, fields)
+    
+    not_modified = check_etag(
+        request, response, db,
+        'search/doelzinnen', search_query, search_limit, search_threshold, keep, filter_key(search_filters)
+    )
+    if not_modified:
+        return not_modified
     
     results = search_doelzinnen(
         db,
         search_query,
         limit=search_limit,
-        threshold=search_threshold
+        threshold=search_threshold,
+        filters=search_filters
     )
     
-    return {
+    return json_response({
         "query": search_query,
         "count": len(results),
-        "results": results
-    }
+        "results": select_fields(results, keep)
+    }, response)
+
+
+@app.post("/api/search/doelzinnen/batch")
+def api_search_doelzinnen_batch(body: BatchSearchRequest):
+    """Search doelzinnen for many lesson descriptions in one request."""
+    db = get_database()
+    
+    queries = [query for query in body.queries if query and query.strip()]
+    if not queries:
+        raise HTTPException(400, "Missing queries")
+    if len(queries) > config.BATCH_MAX_QUERIES:
+        raise HTTPException(400, f"At most {config.BATCH_MAX_QUERIES} queries per request")
+    keep = parse_fields(body.view, body.fields)
+    
+    results = search_doelzinnen_batch(
+        db,
+        queries,
+        limit=body.limit,
+        threshold=body.threshold,
+        filters=request_filters(body)
+    )
+    
+    return json_response({
+        "count": len(queries),
+        "results": [
+            {
+                "query": query,
+                "count": len(query_results),
+                "results": select_fields(query_results, keep)
+            }
+            for query, query_results in zip(queries, results)
+        ]
+    })
 
 
 @app.get("/api/search/uitwerkingen")
 def api_search_uitwerkingen(
+    request: Request,
+    response: Response,
     q: str = Query(...),
     limit: int = Query(10),
-    threshold: float = Query(0.0)
+    threshold: float = Query(0.0),
+    view: str = Query('full', description="compact drops uitwerking texts and intermediate scores"),
+    fields: Optional[str] = Query(None, description="Comma-separated result fields to return"),
+    prefix: Optional[str] = Query(None, description="Comma-separated prefixes to include"),
+    status: Optional[str] = Query(None, description="Comma-separated statuses to include"),
+    niveau_ids: Optional[str] = Query(None, description="Comma-separated niveau ids to include")
 ):
     """Search uitwerkingen by description."""
     db = get_database()
     
+    keep = parse_fields(view, fields)
+    search_filters = parse_filters(prefix=prefix, status=status, niveau_ids=niveau_ids)
+    not_modified = check_etag(
+        request, response, db, 'search/uitwerkingen', q, limit, threshold, keep, filter_key(search_filters)
+    )
+    if not_modified:
+        return not_modified
+    
     results = search_uitwerkingen(
         db,
         q,
         limit=limit,
-        threshold=threshold
+        threshold=threshold,
+        filters=search_filters
     )
     
-    return {
+    return json_response({
         "query": q,
         "count": len(results),
-        "results": results
+        "results": select_fields(results, keep)
+    }, response)
+
+
+@app.get("/api/suggest")
+def api_suggest(
+    q: str = Query(..., min_length=1, description="Text typed so far"),
+    limit: int = Query(10, ge=1, le=SUGGEST_MAX_LIMIT)
+):
+    """Typeahead suggestions: popular queries, titles, prefixes and terms starting with q.
+    
+    Served from an in-memory sorted array; no embedding call.
+    """
+    suggester = get_suggester(get_database())
+    return {
+        "q": q,
+        "suggestions": suggester.suggest(q, limit)
     }
 
 
 @app.get("/api/doelzin/{doelzin_id}")
-def api_get_doelzin(doelzin_id: int):
+def api_get_doelzin(doelzin_id: int, request: Request, response: Response):
     """Get full doelzin with linked uitwerkingen."""
     db = get_database()
     
+    not_modified = check_etag(request, response, db, 'doelzin', doelzin_id)
+    if not_modified:
+        return not_modified
+    
     result = get_doelzin_with_uitwerkingen(db, doelzin_id)
     if not result:
         raise HTTPException(404, "Doelzin not found")
     
-    return result
+    return json_response(result, response)
+
+
+@app.get("/api/doelzin/{doelzin_id}/related")
+def api_get_related(
+    doelzin_id: int,
+    request: Request,
+    response: Response,
+    limit: int = Query(10, ge=1, description="Number of related doelzinnen (at most RELATED_K)"),
+    view: str = Query("full", description="full or compact"),
+    fields: Optional[str] = Query(None, description="Comma-separated result fields")
+):
+    """Most similar doelzinnen, from the graph computed at ingest (no embedding or LLM call)."""
+    db = get_database()
+    keep = parse_fields(view, fields)
+    
+    not_modified = check_etag(request, response, db, 'related', doelzin_id, limit, keep)
+    if not_modified:
+        return not_modified
+    
+    results = get_related(db, doelzin_id, limit)
+    if results is None:
+        raise HTTPException(404, "Doelzin not found")
+    
+    return json_response({
+        "id": doelzin_id,
+        "count": len(results),
+        "results": select_fields(results, keep)
+    }, response)
+
+
+@app.get("/api/doelzinnen")
+def api_get_doelzinnen(
+    request: Request,
+    response: Response,
+    ids: str = Query(..., description="Comma-separated doelzin ids")
+):
+    """Get many doelzinnen with linked uitwerkingen (two queries in total)."""
+    db = get_database()
+    
+    try:
+        doelzin_ids = [int(part) for part in ids.split(',') if part.strip()]
+    except ValueError:
+        raise HTTPException(400, "ids must be a comma-separated list of integers")
+    if not doelzin_ids:
+        raise HTTPException(400, "Missing ids parameter")
+    if len(doelzin_ids) > config.BULK_MAX_IDS:
+        raise HTTPException(400, f"At most {config.BULK_MAX_IDS} ids per request")
+    
+    not_modified = check_etag(request, response, db, 'doelzinnen', doelzin_ids)
+    if not_modified:
+        return not_modified
+    
+    results = get_doelzinnen_with_uitwerkingen(db, doelzin_ids)
+    found = {result['id'] for result in results}
+    
+    return json_response({
+        "count": len(results),
+        "results": results,
+        "missing": [doelzin_id for doelzin_id in doelzin_ids if doelzin_id not in found]
+    }, response)
 
 
 @app.get("/api/stats")
-def api_stats():
-    """Get database statistics."""
+def api_stats(
+    request: Request,
+    response: Response,
+    exact: bool = Query(True, description="Use counters recorded at ingest instead of pg_class estimates")
+):
+    """Get database statistics (never scans the content tables)."""
     db = get_database()
     
-    doelzin_count = db(db.doelzin).count()
-    uitwerking_count = db(db.uitwerking).count()
-    doelzin_embedded = db(db.doelzin_embedding).count()
-    uitwerking_embedded = db(db.uitwerking_embedding).count()
+    not_modified = check_etag(request, response, db, 'stats', exact)
+    if not_modified:
+        return not_modified
     
+    return json_response(get_stats(db, exact=exact), response)
+
+
+@app.get("/api/embedding-versions")
+def api_embedding_versions():
+    """Embedding versions with their backfill progress, and the one searches use."""
+    db = get_database()
+    # Not cached: backfill progress changes without a new corpus generation
     return {
-        "doelzinnen": {
-            "total": doelzin_count,
-            "embedded": doelzin_embedded
-        },
-        "uitwerkingen": {
-            "total": uitwerking_count,
-            "embedded": uitwerking_embedded
-        }
+        "active": get_active(db).id,
+        "versions": list_versions(db),
     }
 
 
+@app.get("/healthz", include_in_schema=False)
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz", include_in_schema=False)
+def readyz():
+    """Readiness: warmup has finished, so this worker can take traffic."""
+    ready, detail = warmup.readiness()
+    return ORJSONResponse(detail, status_code=200 if ready else 503)
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus metrics: stage histograms, LLM calls, cache lookups, DB round-trips."""
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
+
 # For local development
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,10 @@
+"""Offline benchmarks for the search service.
+
+Everything here runs without network access or API keys: a deterministic
+hash-based embedder replaces OpenRouter embeddings, a stub client replaces
+the LLM reranker, and a synthetic curriculum stands in for curriculum-fo.
+
+Run from the service directory:
+
+    python -m bench --doelzinnen 10000 --uitwerkingen 40000 --db postgres://...
+"""
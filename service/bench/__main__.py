@@ -0,0 +1,259 @@
+"""Run the offline benchmark suite.
+
+    python -m bench                                   # memory_index, qb_cosine + rerank only
+    python -m bench --db postgres://.../slo_bench     # + ingest and search_combined
+    python -m bench --doelzinnen 100000 --uitwerkingen 400000 --db ... --json out.json
+
+The --db database is wiped and filled with synthetic data: never point it
+at a database you care about.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from bench import fakes
+from bench.runner import measure, format_report, Result
+from bench.synthetic import generate_corpus, generate_queries, write_corpus
+
+BENCHMARKS = ('ingest', 'search_combined', 'memory_index', 'qb_cosine', 'rerank')
+
+
+def prepare_database(db, dimensions: int):
+    """Recreate the pgvector tables (as init-db.sql does) and empty all content."""
+    db.executesql("CREATE EXTENSION IF NOT EXISTS vector")
+    for table, key in (('doelzin_embedding', 'doelzin_id'), ('uitwerking_embedding', 'uitwerking_id')):
+        db.executesql(f"DROP TABLE IF EXISTS {table}")
+        db.executesql(f"""
+            CREATE TABLE {table} (
+                id SERIAL PRIMARY KEY,
+                {key} INTEGER NOT NULL UNIQUE,
+                embedding_model VARCHAR(512) NOT NULL,
+                embedding vector({dimensions}) NOT NULL
+            )
+        """)
+    db.executesql("""
+        TRUNCATE doelzin, uitwerking, doelzin_related, query_log, corpus_stats, embedding_version
+        RESTART IDENTITY
+    """)
+    db.commit()
+
+
+def create_vector_indexes(db):
+    """Build the ivfflat indexes after loading, like a production database."""
+    for table in ('doelzin_embedding', 'uitwerking_embedding'):
+        db.executesql(f"""
+            CREATE INDEX IF NOT EXISTS {table}_vector_idx ON {table}
+            USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100)
+        """)
+    db.executesql("ANALYZE")
+    db.commit()
+
+
+def bench_ingest(db, args) -> Result:
+    """Time a full ingest of the synthetic corpus (one run, it is slow)."""
+    import ingest
+    from corpus import record_ingest
+
+    prepare_database(db, args.dimensions)
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = write_corpus(Path(tmp), args.doelzinnen, args.uitwerkingen, args.seed)
+        start = time.perf_counter()
+        ingest.ingest_doelzinnen(db, data_dir)
+        ingest.ingest_uitwerkingen(db, data_dir)
+        record_ingest(db)
+        elapsed = time.perf_counter() - start
+    create_vector_indexes(db)
+
+    rows = args.doelzinnen + args.uitwerkingen
+    ms = elapsed * 1000
+    return Result(
+        name='ingest', runs=1, p50=ms, p95=ms, p99=ms, mean=ms, peak_kib=0.0,
+        extra={'rows': rows, 'rows_per_second': round(rows / elapsed, 1)}
+    )
+
+
+def synthetic_index(args):
+    """An in-memory CorpusIndex of the synthetic corpus, embedded with hash_vector (no database)."""
+    from embeddings import combine_text_for_embedding
+    from index import CorpusIndex, stack
+
+    doelzinnen, uitwerkingen = generate_corpus(args.doelzinnen, args.uitwerkingen, args.seed)
+    embed = lambda item: fakes.hash_vector(
+        combine_text_for_embedding(item['title'], item['description']), args.dimensions
+    )
+    return CorpusIndex(
+        0,
+        [
+            {'id': i + 1, 'fo_id': d['id'], 'title': d['title'], 'description': d['description'],
+             'prefix': d['prefix'], 'soort': d['soort'], 'uitwerking_ids': d['fo_uitwerking_id'],
+             'status': d['status']}
+            for i, d in enumerate(doelzinnen)
+        ],
+        stack([embed(d) for d in doelzinnen]),
+        [
+            {'id': i + 1, 'fo_id': u['id'], 'title': u['title'], 'description': u['description'],
+             'prefix': u['prefix']}
+            for i, u in enumerate(uitwerkingen)
+        ],
+        stack([embed(u) for u in uitwerkingen]),
+        np.arange(len(uitwerkingen), dtype=np.int64),
+        [{'status': u['status'], 'niveau_ids': u['niveau_id']} for u in uitwerkingen],
+    )
+
+
+def bench_memory_index(args, queries: list) -> list:
+    """search_combined on the in-memory index: float32, then int8 with exact rescoring.
+
+    The int8 run reports its recall@limit against the float32 results and
+    the memory of both representations.
+    """
+    from config import config
+
+    index = synthetic_index(args)
+    vectors = [fakes.hash_vector(query, args.dimensions) for query in queries]
+    search = lambda vector: index.search_combined(vector, limit=args.limit)
+    prepare = lambda i: vectors[i % len(vectors)]
+
+    exact = measure('memory_index float32', search, repeat=args.repeat, warmup=args.warmup, prepare=prepare)
+    exact.extra['bytes'] = index.info()['bytes']
+    truth = [{r['id'] for r in search(vector)} for vector in vectors]
+
+    # Report the recall even when it is below the threshold that would disable int8
+    config.INDEX_MIN_RECALL = 0.0
+    index.quantize()
+    quantized = measure('memory_index int8', search, repeat=args.repeat, warmup=args.warmup, prepare=prepare)
+    found = [{r['id'] for r in search(vector)} for vector in vectors]
+    quantized.extra.update({
+        'bytes': index.info()['bytes'],
+        'oversample': config.INDEX_RESCORE_OVERSAMPLE,
+        f'recall@{args.limit}': round(float(np.mean([
+            len(expected & actual) / len(expected) for expected, actual in zip(truth, found) if expected
+        ])), 4),
+        'load_recall@10': index.recall,
+    })
+    return [exact, quantized]
+
+
+def synthetic_results(args, count: int) -> list:
+    """Search-result dicts (as search_combined returns them) without a database."""
+    doelzinnen, uitwerkingen = generate_corpus(count, count * 4, args.seed)
+    descriptions = {u['id']: u['description'] for u in uitwerkingen}
+    rng = random.Random(args.seed)
+    return [
+        {
+            'id': i + 1,
+            'fo_id': d['id'],
+            'title': d['title'],
+            'description': d['description'],
+            'prefix': d['prefix'],
+            'soort': d['soort'],
+            'doelzin_similarity': rng.random(),
+            'uitwerking_similarity': rng.random(),
+            'similarity': rng.random(),
+            'uitwerking_texts': [descriptions[fo_id] for fo_id in d['fo_uitwerking_id']],
+        }
+        for i, d in enumerate(doelzinnen)
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--doelzinnen', type=int, default=10_000, help='synthetic doelzinnen to ingest')
+    parser.add_argument('--uitwerkingen', type=int, default=40_000, help='synthetic uitwerkingen to ingest')
+    parser.add_argument('--db', default=os.getenv('BENCH_DATABASE_URI'),
+                        help='scratch PostgreSQL+pgvector database (default: $BENCH_DATABASE_URI)')
+    parser.add_argument('--skip-ingest', action='store_true', help='reuse the data already in --db')
+    parser.add_argument('--only', default=','.join(BENCHMARKS), help='comma-separated benchmarks to run')
+    parser.add_argument('--repeat', type=int, default=50, help='timed runs per benchmark')
+    parser.add_argument('--warmup', type=int, default=3, help='untimed runs per benchmark')
+    parser.add_argument('--limit', type=int, default=100, help='results per search / candidates per rerank')
+    parser.add_argument('--dimensions', type=int, default=1536, help='embedding dimensions')
+    parser.add_argument('--llm-latency', type=float, default=0.0, help='simulated LLM latency in seconds')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='also write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    selected = [name.strip() for name in args.only.split(',') if name.strip()]
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    embedder, llm = fakes.install(args.dimensions, args.llm_latency)
+    queries = generate_queries(max(args.repeat, 1), seed=args.seed)
+    results = []
+
+    db = None
+    if {'ingest', 'search_combined'} & set(selected):
+        if not args.db:
+            print("⚠️  No --db given: skipping ingest and search_combined", file=sys.stderr)
+        else:
+            from models import get_db
+            db = get_db(args.db)
+
+    if db is not None and 'ingest' in selected and not args.skip_ingest:
+        results.append(bench_ingest(db, args))
+
+    if db is not None and 'search_combined' in selected:
+        from search import search_combined
+        from config import config
+        # Measure the embedding round trip, not the query-embedding cache
+        config.EMBED_CACHE_SIZE = 0
+        calls_before = embedder.calls
+        result = measure(
+            'search_combined',
+            lambda query: search_combined(db, query, limit=args.limit),
+            repeat=args.repeat, warmup=args.warmup,
+            prepare=lambda i: queries[i % len(queries)]
+        )
+        result.extra['embedding_calls'] = embedder.calls - calls_before
+        results.append(result)
+
+    if 'memory_index' in selected:
+        results.extend(bench_memory_index(args, queries))
+
+    if {'qb_cosine', 'rerank'} & set(selected):
+        candidates = synthetic_results(args, args.limit)
+        copy = lambda i: (queries[i % len(queries)], [dict(r) for r in candidates])
+
+        if 'qb_cosine' in selected:
+            from qb_cosine import enhance_with_qb_cosine
+            results.append(measure(
+                'enhance_with_qb_cosine',
+                lambda arg: enhance_with_qb_cosine(*arg),
+                repeat=args.repeat, warmup=args.warmup, prepare=copy
+            ))
+
+        if 'rerank' in selected:
+            from rerank import rerank_results
+            calls_before = llm.calls
+            result = measure(
+                'rerank_results',
+                lambda arg: rerank_results(*arg, limit=args.limit),
+                repeat=args.repeat, warmup=args.warmup, prepare=copy
+            )
+            result.extra['llm_calls_per_query'] = (llm.calls - calls_before) / (args.repeat + args.warmup + min(10, args.repeat))
+            results.append(result)
+
+    print()
+    print(f"Corpus: {args.doelzinnen} doelzinnen, {args.uitwerkingen} uitwerkingen, "
+          f"{args.dimensions} dimensions, limit {args.limit}")
+    print(format_report(results))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': [r.as_dict() for r in results]}, f, indent=2)
+
+    if db is not None:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,330 @@
+"""Retrieval quality vs. latency for different search configurations.
+
+    python -m bench.evaluate --golden golden.json
+    python -m bench.evaluate --golden golden.json --indexes exact,hnsw --ef-search 40,100 --rerank off,on
+
+golden.json is a list of {"query": "...", "relevant": ["<fo_id>", ...]}, or
+{"query": "...", "relevant": {"<fo_id>": grade, ...}} for graded relevance.
+Every configuration is scored on recall@k, nDCG@k and MRR@k next to its
+latency and LLM calls per query; configurations that no other configuration
+beats on both nDCG and p50 latency are marked as Pareto-optimal.
+
+Retrievers:
+    combined  search_combined (doelzin + uitwerking score, scans all rows)
+    ann       search_doelzinnen through an exact scan, ivfflat or HNSW index
+
+Index variants are built inside a transaction that is rolled back afterwards,
+so the database is left unchanged, but the doelzin embedding table of the
+active embedding version is locked while a variant is evaluated: run this against a staging copy or at a quiet moment.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Dict, List
+import numpy as np
+
+import embeddings
+import rerank
+from config import config
+from bench import fakes
+from bench.metrics import recall_at_k, ndcg_at_k, reciprocal_rank
+
+INDEX_DDL = {
+    'ivfflat': "USING ivfflat (embedding vector_cosine_ops) WITH (lists = {lists})",
+    'hnsw': "USING hnsw (embedding vector_cosine_ops) WITH (m = {m}, ef_construction = {ef_construction})",
+}
+
+
+class CachedEmbeddings:
+    """Embed every golden query once, so each configuration pays the same (zero) embedding cost."""
+
+    def __init__(self, embedder):
+        self.embedder = embedder
+        self.model = getattr(embedder, 'model', None)
+        self.vectors = {}
+
+    def prime(self, texts: List[str], batch_size: int = 100):
+        texts = [t for t in dict.fromkeys(texts) if t not in self.vectors]
+        for i in range(0, len(texts), batch_size):
+            batch = texts[i:i + batch_size]
+            for text, vector in zip(batch, self.embedder.encode(batch, convert_to_numpy=False)):
+                self.vectors[text] = np.array(vector)
+
+    def encode(self, text: str | list[str], convert_to_numpy: bool = True):
+        texts = [text] if isinstance(text, str) else text
+        self.prime(texts)
+        vectors = [self.vectors[t] for t in texts]
+        if convert_to_numpy:
+            return vectors[0] if len(vectors) == 1 else np.array(vectors)
+        return [vector.tolist() for vector in vectors]
+
+
+class CountingLLMClient:
+    """Counts chat-completion calls made through the wrapped client."""
+
+    def __init__(self, client):
+        self.client = client
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, *args, **kwargs):
+        self.calls += 1
+        return self.client.chat.completions.create(*args, **kwargs)
+
+    def with_options(self, **options):
+        """The wrapped client with other options (timeout, retries), still counted here."""
+        client = self.client.with_options(**options)
+
+        def create(*args, **kwargs):
+            self.calls += 1
+            return client.chat.completions.create(*args, **kwargs)
+        return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def load_golden(path: str) -> List[Dict]:
+    """Load golden queries, normalizing 'relevant' to {fo_id: grade}."""
+    with open(path, encoding='utf-8') as f:
+        golden = json.load(f)
+
+    for item in golden:
+        relevant = item.get('relevant', item.get('expected', []))
+        if isinstance(relevant, list):
+            relevant = {fo_id: 1.0 for fo_id in relevant}
+        item['relevant'] = {fo_id: float(grade) for fo_id, grade in relevant.items()}
+    return [item for item in golden if item['relevant']]
+
+
+@contextmanager
+def doelzin_index(db, kind: str, args):
+    """Replace the vector index on the active doelzin embeddings for the duration of the block.
+
+    Everything happens in one transaction that is rolled back on exit, which
+    also restores the original index.
+    """
+    from embedding_versions import get_active
+    table = get_active(db).doelzin_table
+    try:
+        existing = db.executesql("""
+            SELECT indexname FROM pg_indexes
+            WHERE tablename = %(table)s AND indexdef ILIKE '%%vector_cosine_ops%%'
+        """, placeholders={'table': table})
+        for (name,) in existing:
+            db.executesql(f'DROP INDEX "{name}"')
+
+        if kind != 'exact':
+            print(f"🔨 Building {kind} index...", file=sys.stderr)
+            ddl = INDEX_DDL[kind].format(lists=args.lists, m=args.hnsw_m, ef_construction=args.hnsw_ef_construction)
+            db.executesql(f"CREATE INDEX eval_doelzin_embedding_idx ON {table} {ddl}")
+            # Small tables would otherwise be scanned sequentially
+            db.executesql("SET LOCAL enable_seqscan = off")
+        db.executesql(f"ANALYZE {table}")
+        yield
+    finally:
+        db.rollback()
+
+
+def index_variants(args) -> List[tuple]:
+    """(index kind, [SET LOCAL settings per variant]) for the requested ANN indexes."""
+    variants = []
+    for kind in args.indexes:
+        if kind == 'exact':
+            variants.append((kind, [{}]))
+        elif kind == 'ivfflat':
+            variants.append((kind, [{'ivfflat.probes': probes} for probes in args.probes]))
+        elif kind == 'hnsw':
+            variants.append((kind, [{'hnsw.ef_search': ef} for ef in args.ef_search]))
+    return variants
+
+
+def retrieve_ann(db, query: str, candidates: int) -> List[Dict]:
+    """Doelzin-only retrieval through the vector index, shaped like search_combined results."""
+    from search import search_doelzinnen, get_doelzinnen_with_uitwerkingen
+
+    results = search_doelzinnen(db, query, limit=candidates)
+    details = {d['id']: d for d in get_doelzinnen_with_uitwerkingen(db, [r['id'] for r in results])}
+    for result in results:
+        uitwerkingen = details.get(result['id'], {}).get('uitwerkingen', [])
+        result['uitwerking_texts'] = [u['description'] for u in uitwerkingen if u['description']]
+    return results
+
+
+def retrieve_combined(db, query: str, candidates: int, weight: float) -> List[Dict]:
+    from search import search_combined
+    return search_combined(db, query, limit=candidates, doelzin_weight=weight)
+
+
+def run_retrieval(name: str, retrieve, golden: List[Dict], args, llm: CountingLLMClient) -> List[Dict]:
+    """Evaluate one retrieval setup under every rerank / qb_cosine combination."""
+    from qb_cosine import enhance_with_qb_cosine
+
+    retrieve(golden[0]['query'])  # warm up caches and the index
+
+    rows = {}
+    for item in golden:
+        start = time.perf_counter()
+        candidates = retrieve(item['query'])
+        retrieval_ms = (time.perf_counter() - start) * 1000
+
+        for use_rerank in args.rerank:
+            ranked = [dict(r) for r in candidates]
+            calls_before = llm.calls
+            start = time.perf_counter()
+            if use_rerank:
+                ranked = rerank.rerank_results(item['query'], ranked)
+            rerank_ms = (time.perf_counter() - start) * 1000
+            llm_calls = llm.calls - calls_before
+
+            for lexical_weight in args.lexical_weights:
+                final = [dict(r) for r in ranked]
+                start = time.perf_counter()
+                final = enhance_with_qb_cosine(item['query'], final, lexical_weight=lexical_weight)
+                qb_ms = (time.perf_counter() - start) * 1000
+
+                label = f"{name} | {'rerank' if use_rerank else 'no rerank'} | lexical={lexical_weight:g}"
+                row = rows.setdefault(label, {'config': label, 'latencies': [], 'llm_calls': [],
+                                              'recall': [], 'ndcg': [], 'mrr': []})
+                ranking = [r['fo_id'] for r in final]
+                row['latencies'].append(retrieval_ms + rerank_ms + qb_ms)
+                row['llm_calls'].append(llm_calls)
+                row['recall'].append(recall_at_k(ranking, item['relevant'], args.k))
+                row['ndcg'].append(ndcg_at_k(ranking, item['relevant'], args.k))
+                row['mrr'].append(reciprocal_rank(ranking, item['relevant'], args.k))
+
+    return [summarize(row) for row in rows.values()]
+
+
+def summarize(row: Dict) -> Dict:
+    latencies = np.array(row['latencies'])
+    return {
+        'config': row['config'],
+        'queries': len(latencies),
+        'recall': float(np.mean(row['recall'])),
+        'ndcg': float(np.mean(row['ndcg'])),
+        'mrr': float(np.mean(row['mrr'])),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'llm_calls': float(np.mean(row['llm_calls'])),
+    }
+
+
+def mark_pareto(rows: List[Dict]) -> List[Dict]:
+    """Flag rows that no other row beats on both nDCG (higher) and p50 latency (lower)."""
+    for row in rows:
+        row['pareto'] = not any(
+            other['ndcg'] >= row['ndcg'] and other['p50_ms'] <= row['p50_ms']
+            and (other['ndcg'] > row['ndcg'] or other['p50_ms'] < row['p50_ms'])
+            for other in rows
+        )
+    return rows
+
+
+def format_report(rows: List[Dict], k: int) -> str:
+    header = (f"  {'configuration':<52} {f'recall@{k}':>9} {f'nDCG@{k}':>8} {'MRR':>6} "
+              f"{'p50 ms':>9} {'p95 ms':>9} {'LLM/q':>6}")
+    lines = [header, '-' * len(header)]
+    for row in sorted(rows, key=lambda r: (-r['ndcg'], r['p50_ms'])):
+        lines.append(
+            f"{'*' if row['pareto'] else ' '} {row['config']:<52} {row['recall']:>9.3f} {row['ndcg']:>8.3f} "
+            f"{row['mrr']:>6.3f} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['llm_calls']:>6.1f}"
+        )
+    lines.append("* = Pareto-optimal (nDCG vs. p50 latency); latency excludes the query embedding")
+    return '\n'.join(lines)
+
+
+def csv_list(cast):
+    return lambda value: [cast(v.strip()) for v in value.split(',') if v.strip()]
+
+
+def on_off(value: str) -> bool:
+    if value not in ('on', 'off'):
+        raise argparse.ArgumentTypeError("expected 'on' or 'off'")
+    return value == 'on'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench.evaluate', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--golden', required=True, help='golden queries JSON file')
+    parser.add_argument('--db', default=os.getenv('EVAL_DATABASE_URI', config.DATABASE_URI),
+                        help='database with ingested data (default: $EVAL_DATABASE_URI or DATABASE_URI)')
+    parser.add_argument('-k', type=int, default=10, help='cutoff for recall, nDCG and MRR')
+    parser.add_argument('--candidates', type=int, default=20, help='results retrieved before rerank / qb_cosine')
+    parser.add_argument('--retrievers', type=csv_list(str), default=['combined', 'ann'])
+    parser.add_argument('--weights', type=csv_list(float), default=[0.7], help='doelzin weights for combined')
+    parser.add_argument('--indexes', type=csv_list(str), default=['exact', 'ivfflat', 'hnsw'], help='indexes for ann')
+    parser.add_argument('--probes', type=csv_list(int), default=[1, 10], help='ivfflat.probes values')
+    parser.add_argument('--lists', type=int, default=100, help='ivfflat lists')
+    parser.add_argument('--ef-search', type=csv_list(int), default=[40, 100], help='hnsw.ef_search values')
+    parser.add_argument('--hnsw-m', type=int, default=16)
+    parser.add_argument('--hnsw-ef-construction', type=int, default=64)
+    parser.add_argument('--rerank', type=csv_list(on_off), default=[False, True], help='off, on or off,on')
+    parser.add_argument('--lexical-weights', type=csv_list(float), default=[0.1], help='qb_cosine lexical weights')
+    parser.add_argument('--offline', action='store_true',
+                        help='use the hash embedder and stub LLM (for a database filled by python -m bench)')
+    parser.add_argument('--dimensions', type=int, default=1536, help='embedding dimensions with --offline')
+    parser.add_argument('--json', help='also write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    unknown = (set(args.retrievers) - {'combined', 'ann'}) | (set(args.indexes) - {'exact', *INDEX_DDL})
+    if unknown:
+        parser.error(f"unknown retrievers/indexes: {', '.join(sorted(unknown))}")
+
+    golden = load_golden(args.golden)
+    if not golden:
+        parser.error(f"no golden queries with relevant fo_ids in {args.golden}")
+
+    from models import get_db
+    from embedding_versions import get_active
+    db = get_db(args.db)
+    version = get_active(db)
+
+    # Searches embed queries with the active version's model and dimensions: serve those from the cache
+    if args.offline:
+        fakes.install(args.dimensions)
+        embedder = CachedEmbeddings(embeddings._embedder)
+    else:
+        embedder = CachedEmbeddings(embeddings.get_embeddings(version.model, version.dimensions))
+    queries = [item['query'] for item in golden]
+    embedder.prime(queries)
+    embeddings._embedder = embedder
+    embeddings._embedders[(version.model, version.dimensions)] = embedder
+    # Queries are timed one at a time: no batch window to wait for, and no first-query cache miss
+    config.EMBED_BATCH_WINDOW_MS = 0
+    embeddings.prime_query_cache(queries, model=version.model, dimensions=version.dimensions)
+    llm = CountingLLMClient(rerank.get_llm_client())
+    rerank._llm_client = llm
+
+    print(f"📊 Evaluating {len(golden)} golden queries (k={args.k}, {args.candidates} candidates)", file=sys.stderr)
+    rows = []
+    if 'combined' in args.retrievers:
+        for weight in args.weights:
+            rows += run_retrieval(
+                f"combined w={weight:g}",
+                lambda query: retrieve_combined(db, query, args.candidates, weight),
+                golden, args, llm
+            )
+
+    if 'ann' in args.retrievers:
+        for kind, variants in index_variants(args):
+            with doelzin_index(db, kind, args):
+                for settings in variants:
+                    for name, value in settings.items():
+                        db.executesql(f"SET LOCAL {name} = {int(value)}")
+                    label = ' '.join(['ann', kind] + [f"{name.split('.')[1]}={value}" for name, value in settings.items()])
+                    rows += run_retrieval(label, lambda query: retrieve_ann(db, query, args.candidates), golden, args, llm)
+
+    print(format_report(mark_pareto(rows), args.k))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': rows}, f, indent=2)
+
+    db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Deterministic stand-ins for the OpenRouter embedding and LLM clients."""
+import hashlib
+import re
+import time
+from types import SimpleNamespace
+from typing import List
+import numpy as np
+
+import embeddings
+import rerank
+
+# Number of (index, sign) features each token contributes to a vector
+FEATURES_PER_TOKEN = 4
+
+
+def hash_vector(text: str, dimensions: int = 1536) -> np.ndarray:
+    """Embed text by feature hashing its tokens into a unit vector.
+
+    Texts that share words get a high cosine similarity, so rankings behave
+    roughly like a real (lexical) embedding model, and the result is the
+    same on every machine.
+    """
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for token in re.findall(r'\w+', text.lower()):
+        digest = hashlib.blake2b(token.encode('utf-8'), digest_size=4 * FEATURES_PER_TOKEN).digest()
+        for i in range(FEATURES_PER_TOKEN):
+            feature = int.from_bytes(digest[4 * i:4 * i + 4], 'little')
+            sign = 1.0 if feature & 1 else -1.0
+            vector[(feature >> 1) % dimensions] += sign
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        vector[0] = 1.0
+        return vector
+    return vector / norm
+
+
+def stub_score(prompt: str) -> str:
+    """Deterministic 0-10 relevance 'answer' for a rerank prompt."""
+    digest = hashlib.blake2b(prompt.encode('utf-8'), digest_size=2).digest()
+    return str(int.from_bytes(digest, 'little') % 11)
+
+
+class HashEmbeddings:
+    """Drop-in replacement for OpenRouterEmbeddings using hash_vector."""
+
+    def __init__(self, dimensions: int = 1536, model: str = 'bench/hash-embeddings'):
+        self.dimensions = dimensions
+        self.model = model
+        self.calls = 0
+
+    def encode(self, text: str | list[str], convert_to_numpy: bool = True) -> np.ndarray:
+        """Encode text to embeddings (same contract as OpenRouterEmbeddings.encode)."""
+        if isinstance(text, str):
+            text = [text]
+        self.calls += 1
+
+        vectors = [hash_vector(t, self.dimensions) for t in text]
+        if convert_to_numpy:
+            return np.array(vectors[0] if len(vectors) == 1 else vectors)
+        return [vector.tolist() for vector in vectors]
+
+
+class StubLLMClient:
+    """Mimics the streaming chat-completions API used by rerank.score_result.
+
+    The score is derived from a hash of the prompt, so it is deterministic;
+    `latency` (seconds) simulates the time to first token.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def with_options(self, **options):
+        return self
+
+    def create(self, model: str, messages: List[dict], stream: bool = False, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        score = stub_score(messages[-1]['content'])
+        chunk = SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=score))])
+        return iter([chunk])
+
+
+def install(dimensions: int = 1536, llm_latency: float = 0.0) -> tuple:
+    """Replace the embedding and LLM singletons with the offline fakes."""
+    embedder = HashEmbeddings(dimensions)
+    llm = StubLLMClient(llm_latency)
+    embeddings._embedder = embedder
+    rerank._llm_client = llm
+    return embedder, llm
@@ -0,0 +1,30 @@
+"""Ranking quality metrics for golden-query evaluation.
+
+`relevant` maps fo_id → graded relevance (1 for a plain list of expected
+fo_ids); `ranking` is the list of returned fo_ids, best first.
+"""
+import math
+from typing import Dict, List
+
+
+def recall_at_k(ranking: List[str], relevant: Dict[str, float], k: int) -> float:
+    """Fraction of the relevant fo_ids found in the top k."""
+    if not relevant:
+        return 0.0
+    return len(set(ranking[:k]) & relevant.keys()) / len(relevant)
+
+
+def ndcg_at_k(ranking: List[str], relevant: Dict[str, float], k: int) -> float:
+    """Normalized discounted cumulative gain of the top k."""
+    dcg = sum(relevant.get(fo_id, 0.0) / math.log2(rank + 2) for rank, fo_id in enumerate(ranking[:k]))
+    ideal = sorted(relevant.values(), reverse=True)[:k]
+    idcg = sum(gain / math.log2(rank + 2) for rank, gain in enumerate(ideal))
+    return dcg / idcg if idcg > 0 else 0.0
+
+
+def reciprocal_rank(ranking: List[str], relevant: Dict[str, float], k: int) -> float:
+    """1 / rank of the first relevant fo_id in the top k (0 if there is none)."""
+    for rank, fo_id in enumerate(ranking[:k], 1):
+        if fo_id in relevant:
+            return 1.0 / rank
+    return 0.0
@@ -0,0 +1,86 @@
+"""Timing and allocation measurement for microbenchmarks."""
+import time
+import tracemalloc
+from dataclasses import dataclass, field, asdict
+from typing import Callable, List, Optional
+import numpy as np
+
+
+@dataclass
+class Result:
+    """Latency percentiles (ms) and peak extra memory per call (KiB)."""
+    name: str
+    runs: int
+    p50: float
+    p95: float
+    p99: float
+    mean: float
+    peak_kib: float
+    extra: dict = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def measure(
+    name: str,
+    fn: Callable,
+    repeat: int = 50,
+    warmup: int = 3,
+    prepare: Optional[Callable] = None,
+    alloc_runs: int = 10
+) -> Result:
+    """Time `repeat` calls of fn(prepare(i)) and measure allocations separately.
+
+    prepare(i) builds the input for call i outside the timed region (e.g. a
+    fresh copy of data that fn mutates); without it fn gets None.
+    Allocations are measured in a separate pass because tracemalloc slows
+    every allocation down.
+    """
+    prepare = prepare or (lambda i: None)
+
+    for i in range(warmup):
+        fn(prepare(i))
+
+    timings = []
+    for i in range(repeat):
+        arg = prepare(i)
+        start = time.perf_counter()
+        fn(arg)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for i in range(min(alloc_runs, repeat)):
+            arg = prepare(i)
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            fn(arg)
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+
+    timings = np.array(timings)
+    return Result(
+        name=name,
+        runs=repeat,
+        p50=float(np.percentile(timings, 50)),
+        p95=float(np.percentile(timings, 95)),
+        p99=float(np.percentile(timings, 99)),
+        mean=float(timings.mean()),
+        peak_kib=float(np.median(peaks)) / 1024 if peaks else 0.0,
+    )
+
+
+def format_report(results: List[Result]) -> str:
+    """Render results as an aligned text table."""
+    header = f"{'benchmark':<28} {'runs':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'mean ms':>10} {'peak KiB':>10}"
+    lines = [header, '-' * len(header)]
+    for r in results:
+        lines.append(
+            f"{r.name:<28} {r.runs:>6} {r.p50:>10.3f} {r.p95:>10.3f} {r.p99:>10.3f} {r.mean:>10.3f} {r.peak_kib:>10.1f}"
+        )
+        for key, value in r.extra.items():
+            lines.append(f"    {key}: {value}")
+    return '\n'.join(lines)
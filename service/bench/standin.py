@@ -0,0 +1,219 @@
+"""OpenAI-compatible stand-in for OpenRouter, for offline end-to-end benchmarks.
+
+Serves ``/v1/embeddings`` and (streaming) ``/v1/chat/completions`` with the
+same deterministic answers as bench/fakes.py, plus injected latency, errors
+and rate limiting, so concurrency, timeouts and retries of the real API and
+MCP server can be measured without network access or API costs:
+
+    uvicorn bench.standin:app --port 8080
+    OPENROUTER_BASE_URL=http://localhost:8080/v1 uvicorn api_fastapi:app
+
+Settings (environment variables):
+
+    STANDIN_EMBED_LATENCY    latency per embeddings request (see parse_latency)
+    STANDIN_CHAT_LATENCY     time to first token of a chat completion
+    STANDIN_TOKEN_LATENCY    delay between streamed tokens
+    STANDIN_ERROR_RATE       fraction of requests answered with a 500 (0-1)
+    STANDIN_RATE_LIMIT_RATE  fraction of requests answered with a 429 (0-1)
+    STANDIN_RETRY_AFTER      Retry-After seconds sent with a 429
+    STANDIN_DIMENSIONS       embedding dimensions (default 1536)
+    STANDIN_SEED             seed for latency and fault injection
+
+Latency, error rate and rate-limit rate can be overridden per request with
+the X-Standin-Latency, X-Standin-Error-Rate and X-Standin-Rate-Limit-Rate
+headers. GET /stats returns request counters; POST /stats/reset clears them.
+"""
+import asyncio
+import base64
+import math
+import os
+import random
+import time
+from collections import Counter
+from typing import Callable, Optional
+import orjson
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+from bench.fakes import hash_vector, stub_score
+
+# z-score of the 99th percentile of a standard normal distribution
+Z_99 = 2.326
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Parse a latency distribution in milliseconds into a sampler returning seconds.
+
+        ''  or '0'               no delay
+        '50' or 'fixed:50'       always 50 ms
+        'uniform:20:80'          uniformly between 20 and 80 ms
+        'normal:50:10'           mean 50 ms, standard deviation 10 ms (clipped at 0)
+        'lognormal:80:400'       median 80 ms, p99 400 ms (long tail, like real APIs)
+    """
+    spec = (spec or '').strip()
+    if not spec or spec == '0':
+        return lambda rng: 0.0
+
+    kind, _, args = spec.partition(':') if ':' in spec else ('fixed', '', spec)
+    try:
+        values = [float(v) / 1000 for v in args.split(':')]
+        if kind == 'fixed' and len(values) == 1:
+            return lambda rng: values[0]
+        if kind == 'uniform' and len(values) == 2:
+            low, high = values
+            return lambda rng: rng.uniform(low, high)
+        if kind == 'normal' and len(values) == 2:
+            mean, stddev = values
+            return lambda rng: max(0.0, rng.gauss(mean, stddev))
+        if kind == 'lognormal' and len(values) == 2:
+            median, p99 = values
+            mu = math.log(median)
+            sigma = max(0.0, (math.log(p99) - mu) / Z_99)
+            return lambda rng: rng.lognormvariate(mu, sigma)
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid latency spec: {spec!r}")
+
+
+class Settings:
+    """Stand-in behaviour, read from the environment at startup."""
+
+    def __init__(self):
+        self.embed_latency = parse_latency(os.getenv('STANDIN_EMBED_LATENCY', ''))
+        self.chat_latency = parse_latency(os.getenv('STANDIN_CHAT_LATENCY', ''))
+        self.token_latency = parse_latency(os.getenv('STANDIN_TOKEN_LATENCY', ''))
+        self.error_rate = float(os.getenv('STANDIN_ERROR_RATE', '0'))
+        self.rate_limit_rate = float(os.getenv('STANDIN_RATE_LIMIT_RATE', '0'))
+        self.retry_after = os.getenv('STANDIN_RETRY_AFTER', '1')
+        self.dimensions = int(os.getenv('STANDIN_DIMENSIONS', '1536'))
+        seed = os.getenv('STANDIN_SEED')
+        self.rng = random.Random(int(seed) if seed else None)
+
+
+settings = Settings()
+stats = Counter()
+
+app = FastAPI(title="OpenRouter stand-in", docs_url=None, redoc_url=None)
+
+
+def _error(status: int, message: str, kind: str, headers: Optional[dict] = None) -> JSONResponse:
+    return JSONResponse({'error': {'message': message, 'type': kind, 'code': status}},
+                        status_code=status, headers=headers)
+
+
+async def _inject(request: Request, endpoint: str, latency: Callable) -> Optional[JSONResponse]:
+    """Sleep for the configured latency; return a fault response if one is drawn."""
+    headers = request.headers
+    if 'x-standin-latency' in headers:
+        latency = parse_latency(headers['x-standin-latency'])
+    error_rate = float(headers.get('x-standin-error-rate', settings.error_rate))
+    rate_limit_rate = float(headers.get('x-standin-rate-limit-rate', settings.rate_limit_rate))
+
+    stats[f'{endpoint}_requests'] += 1
+    roll = settings.rng.random()
+    if roll < rate_limit_rate:
+        # Rate limits are answered immediately, like a real gateway
+        stats[f'{endpoint}_429'] += 1
+        return _error(429, "Rate limit exceeded (stand-in)", 'rate_limit_exceeded',
+                      {'Retry-After': settings.retry_after})
+
+    await asyncio.sleep(latency(settings.rng))
+    if roll < rate_limit_rate + error_rate:
+        stats[f'{endpoint}_500'] += 1
+        return _error(500, "Injected server error (stand-in)", 'server_error')
+    return None
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    fault = await _inject(request, 'embeddings', settings.embed_latency)
+    if fault:
+        return fault
+
+    texts = body.get('input', [])
+    if isinstance(texts, str):
+        texts = [texts]
+    dimensions = int(body.get('dimensions') or settings.dimensions)
+    stats['embedded_texts'] += len(texts)
+
+    vectors = [hash_vector(text, dimensions) for text in texts]
+    if body.get('encoding_format') == 'base64':
+        # The OpenAI SDK asks for base64 (little-endian float32) by default
+        vectors = [base64.b64encode(vector.astype('<f4').tobytes()).decode('ascii') for vector in vectors]
+    data = [{'object': 'embedding', 'index': i, 'embedding': vector} for i, vector in enumerate(vectors)]
+    tokens = sum(len(text.split()) for text in texts)
+    payload = {
+        'object': 'list',
+        'data': data,
+        'model': body.get('model', 'standin'),
+        'usage': {'prompt_tokens': tokens, 'total_tokens': tokens},
+    }
+    return Response(orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY), media_type='application/json')
+
+
+def _chunk(completion_id: str, model: str, created: int, delta: dict, finish_reason=None) -> bytes:
+    chunk = {
+        'id': completion_id,
+        'object': 'chat.completion.chunk',
+        'created': created,
+        'model': model,
+        'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+    }
+    return b'data: ' + orjson.dumps(chunk) + b'\n\n'
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    fault = await _inject(request, 'chat', settings.chat_latency)
+    if fault:
+        return fault
+
+    messages = body.get('messages') or [{'content': ''}]
+    answer = stub_score(messages[-1].get('content') or '')
+    model = body.get('model', 'standin')
+    created = int(time.time())
+    completion_id = f"chatcmpl-standin-{stats['chat_requests']}"
+
+    if not body.get('stream'):
+        return {
+            'id': completion_id,
+            'object': 'chat.completion',
+            'created': created,
+            'model': model,
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': answer},
+                         'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 1, 'total_tokens': 1},
+        }
+
+    async def stream():
+        yield _chunk(completion_id, model, created, {'role': 'assistant', 'content': ''})
+        for token in answer:
+            yield _chunk(completion_id, model, created, {'content': token})
+            await asyncio.sleep(settings.token_latency(settings.rng))
+        yield _chunk(completion_id, model, created, {}, finish_reason='stop')
+        yield b'data: [DONE]\n\n'
+
+    return StreamingResponse(stream(), media_type='text/event-stream')
+
+
+@app.get("/v1/models")
+async def models():
+    return {'object': 'list', 'data': [{'id': 'standin', 'object': 'model', 'owned_by': 'bench'}]}
+
+
+@app.get("/stats")
+async def get_stats():
+    return dict(stats)
+
+
+@app.post("/stats/reset")
+async def reset_stats():
+    stats.clear()
+    return {'status': 'ok'}
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=int(os.getenv('STANDIN_PORT', '8080')))
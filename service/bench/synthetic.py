@@ -0,0 +1,115 @@
+"""Synthetic curriculum data in the curriculum-fo JSON schema."""
+import json
+import random
+import uuid
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# Vocabulary loosely modelled on SLO doelzinnen, so lexical scoring has
+# realistic term overlap between queries, doelzinnen and uitwerkingen
+SUBJECTS = [
+    'fotosynthese', 'ecosystemen', 'energie', 'klimaat', 'water', 'planten', 'dieren',
+    'cellen', 'breuken', 'getallen', 'meten', 'meetkunde', 'verhoudingen', 'statistiek',
+    'lezen', 'schrijven', 'spreken', 'luisteren', 'woordenschat', 'spelling', 'grammatica',
+    'geschiedenis', 'tijdvakken', 'democratie', 'burgerschap', 'kaarten', 'landschap',
+    'programmeren', 'algoritmen', 'digitale', 'geletterdheid', 'mediawijsheid', 'privacy',
+    'muziek', 'beeldende', 'kunst', 'dans', 'drama', 'bewegen', 'gezondheid', 'voeding',
+]
+VERBS = [
+    'beschrijft', 'verklaart', 'onderzoekt', 'vergelijkt', 'gebruikt', 'herkent',
+    'analyseert', 'ontwerpt', 'beargumenteert', 'reflecteert', 'past', 'toe', 'maakt',
+]
+FILLER = [
+    'de', 'het', 'een', 'leerling', 'kan', 'en', 'van', 'in', 'met', 'over', 'bij',
+    'eigen', 'omgeving', 'situaties', 'begrippen', 'concepten', 'voorbeelden', 'samenhang',
+]
+SOORTEN = ['kerndoel', 'eindterm', 'tussendoel']
+STATUSSEN = ['definitief', 'concept']
+NIVEAUS = [f'niveau-{i}' for i in range(1, 9)]
+
+
+def _sentence(rng: random.Random, length: int, topics: List[str]) -> str:
+    words = []
+    for _ in range(length):
+        roll = rng.random()
+        if roll < 0.35:
+            words.append(rng.choice(topics))
+        elif roll < 0.5:
+            words.append(rng.choice(VERBS))
+        else:
+            words.append(rng.choice(FILLER))
+    return 'De leerling ' + ' '.join(words) + '.'
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def generate_corpus(
+    n_doelzinnen: int,
+    n_uitwerkingen: int,
+    seed: int = 42
+) -> Tuple[List[Dict], List[Dict]]:
+    """Generate doelzinnen and uitwerkingen with the same fields as curriculum-fo.
+
+    Every uitwerking belongs to one doelzin; doelzinnen get
+    n_uitwerkingen / n_doelzinnen uitwerkingen on average.
+    """
+    rng = random.Random(seed)
+
+    uitwerkingen = []
+    topics_by_uitwerking = []
+    for i in range(n_uitwerkingen):
+        topics = rng.sample(SUBJECTS, 3)
+        topics_by_uitwerking.append(topics)
+        uitwerkingen.append({
+            'id': _uuid(rng),
+            'title': f'Uitwerking {i + 1}',
+            'description': _sentence(rng, rng.randint(15, 40), topics),
+            'prefix': f'{rng.randint(1, 60)}.{rng.randint(1, 9)}',
+            'niveau_id': rng.sample(NIVEAUS, rng.randint(1, 3)),
+            'status': rng.choice(STATUSSEN),
+        })
+
+    # Distribute uitwerkingen over doelzinnen
+    assignments = [[] for _ in range(n_doelzinnen)]
+    for index in range(n_uitwerkingen):
+        assignments[rng.randrange(n_doelzinnen)].append(index)
+
+    doelzinnen = []
+    for i, linked in enumerate(assignments):
+        topics = topics_by_uitwerking[linked[0]] if linked else rng.sample(SUBJECTS, 3)
+        doelzinnen.append({
+            'id': _uuid(rng),
+            'title': f'{rng.choice(SOORTEN).capitalize()} {i + 1}',
+            'description': _sentence(rng, rng.randint(10, 30), topics),
+            'prefix': str(rng.randint(1, 60)),
+            'soort': rng.choice(SOORTEN),
+            'ce': rng.randint(0, 1),
+            'se': rng.randint(0, 1),
+            'status': rng.choice(STATUSSEN),
+            'fo_uitwerking_id': [uitwerkingen[index]['id'] for index in linked],
+        })
+
+    return doelzinnen, uitwerkingen
+
+
+def generate_queries(n: int, seed: int = 7) -> List[str]:
+    """Generate short lesson-description style queries."""
+    rng = random.Random(seed)
+    return [
+        ' '.join(rng.sample(SUBJECTS, rng.randint(1, 3)) + rng.sample(VERBS, 1))
+        for _ in range(n)
+    ]
+
+
+def write_corpus(data_dir: Path, n_doelzinnen: int, n_uitwerkingen: int, seed: int = 42) -> Path:
+    """Write doelzinnen.json and uitwerkingen.json (the files ingest.py reads)."""
+    data_dir = Path(data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    doelzinnen, uitwerkingen = generate_corpus(n_doelzinnen, n_uitwerkingen, seed)
+    with open(data_dir / 'doelzinnen.json', 'w', encoding='utf-8') as f:
+        json.dump(doelzinnen, f, ensure_ascii=False)
+    with open(data_dir / 'uitwerkingen.json', 'w', encoding='utf-8') as f:
+        json.dump(uitwerkingen, f, ensure_ascii=False)
+    return data_dir
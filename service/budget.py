@@ -0,0 +1,53 @@
+"""Per-request latency budget for the search pipeline, and graceful degradation.
+
+A search gets a deadline (SEARCH_BUDGET_MS, or `budget_ms` per request)
+that each stage checks before doing expensive work:
+
+    embed      cached query embeddings are used first; an uncached
+               embedding gets the remaining budget as its timeout (a
+               TimeoutError means there is nothing to rank: 504)
+    rerank     LLM calls get at most the remaining budget; no new call
+               starts with less than RERANK_MIN_MS left. Unscored results
+               keep their vector similarity (rerank_truncated), or the
+               rerank is skipped altogether (rerank_skipped)
+    qb_cosine  skipped when the budget is spent, returning the vector
+               ranking (qb_cosine_skipped)
+
+The degradations that applied are returned in the response.
+"""
+import time
+from typing import List, Optional
+from timing import count_degradation
+
+
+class Budget:
+    """Deadline of one search; Budget() without milliseconds never runs out."""
+
+    def __init__(self, ms: Optional[float] = None):
+        self.ms = ms or None
+        self.deadline = time.monotonic() + ms / 1000 if ms else None
+        self.degradations: List[str] = []
+
+    def remaining(self) -> float:
+        """Seconds left (infinite without a budget)."""
+        if self.deadline is None:
+            return float('inf')
+        return self.deadline - time.monotonic()
+
+    def timeout(self, cap: Optional[float] = None) -> Optional[float]:
+        """Timeout for a blocking call: the remaining budget, at most `cap` (None: no limit)."""
+        if self.deadline is None:
+            return cap
+        remaining = max(self.remaining(), 0.0)
+        return remaining if cap is None else min(remaining, cap)
+
+    def allows(self, seconds: float) -> bool:
+        return self.remaining() >= seconds
+
+    def exhausted(self) -> bool:
+        return self.remaining() <= 0
+
+    def degrade(self, name: str):
+        if name not in self.degradations:
+            self.degradations.append(name)
+            count_degradation(name)
@@ -0,0 +1,150 @@
+"""Corpus state: generation and statistics maintained at ingest time.
+
+The corpus generation is a counter that ingest bumps whenever the
+searchable data changes. Everything derived from the corpus (HTTP ETags,
+in-process caches) is keyed on it. Ingest also records row counts so that
+``/api/stats`` never has to scan the content tables.
+"""
+import threading
+import time
+from datetime import datetime
+import psycopg2.errors
+from config import config
+from timing import count_cache
+
+_lock = threading.Lock()
+_state = None
+_loaded_at = 0.0
+
+EMPTY_STATE = {
+    'generation': 0,
+    'doelzin_count': None,
+    'uitwerking_count': None,
+    'doelzin_embedded': None,
+    'uitwerking_embedded': None,
+    'embedding_model': None,
+    'last_ingest': None,
+}
+
+
+def record_ingest(db, version=None) -> int:
+    """Store fresh counts and bump the corpus generation after an ingest.
+    
+    Embeddings are counted in `version` (default: the active embedding
+    version). Commits, together with whatever the caller changed before.
+    """
+    from embedding_versions import get_active
+    version = version or get_active(db)
+    stats = {
+        'doelzin_count': db(db.doelzin).count(),
+        'uitwerking_count': db(db.uitwerking).count(),
+        'doelzin_embedded': db.executesql(f"SELECT count(*) FROM {version.doelzin_table}")[0][0],
+        'uitwerking_embedded': db.executesql(f"SELECT count(*) FROM {version.uitwerking_table}")[0][0],
+        'embedding_model': version.model,
+        'last_ingest': datetime.now(),
+    }
+
+    row = db(db.corpus_stats).select(orderby=db.corpus_stats.id, limitby=(0, 1)).first()
+    if row:
+        generation = (row.generation or 0) + 1
+        row.update_record(generation=generation, **stats)
+    else:
+        generation = 1
+        db.corpus_stats.insert(generation=generation, **stats)
+    db.commit()
+    invalidate()
+    return generation
+
+
+def get_state(db) -> dict:
+    """Get the corpus_stats row as a dict (cached for CORPUS_STATE_TTL seconds)."""
+    global _state, _loaded_at
+    with _lock:
+        if _state is not None and time.monotonic() - _loaded_at < config.CORPUS_STATE_TTL:
+            count_cache('corpus_state', True)
+            return _state
+    count_cache('corpus_state', False)
+
+    try:
+        row = db(db.corpus_stats).select(orderby=db.corpus_stats.id, limitby=(0, 1)).first()
+    except psycopg2.errors.UndefinedTable:
+        # Serving processes do not migrate; the table appears with the first ingest
+        db.rollback()
+        row = None
+    state = dict(EMPTY_STATE)
+    if row:
+        state.update({key: row[key] for key in EMPTY_STATE})
+        state['generation'] = state['generation'] or 0
+
+    with _lock:
+        _state = state
+        _loaded_at = time.monotonic()
+    return state
+
+
+def get_generation(db) -> int:
+    """Get the current corpus generation (cached in process)."""
+    return get_state(db)['generation']
+
+
+def count_estimates(db) -> dict:
+    """Row count estimates from pg_class (no table scan, refreshed by ANALYZE).
+    
+    The embedding counts are those of the active embedding version.
+    """
+    from embedding_versions import get_active
+    version = get_active(db)
+    tables = {'doelzin': 'doelzin', 'uitwerking': 'uitwerking',
+              version.doelzin_table: 'doelzin_embedding', version.uitwerking_table: 'uitwerking_embedding'}
+    rows = db.executesql("""
+        SELECT relname, reltuples::bigint
+        FROM pg_class
+        WHERE relkind = 'r'
+          AND relname = ANY(%(tables)s)
+    """, placeholders={'tables': list(tables)})
+    # reltuples is -1 for tables that have never been analyzed
+    return {tables[name]: max(int(count), 0) for name, count in rows}
+
+
+def get_stats(db, exact: bool = True) -> dict:
+    """Corpus statistics for /api/stats; never scans the content tables.
+    
+    Uses the counters recorded at ingest, or pg_class estimates when exact
+    counts are not requested or no ingest has recorded them yet.
+    """
+    from embedding_versions import get_active
+    state = get_state(db)
+    estimated = not exact or state['doelzin_count'] is None
+    if estimated:
+        estimates = count_estimates(db)
+        counts = {
+            'doelzin_count': estimates.get('doelzin', 0),
+            'uitwerking_count': estimates.get('uitwerking', 0),
+            'doelzin_embedded': estimates.get('doelzin_embedding', 0),
+            'uitwerking_embedded': estimates.get('uitwerking_embedding', 0),
+        }
+    else:
+        counts = state
+    
+    return {
+        "doelzinnen": {
+            "total": counts['doelzin_count'],
+            "embedded": counts['doelzin_embedded']
+        },
+        "uitwerkingen": {
+            "total": counts['uitwerking_count'],
+            "embedded": counts['uitwerking_embedded']
+        },
+        "estimated": estimated,
+        "embedding_model": state['embedding_model'] or config.EMBEDDING_MODEL,
+        "embedding_version": get_active(db).id,
+        "last_ingest": state['last_ingest'].isoformat() if state['last_ingest'] else None,
+        "generation": state['generation']
+    }
+
+
+def invalidate():
+    """Drop the cached state so the next call re-reads it."""
+    global _state
+    with _lock:
+        _state = None
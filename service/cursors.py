@@ -0,0 +1,51 @@
+"""Signed, opaque pagination cursors, shared by the REST search and the MCP tools.
+
+A cursor is the URL-safe base64 of a JSON payload plus an HMAC-SHA256 of
+it, so clients cannot alter the parameters it carries. The key is
+SEARCH_CURSOR_SECRET, or else derived from DATABASE_URI: every worker of
+a deployment shares it, so a cursor from one worker is accepted by the
+others.
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+from typing import Dict
+import orjson
+from config import config
+
+INVALID = "Invalid cursor; start again without one"
+STALE = "The corpus has changed since this search; start again without a cursor"
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _signature(payload: bytes) -> bytes:
+    secret = (config.SEARCH_CURSOR_SECRET or config.DATABASE_URI).encode()
+    return hmac.new(secret, payload, hashlib.sha256).digest()[:16]
+
+
+def encode_cursor(payload: Dict) -> str:
+    data = orjson.dumps(payload)
+    return f"{_b64encode(data)}.{_b64encode(_signature(data))}"
+
+
+def decode_cursor(cursor: str) -> Dict:
+    """The payload of a cursor made by encode_cursor; ValueError if it is malformed or was altered."""
+    try:
+        encoded, signature = cursor.split('.')
+        data = _b64decode(encoded)
+        if not hmac.compare_digest(_b64decode(signature), _signature(data)):
+            raise ValueError
+        payload = orjson.loads(data)
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError(INVALID) from None
+    if not isinstance(payload, dict):
+        raise ValueError(INVALID)
+    return payload
@@ -0,0 +1,35 @@
+"""Shared database handle for the API and the in-process MCP server."""
+import threading
+from models import get_db
+from config import config
+from timing import instrument_db
+
+# Connected lazily, once per process
+db = None
+_lock = threading.Lock()
+
+def init_db():
+    """Connect to the database (once), running migrations only if DB_MIGRATE is set."""
+    global db
+    import psycopg2.errors
+    
+    with _lock:
+        if db is not None:
+            return db
+        
+        if not config.DB_MIGRATE:
+            connected = get_db(migrate=False)
+        else:
+            try:
+                connected = get_db()
+            except psycopg2.errors.DuplicateTable:
+                # Tables exist but .table files were deleted - use fake_migrate to recreate them
+                print("⚠️  Detected orphaned .table files. Running fake_migrate to recover...")
+                connected = get_db(fake_migrate=True)
+                print("✅ Database schema recovered successfully")
+        db = instrument_db(connected)
+    return db
+
+def get_database():
+    """Get the database connection, connecting on first use."""
+    return db if db is not None else init_db()
@@ -0,0 +1,377 @@
+"""Versioned embedding sets: move to another embedding model without downtime.
+
+Every embedding version is a pair of tables (doelzin and uitwerking
+embeddings) for one model and dimension size, registered in the
+embedding_version table. Exactly one version is active: vector searches,
+the in-memory index, snapshots and the related graph read its tables, and
+queries are embedded with its model. The original doelzin_embedding and
+uitwerking_embedding tables are registered as the first version.
+
+Moving to another model:
+
+    python embedding_versions.py create openai/text-embedding-3-large --dimensions 1536
+    python embedding_versions.py backfill 2     # resumable; the active version keeps serving
+    python embedding_versions.py                # backfill progress per version
+    python embedding_versions.py activate 2     # atomic switch
+
+A new version starts as 'building' with empty tables. Backfill embeds
+the doelzinnen and uitwerkingen it does not have yet, then builds its
+vector indexes and marks it 'ready'; ingest keeps building and ready
+versions up to date as well. Progress is in the embedding_backfill_progress
+view and at /api/embedding-versions.
+
+Activation retires the active version, activates the new one and bumps
+the corpus generation in one transaction, so workers move to the new
+tables and query model together (within CORPUS_STATE_TTL) and every cache
+keyed on the generation is invalidated. A retired version can be
+activated again until it is dropped; the original version cannot be
+dropped.
+"""
+import re
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+import psycopg2.errors
+from config import config
+from corpus import get_generation, get_state
+
+KINDS = ('doelzin', 'uitwerking')
+
+# pgvector indexes (ivfflat, hnsw) support up to 2000 dimensions; larger versions are scanned exactly
+MAX_INDEXED_DIMENSIONS = 2000
+
+IDENTIFIER = re.compile(r'[a-z_][a-z0-9_]*')
+
+PROGRESS_VIEW = """
+    CREATE OR REPLACE VIEW embedding_backfill_progress AS
+    SELECT v.id AS version, v.embedding_model, v.dimensions, v.status,
+           v.doelzin_embedded, d.total AS doelzin_total,
+           v.uitwerking_embedded, u.total AS uitwerking_total,
+           round(100.0 * (coalesce(v.doelzin_embedded, 0) + coalesce(v.uitwerking_embedded, 0))
+                 / greatest(d.total + u.total, 1), 1) AS percent,
+           v.created_at, v.updated_at, v.activated_at
+    FROM embedding_version v
+    CROSS JOIN (SELECT count(*) AS total FROM doelzin) d
+    CROSS JOIN (SELECT count(*) AS total FROM uitwerking) u
+"""
+
+_active = None  # (corpus generation, EmbeddingVersion)
+_lock = threading.Lock()
+
+
+class EmbeddingVersion:
+    """One embedding set: the model, its dimensions and the tables holding its vectors."""
+
+    def __init__(self, id: Optional[int], embedding_model: str, dimensions: Optional[int] = None,
+                 doelzin_table: str = 'doelzin_embedding', uitwerking_table: str = 'uitwerking_embedding',
+                 status: str = 'active'):
+        # Table names end up in SQL text, so only plain identifiers are accepted
+        for table in (doelzin_table, uitwerking_table):
+            if not IDENTIFIER.fullmatch(table or ''):
+                raise ValueError(f"Invalid embedding table name: {table!r}")
+        self.id = id  # None: the original tables, before any version was registered
+        self.model = embedding_model
+        self.dimensions = dimensions
+        self.doelzin_table = doelzin_table
+        self.uitwerking_table = uitwerking_table
+        self.status = status
+
+    @classmethod
+    def from_row(cls, row) -> 'EmbeddingVersion':
+        return cls(row.id, row.embedding_model, row.dimensions, row.doelzin_table, row.uitwerking_table, row.status)
+
+    def table(self, kind: str) -> str:
+        """The embedding table for 'doelzin' or 'uitwerking'."""
+        return self.doelzin_table if kind == 'doelzin' else self.uitwerking_table
+
+    def info(self) -> Dict:
+        return {'version': self.id, 'embedding_model': self.model, 'dimensions': self.dimensions,
+                'status': self.status}
+
+
+def default_version(db) -> EmbeddingVersion:
+    """The original tables, with the model the last ingest recorded."""
+    return EmbeddingVersion(None, get_state(db)['embedding_model'] or config.EMBEDDING_MODEL)
+
+
+def get_active(db) -> EmbeddingVersion:
+    """The active version (cached in process, re-read when the corpus generation changes)."""
+    global _active
+    generation = get_generation(db)
+    with _lock:
+        if _active is not None and _active[0] == generation:
+            return _active[1]
+    try:
+        row = db(db.embedding_version.status == 'active').select(
+            orderby=~db.embedding_version.activated_at, limitby=(0, 1)
+        ).first()
+    except psycopg2.errors.UndefinedTable:
+        # Serving processes do not migrate; the registry appears with the next ingest
+        db.rollback()
+        row = None
+    version = EmbeddingVersion.from_row(row) if row else default_version(db)
+    with _lock:
+        _active = (generation, version)
+    return version
+
+
+def invalidate():
+    global _active
+    with _lock:
+        _active = None
+
+
+def get_version(db, version_id: int) -> EmbeddingVersion:
+    row = db.embedding_version(version_id)
+    if row is None:
+        raise ValueError(f"Embedding version {version_id} does not exist")
+    return EmbeddingVersion.from_row(row)
+
+
+def target_versions(db) -> List[EmbeddingVersion]:
+    """Versions ingest writes to: the active one, then those building or ready."""
+    ensure_registry(db)
+    rows = db(db.embedding_version.status.belongs(['active', 'building', 'ready'])).select(
+        orderby=db.embedding_version.id
+    )
+    versions = [EmbeddingVersion.from_row(row) for row in rows]
+    return sorted(versions, key=lambda version: version.status != 'active')
+
+
+def ensure_registry(db):
+    """Register the original tables as the first version if none is registered, and create the progress view."""
+    if db(db.embedding_version).isempty():
+        now = datetime.now()
+        version_id = db.embedding_version.insert(
+            embedding_model=get_state(db)['embedding_model'] or config.EMBEDDING_MODEL,
+            doelzin_table='doelzin_embedding',
+            uitwerking_table='uitwerking_embedding',
+            status='active',
+            created_at=now,
+            updated_at=now,
+            activated_at=now,
+        )
+        refresh_progress(db, get_version(db, version_id))
+    db.executesql(PROGRESS_VIEW)
+    db.commit()
+
+
+def create_version(db, model: str, dimensions: int = None) -> EmbeddingVersion:
+    """Register a new version for model and create its (empty) tables; the active version is untouched."""
+    ensure_registry(db)
+    now = datetime.now()
+    version_id = db.embedding_version.insert(
+        embedding_model=model, dimensions=dimensions, status='building', created_at=now, updated_at=now
+    )
+    tables = {f'{kind}_table': f'{kind}_embedding_v{version_id}' for kind in KINDS}
+    # Without requested dimensions the size is only known once the model answers; backfill fixes it
+    column = f'vector({int(dimensions)})' if dimensions else 'vector'
+    for kind in KINDS:
+        db.executesql(f"""
+            CREATE TABLE {tables[f'{kind}_table']} (
+                id SERIAL PRIMARY KEY,
+                {kind}_id INTEGER NOT NULL UNIQUE,
+                embedding_model VARCHAR(512) NOT NULL,
+                embedding {column} NOT NULL
+            )
+        """)
+    db(db.embedding_version.id == version_id).update(**tables)
+    db.commit()
+    return get_version(db, version_id)
+
+
+def store_embeddings(db, version: EmbeddingVersion, kind: str, ids: List[int], embeddings: List):
+    """Insert or replace the embeddings of doelzinnen or uitwerkingen in one statement (no commit)."""
+    if not ids:
+        return
+    db.executesql(f"""
+        INSERT INTO {version.table(kind)} ({kind}_id, embedding_model, embedding)
+        SELECT e.id, %(model)s, e.embedding::vector
+        FROM unnest(%(ids)s::int[], %(embeddings)s::text[]) AS e(id, embedding)
+        ON CONFLICT ({kind}_id) DO UPDATE
+        SET embedding_model = EXCLUDED.embedding_model, embedding = EXCLUDED.embedding
+    """, placeholders={
+        'model': version.model,
+        'ids': list(ids),
+        'embeddings': ['[' + ','.join(map(str, embedding)) + ']' for embedding in embeddings],
+    })
+
+
+def refresh_progress(db, version: EmbeddingVersion) -> Dict[str, int]:
+    """Count the stored embeddings of a version into the registry (no commit)."""
+    counts = {
+        f'{kind}_embedded': db.executesql(f"SELECT count(*) FROM {version.table(kind)}")[0][0]
+        for kind in KINDS
+    }
+    if version.id is not None:
+        db(db.embedding_version.id == version.id).update(updated_at=datetime.now(), **counts)
+    return counts
+
+
+def backfill(db, version_id: int, batch_size: int = 100) -> Dict[str, int]:
+    """Embed every doelzin and uitwerking the version does not have yet, then mark it ready.
+
+    Commits per batch, so an interrupted backfill continues where it stopped.
+    """
+    from embeddings import combine_text_for_embedding, get_embeddings
+    version = get_version(db, version_id)
+    if version.status not in ('building', 'ready'):
+        raise ValueError(f"Embedding version {version.id} is {version.status}, not building or ready")
+    embedder = get_embeddings(version.model, version.dimensions)
+
+    stored = {}
+    for kind in KINDS:
+        rows = db.executesql(f"""
+            SELECT c.id, c.title, c.description
+            FROM {kind} c
+            LEFT JOIN {version.table(kind)} e ON e.{kind}_id = c.id
+            WHERE e.id IS NULL
+            ORDER BY c.id
+        """)
+        db.commit()
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            embeddings = embedder.encode(
+                [combine_text_for_embedding(r[1], r[2]) for r in batch], convert_to_numpy=False
+            )
+            store_embeddings(db, version, kind, [r[0] for r in batch], embeddings)
+            progress = refresh_progress(db, version)
+            db.commit()
+            print(f"  {kind}: {progress[f'{kind}_embedded']} embedded ({start + len(batch)}/{len(rows)} missing done)",
+                  flush=True)
+        stored[kind] = len(rows)
+
+    finish(db, version)
+    return stored
+
+
+def finish(db, version: EmbeddingVersion):
+    """Fix the vector size, build the vector indexes and mark a building version ready."""
+    for kind in KINDS:
+        table = version.table(kind)
+        size = db.executesql(f"SELECT vector_dims(embedding) FROM {table} LIMIT 1")
+        if not size:
+            continue
+        dimensions = size[0][0]
+        if not version.dimensions:
+            # Fails (and leaves the version building) if the model returned vectors of different sizes
+            db.executesql(f"ALTER TABLE {table} ALTER COLUMN embedding TYPE vector({dimensions})")
+        if dimensions <= MAX_INDEXED_DIMENSIONS:
+            db.executesql(f"""
+                CREATE INDEX IF NOT EXISTS {table}_vector_idx ON {table}
+                USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100)
+            """)
+        else:
+            print(f"⚠️  {table}: {dimensions} dimensions cannot be indexed; searches scan it exactly")
+        db.executesql(f"ANALYZE {table}")
+    refresh_progress(db, version)
+    if version.status == 'building':
+        db(db.embedding_version.id == version.id).update(status='ready', updated_at=datetime.now())
+    db.commit()
+
+
+def activate(db, version_id: int, force: bool = False) -> int:
+    """Make a ready (or retired) version the active one; returns the new corpus generation.
+
+    The related graph is rebuilt from the version's embeddings, and the
+    registry update, the graph and the generation bump commit together.
+    Refuses a version that misses embeddings unless force is set.
+    """
+    from corpus import record_ingest
+    from related import build_related
+    version = get_version(db, version_id)
+    if version.status == 'building':
+        raise ValueError(f"Embedding version {version.id} is still building; run backfill first")
+    if version.status == 'active':
+        return get_generation(db)
+
+    counts = refresh_progress(db, version)
+    missing = {
+        kind: db(db[kind]).count() - counts[f'{kind}_embedded'] for kind in KINDS
+    }
+    if any(missing.values()) and not force:
+        db.rollback()
+        raise ValueError(f"Embedding version {version.id} misses embeddings: {missing}; "
+                         f"run backfill (or activate with --force)")
+
+    build_related(db, version, commit=False)
+    now = datetime.now()
+    db(db.embedding_version.status == 'active').update(status='retired', updated_at=now)
+    db(db.embedding_version.id == version.id).update(status='active', activated_at=now, updated_at=now)
+    version.status = 'active'
+    generation = record_ingest(db, version)
+    invalidate()
+
+    if config.SNAPSHOT_PATH:
+        from index import save_snapshot
+        try:
+            print(f"✅ Wrote embedding snapshot: {save_snapshot(db, config.SNAPSHOT_PATH)}")
+        except OSError as e:
+            # The switch is committed; workers load the embeddings from the database instead
+            print(f"⚠️  Writing the embedding snapshot failed: {e}")
+    return generation
+
+
+def drop_version(db, version_id: int):
+    """Drop a version that is not active, with its tables (never the original tables)."""
+    version = get_version(db, version_id)
+    if version.status == 'active':
+        raise ValueError(f"Embedding version {version.id} is active; activate another version first")
+    for kind in KINDS:
+        # Defined in models.py and init-db.sql, and used when no version is registered
+        if version.table(kind) == f'{kind}_embedding':
+            raise ValueError(f"Embedding version {version.id} uses the original {kind}_embedding table, "
+                             f"which cannot be dropped")
+    for kind in KINDS:
+        db.executesql(f"DROP TABLE IF EXISTS {version.table(kind)}")
+    db(db.embedding_version.id == version.id).delete()
+    db.commit()
+
+
+def list_versions(db) -> List[Dict]:
+    """All versions with their backfill progress (the embedding_backfill_progress view)."""
+    try:
+        rows = db.executesql("SELECT * FROM embedding_backfill_progress ORDER BY version", as_dict=True)
+        db.commit()
+    except psycopg2.errors.UndefinedTable:
+        db.rollback()
+        return [default_version(db).info()]
+    for row in rows:
+        for key in ('created_at', 'updated_at', 'activated_at'):
+            row[key] = row[key].isoformat() if row[key] else None
+        row['percent'] = float(row['percent'])
+    return rows
+
+
+if __name__ == '__main__':
+    import argparse
+    from models import get_db
+
+    parser = argparse.ArgumentParser(description="Manage embedding versions (without arguments: list them).")
+    commands = parser.add_subparsers(dest='command')
+    create = commands.add_parser('create', help='register a new version and create its tables')
+    create.add_argument('model')
+    create.add_argument('--dimensions', type=int, help="request this vector size (default: the model's own)")
+    for name, text in (('backfill', 'embed what the version misses, then mark it ready'),
+                       ('activate', 'switch searches to the version'),
+                       ('drop', 'drop a version that is neither active nor the original')):
+        command = commands.add_parser(name, help=text)
+        command.add_argument('version', type=int)
+    commands.choices['activate'].add_argument('--force', action='store_true',
+                                              help='activate even if embeddings are missing')
+    args = parser.parse_args()
+
+    db = get_db()
+    ensure_registry(db)
+    if args.command == 'create':
+        print(f"✅ Created embedding version: {create_version(db, args.model, args.dimensions).info()}")
+    elif args.command == 'backfill':
+        print(f"✅ Backfilled embedding version {args.version}: {backfill(db, args.version)}")
+    elif args.command == 'activate':
+        generation = activate(db, args.version, args.force)
+        print(f"✅ Embedding version {args.version} is active; corpus generation is now {generation}")
+    elif args.command == 'drop':
+        drop_version(db, args.version)
+        print(f"✅ Dropped embedding version {args.version}")
+    for row in list_versions(db):
+        print(row)
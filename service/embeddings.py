@@ -1,27 +1,42 @@
 """Embeddings using OpenRouter."""
+import threading
+import time
 import numpy as np
-from openai import OpenAI
+from openai import OpenAI, APITimeoutError
 from config import config
+from cache import TTLCache
+from timing import observe_embedding_batch, count_cache
 
 class OpenRouterEmbeddings:
     """OpenRouter embeddings client."""
     
-    def __init__(self, model: str = None):
+    def __init__(self, model: str = None, dimensions: int = None):
         self.model = model or config.EMBEDDING_MODEL
+        self.dimensions = dimensions  # None: the model's own size
         self.client = OpenAI(
             base_url=config.OPENROUTER_BASE_URL,
             api_key=config.OPENROUTER_API_KEY
         )
         
-    def encode(self, text: str | list[str], convert_to_numpy: bool = True) -> np.ndarray:
-        """Encode text to embeddings."""
+    def encode(self, text: str | list[str], convert_to_numpy: bool = True, timeout: float = None) -> np.ndarray:
+        """Encode text to embeddings.
+        
+        With a timeout the request is not retried, and a TimeoutError is
+        raised when it does not complete in time.
+        """
         if isinstance(text, str):
             text = [text]
         
-        response = self.client.embeddings.create(
-            model=self.model,
-            input=text
-        )
+        client = self.client if timeout is None else self.client.with_options(timeout=timeout, max_retries=0)
+        kwargs = {} if self.dimensions is None else {'dimensions': self.dimensions}
+        try:
+            response = client.embeddings.create(
+                model=self.model,
+                input=text,
+                **kwargs
+            )
+        except APITimeoutError as e:
+            raise TimeoutError(f"Embedding request timed out after {timeout:.2f}s") from e
         
         embeddings = [item.embedding for item in response.data]
         
@@ -30,24 +45,180 @@ class OpenRouterEmbeddings:
         # Always return list for consistency when not converting to numpy
         return embeddings
 
-_embedder = None
+_embedder = None   # EMBEDDING_MODEL at its own dimensions
+_embedders = {}    # other (model, dimensions), e.g. of a new embedding version
 
-def get_embeddings(model: str = None) -> OpenRouterEmbeddings:
-    """Get embeddings instance (singleton)."""
+def get_embeddings(model: str = None, dimensions: int = None) -> OpenRouterEmbeddings:
+    """Get the embeddings instance for a model (one per model and dimensions; default EMBEDDING_MODEL)."""
     global _embedder
-    if _embedder is None:
-        _embedder = OpenRouterEmbeddings(model)
-    return _embedder
+    if model in (None, config.EMBEDDING_MODEL) and dimensions is None:
+        if _embedder is None:
+            _embedder = OpenRouterEmbeddings()
+        return _embedder
+    key = (model or config.EMBEDDING_MODEL, dimensions)
+    if key not in _embedders:
+        _embedders[key] = OpenRouterEmbeddings(*key)
+    return _embedders[key]
+
+class _Batch:
+    def __init__(self):
+        self.texts = []
+        self.deadlines = []  # per waiter; None: no deadline
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.vectors = None
+        self.error = None
+
+    def deadline(self):
+        """The latest deadline of its waiters (None when one of them has none)."""
+        return None if None in self.deadlines else max(self.deadlines)
+
+
+class EmbeddingBatcher:
+    """Micro-batches single-query embeddings from concurrent requests.
+    
+    The first query opens a batch and waits up to `window_ms` for others
+    (or until `max_batch` queries have arrived), then embeds them all in one
+    API request and hands every caller its own vector. A query that arrives
+    while no other query is being embedded is sent at once: without
+    concurrent callers there is nothing to wait for.
+    
+    The request gets the longest timeout among the callers in the batch, and
+    each caller only waits until its own deadline: a short budget does not
+    fail the other queries in its batch.
+    """
+    
+    def __init__(self, window_ms: float = 3.0, max_batch: int = 64, model: str = None, dimensions: int = None):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.model = model
+        self.dimensions = dimensions
+        self._pending = None
+        self._active = 0  # callers inside encode(), waiting or being embedded
+        self._lock = threading.Lock()
+    
+    def encode(self, text: str, timeout: float = None) -> np.ndarray:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._active += 1
+            batch = self._pending
+            leader = batch is None
+            if leader:
+                batch = self._pending = _Batch()
+            index = len(batch.texts)
+            batch.texts.append(text)
+            batch.deadlines.append(deadline)
+            if len(batch.texts) >= self.max_batch:
+                self._pending = None
+                batch.full.set()
+            alone = self._active == 1
+        try:
+            if leader:
+                if not alone:
+                    batch.full.wait(self.window if timeout is None else min(self.window, timeout))
+                with self._lock:
+                    if self._pending is batch:
+                        self._pending = None
+                # No one can join any more; if others wait longer than the leader, send in the background
+                if batch.deadline() == deadline:
+                    self._send(batch)
+                else:
+                    threading.Thread(target=self._send, args=(batch,), daemon=True).start()
+            
+            if not batch.done.wait(None if deadline is None else max(deadline - time.monotonic(), 0.0)):
+                raise TimeoutError(f"Embedding batch did not complete within {timeout:.2f}s")
+        finally:
+            with self._lock:
+                self._active -= 1
+        if batch.error is not None:
+            raise batch.error
+        return batch.vectors[index]
+    
+    def _send(self, batch: _Batch):
+        try:
+            # Identical queries in one batch are embedded once
+            unique = list(dict.fromkeys(batch.texts))
+            observe_embedding_batch(len(unique))
+            deadline = batch.deadline()
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+            vectors = dict(zip(unique, _encode(unique, timeout, self.model, self.dimensions)))
+            batch.vectors = [np.array(vectors[text]) for text in batch.texts]
+        except Exception as e:
+            batch.error = e
+        finally:
+            batch.done.set()
+
+def _encode(texts: list[str], timeout: float = None, model: str = None, dimensions: int = None) -> list:
+    # Only pass a timeout when there is one, so drop-in embedders need not support it
+    kwargs = {} if timeout is None else {'timeout': timeout}
+    return get_embeddings(model, dimensions).encode(texts, convert_to_numpy=False, **kwargs)
+
+_batchers = {}  # one per (model, dimensions)
+_query_cache = None
+
+def _cached_queries() -> TTLCache:
+    """The query-embedding cache (None when EMBED_CACHE_SIZE is 0)."""
+    global _query_cache
+    if _query_cache is None and config.EMBED_CACHE_SIZE > 0:
+        _query_cache = TTLCache(maxsize=config.EMBED_CACHE_SIZE, ttl=config.EMBED_CACHE_TTL)
+    return _query_cache
+
+def _query_key(text: str, model: str = None, dimensions: int = None) -> tuple:
+    return (getattr(get_embeddings(model, dimensions), 'model', None), dimensions, ' '.join(text.split()))
+
+def embed_query(text: str, timeout: float = None, model: str = None, dimensions: int = None) -> np.ndarray:
+    """Embed one search query (with the model and dimensions of the embeddings it is compared to).
+    
+    Recent queries come from an in-process cache (EMBED_CACHE_SIZE); others
+    are batched with concurrent queries if EMBED_BATCH_WINDOW_MS > 0. With a
+    timeout, a TimeoutError is raised when the embedding is not ready in time.
+    """
+    cache = _cached_queries()
+    key = _query_key(text, model, dimensions)
+    if cache is not None:
+        cached = cache.get(key)
+        count_cache('query_embedding', cached is not None)
+        if cached is not None:
+            return cached
+    if timeout is not None and timeout <= 0:
+        raise TimeoutError("No latency budget left to embed the query")
+    
+    if config.EMBED_BATCH_WINDOW_MS <= 0:
+        vector = np.array(_encode([text], timeout, model, dimensions)[0])
+    else:
+        batcher = _batchers.get((model, dimensions))
+        if batcher is None:
+            batcher = _batchers.setdefault((model, dimensions), EmbeddingBatcher(
+                config.EMBED_BATCH_WINDOW_MS, config.EMBED_BATCH_MAX, model, dimensions
+            ))
+        vector = batcher.encode(text, timeout)
+    
+    if cache is not None:
+        cache.set(key, vector)
+    return vector
+
+def prime_query_cache(texts: list[str], batch_size: int = 100, model: str = None, dimensions: int = None) -> int:
+    """Embed the queries that are not cached yet (batch_size per API request); returns how many."""
+    cache = _cached_queries()
+    if cache is None:
+        return 0
+    missing = list(dict.fromkeys(t for t in texts if cache.get(_query_key(t, model, dimensions)) is None))
+    for i in range(0, len(missing), batch_size):
+        batch = missing[i:i + batch_size]
+        for text, vector in zip(batch, _encode(batch, None, model, dimensions)):
+            cache.set(_query_key(text, model, dimensions), np.array(vector))
+    return len(missing)
 
 def combine_text_for_embedding(title: str, description: str) -> str:
     """Combine title and description for embedding."""
     return f"{title}\n{description}" if title else description
 
-def create_embeddings_batch(texts: list[str], model_name: str = None, batch_size: int = 1000) -> list:
+def create_embeddings_batch(texts: list[str], model_name: str = None, batch_size: int = 1000,
+                            dimensions: int = None) -> list:
     """Create embeddings for a batch of texts."""
     from tqdm import tqdm
     
-    embedder = get_embeddings(model_name)
+    embedder = get_embeddings(model_name, dimensions)
     embeddings = []
     
     # Process in batches for efficiency (100 texts per API call)
@@ -0,0 +1,86 @@
+"""Metadata filters for the search endpoints (prefix, soort, status, niveau_ids).
+
+Filters are a dict of field → tuple of accepted values: a result matches
+when, for every given field, its value is one of the listed values.
+`niveau_ids` comes from uitwerking.niveau_ids; a doelzin matches when at
+least one of its linked uitwerkingen is on one of the niveaus, and in
+combined search only those uitwerkingen count towards its score.
+
+Filters are applied inside the vector search (pre-filtering), so a
+filtered query still returns `limit` results when enough rows match.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+FIELDS = ('prefix', 'soort', 'status', 'niveau_ids')
+
+# Fields that exist on uitwerkingen (soort is a doelzin property)
+UITWERKING_FIELDS = ('prefix', 'status', 'niveau_ids')
+
+Filters = Dict[str, Tuple[str, ...]]
+
+
+def _values(value: Union[None, str, Iterable[str]]) -> Tuple[str, ...]:
+    """Comma-separated string or list → sorted, de-duplicated values."""
+    if value is None:
+        return ()
+    if isinstance(value, str):
+        value = value.split(',')
+    return tuple(sorted({str(v).strip() for v in value if str(v).strip()}))
+
+
+def parse_filters(prefix=None, soort=None, status=None, niveau_ids=None) -> Filters:
+    """Normalize filter parameters; fields without values are left out."""
+    filters = {
+        'prefix': _values(prefix),
+        'soort': _values(soort),
+        'status': _values(status),
+        'niveau_ids': _values(niveau_ids),
+    }
+    return {field: values for field, values in filters.items() if values}
+
+
+def pop_filters(params: Dict) -> Filters:
+    """Remove the filter fields from a parameter dict and parse them."""
+    return parse_filters(**{field: params.pop(field, None) for field in FIELDS})
+
+
+def filter_key(filters: Optional[Filters]) -> Tuple:
+    """Hashable, order-independent form (for cache keys and ETags)."""
+    return tuple(sorted((filters or {}).items()))
+
+
+def check_uitwerking_filters(filters: Optional[Filters]):
+    unsupported = set(filters or {}) - set(UITWERKING_FIELDS)
+    if unsupported:
+        raise ValueError(f"Uitwerkingen cannot be filtered on: {', '.join(sorted(unsupported))}")
+
+
+def niveau_condition(alias: str = 'u') -> str:
+    """SQL condition: the uitwerking is on one of the requested niveaus."""
+    return f"{alias}.niveau_ids::jsonb ?| %(niveau_ids)s"
+
+
+def doelzin_conditions(filters: Optional[Filters], alias: str = 'd') -> Tuple[List[str], Dict]:
+    """SQL conditions on doelzin (as `alias`) plus their placeholder values."""
+    if not filters:
+        return [], {}
+    conditions = [f"{alias}.{field} = ANY(%({field})s)" for field in ('prefix', 'soort', 'status') if field in filters]
+    if 'niveau_ids' in filters:
+        conditions.append(f"""EXISTS (
+            SELECT 1
+            FROM jsonb_array_elements_text({alias}.uitwerking_ids::jsonb) AS niveau_uit_id
+            JOIN uitwerking nu ON nu.fo_id = niveau_uit_id
+            WHERE {niveau_condition('nu')}
+        )""")
+    return conditions, {field: list(values) for field, values in filters.items()}
+
+
+def uitwerking_conditions(filters: Optional[Filters], alias: str = 'u') -> Tuple[List[str], Dict]:
+    """SQL conditions on uitwerking (as `alias`) plus their placeholder values."""
+    check_uitwerking_filters(filters)
+    if not filters:
+        return [], {}
+    conditions = [f"{alias}.{field} = ANY(%({field})s)" for field in ('prefix', 'status') if field in filters]
+    if 'niveau_ids' in filters:
+        conditions.append(niveau_condition(alias))
+    return conditions, {field: list(values) for field, values in filters.items()}
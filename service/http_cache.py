@@ -0,0 +1,57 @@
+"""HTTP caching helpers: strong ETags, Cache-Control and 304 handling."""
+import hashlib
+import json
+from typing import Optional
+from fastapi import Request, Response
+from config import config
+from corpus import get_generation
+from timing import count_cache
+
+
+def make_etag(generation: int, *parts) -> str:
+    """Build a strong ETag from the corpus generation and request parameters."""
+    key = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:24]
+    return f'"g{generation}-{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check the If-None-Match header (weak comparison, as RFC 9110 requires)."""
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    candidates = [tag.strip() for tag in header.split(',')]
+    return any(tag.removeprefix('W/') == etag for tag in candidates)
+
+
+def cache_headers(etag: str) -> dict:
+    """Headers that let browsers and proxies reuse and revalidate a response."""
+    return {
+        'ETag': etag,
+        'Cache-Control': f'public, max-age={config.HTTP_CACHE_MAX_AGE}',
+    }
+
+
+def check_etag(request: Request, response: Response, db, *parts) -> Optional[Response]:
+    """Add caching headers to the response, or return a 304 if the client copy is current.
+
+    The corpus generation is cached in process, so a 304 normally does not
+    touch the database at all.
+    """
+    etag = make_etag(get_generation(db), *parts)
+    headers = cache_headers(etag)
+    hit = etag_matches(request, etag)
+    count_cache('etag', hit)
+    if hit:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+def skip_caching(response: Response):
+    """Drop the caching headers (e.g. for a degraded search that should not be reused)."""
+    if 'etag' in response.headers:
+        del response.headers['etag']
+    response.headers['Cache-Control'] = 'no-store'
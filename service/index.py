@@ -0,0 +1,575 @@
+"""In-memory search engine: embedding matrices and lookup maps per worker.
+
+With SEARCH_ENGINE=memory each worker loads all embeddings into numpy
+matrices (in the background, see warmup.py) and answers vector searches
+with a matrix product instead of a pgvector query. Results have the same
+shape and scores as the SQL implementation in search.py. Until the index
+is loaded, and while a newer corpus generation is loading, search.py
+falls back to (or keeps using the previous) data.
+
+With INDEX_QUANTIZATION=int8 the matrices are also kept as int8 codes
+with a scale per dimension (see quantize.py), a quarter of the memory. A
+search ranks all rows on the approximate int8 scores, then rescores the
+best limit × INDEX_RESCORE_OVERSAMPLE rows exactly on the float vectors,
+so returned similarities are exact. The float matrices are then only read
+for those rows: they stay mmapped from the snapshot, or are moved to an
+unlinked temporary file. At load, recall@10 of the quantized search is
+measured against exact search; below INDEX_MIN_RECALL the index searches
+exactly instead.
+
+The matrices hold the active embedding version (see embedding_versions.py),
+and an index keeps its version until it is replaced: queries searched
+against it are embedded with that version's model.
+
+With SNAPSHOT_PATH set, the embedding matrices are not copied into each
+worker: they are mmapped from the snapshot that ingest writes (see
+snapshot.py), so all workers share them through the page cache. Only the
+metadata (titles, links, filter masks) is loaded per worker. A worker
+reloads when the generation changes or a new snapshot is swapped in, and
+uses the database when the snapshot is missing or out of date.
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import orjson
+from config import config
+from corpus import get_generation
+from embedding_versions import EmbeddingVersion, get_active
+from filters import Filters, check_uitwerking_filters, filter_key
+from quantize import QuantizedMatrix, spill
+from snapshot import Snapshot, file_identity, read_snapshot, write_snapshot
+
+_index = None
+_loading = threading.Lock()
+
+
+def parse_vector(text: str) -> np.ndarray:
+    """Parse a pgvector text literal ('[0.1,0.2,...]')."""
+    return np.array(orjson.loads(text), dtype=np.float32)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def stack(vectors: List[np.ndarray]) -> np.ndarray:
+    """Normalized matrix with one row per vector (0 rows for an empty corpus)."""
+    if not vectors:
+        return np.zeros((0, 0), dtype=np.float32)
+    return normalize_rows(np.vstack(vectors).astype(np.float32))
+
+
+def value_masks(row_values: List) -> Dict[str, np.ndarray]:
+    """Boolean mask per distinct value; a row holds one value or a list of values."""
+    masks = {}
+    for row, values in enumerate(row_values):
+        for value in values if isinstance(values, (list, set)) else [values]:
+            if value is None:
+                continue
+            if value not in masks:
+                masks[value] = np.zeros(len(row_values), dtype=bool)
+            masks[value][row] = True
+    return masks
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first."""
+    if k >= len(scores):
+        return np.argsort(-scores, kind='stable')
+    candidates = np.argpartition(-scores, k)[:k]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+class CorpusIndex:
+    """Normalized embedding matrices plus the metadata needed to build results."""
+
+    def __init__(self, generation: int, doelzinnen: List[Dict], doelzin_matrix: np.ndarray,
+                 uitwerkingen: List[Dict], uitwerking_matrix: np.ndarray, uitwerking_rows: np.ndarray,
+                 uitwerking_filters: List[Dict] = None, snapshot: Optional[Snapshot] = None,
+                 version: Optional[EmbeddingVersion] = None):
+        self.generation = generation
+        self.version = version                  # embedding version the matrices hold; queries use its model
+        self.snapshot = snapshot                # mapped snapshot the matrices are views on, if any
+        self.snapshot_seen = snapshot.identity if snapshot else None  # snapshot file present at load time
+        self.doelzinnen = doelzinnen            # one dict per doelzin_matrix row
+        self.doelzin_matrix = doelzin_matrix
+        self.uitwerkingen = uitwerkingen        # all uitwerkingen, embedded or not
+        self.uitwerking_matrix = uitwerking_matrix
+        self.uitwerking_rows = uitwerking_rows  # uitwerking_matrix row → index in uitwerkingen
+        self.loaded_at = time.time()
+        # status and niveau_ids per uitwerking (filter-only, not part of results)
+        uitwerking_filters = uitwerking_filters or [{} for _ in uitwerkingen]
+
+        by_fo_id = {u['fo_id']: i for i, u in enumerate(uitwerkingen)}
+        matrix_row = {int(u): row for row, u in enumerate(uitwerking_rows)}
+
+        # Embedded uitwerkingen per doelzin, flattened for np.maximum.reduceat
+        links, starts, linked, doelzin_niveaus = [], [], [], []
+        for d_index, doelzin in enumerate(doelzinnen):
+            linked_uitwerkingen = [by_fo_id[fo_id] for fo_id in doelzin['uitwerking_ids'] if fo_id in by_fo_id]
+            doelzin['uitwerking_texts'] = [
+                uitwerkingen[u]['description'] for u in linked_uitwerkingen if uitwerkingen[u]['description']
+            ]
+            doelzin_niveaus.append({
+                niveau for u in linked_uitwerkingen for niveau in uitwerking_filters[u].get('niveau_ids') or []
+            })
+            rows = [matrix_row[u] for u in linked_uitwerkingen if u in matrix_row]
+            if rows:
+                starts.append(len(links))
+                linked.append(d_index)
+                links.extend(rows)
+        self._links = np.array(links, dtype=np.int64)
+        self._starts = np.array(starts, dtype=np.int64)
+        self._linked = np.array(linked, dtype=np.int64)
+        # The same links per doelzin, for rescoring a shortlist: self._links[start:stop]
+        self._link_start = np.zeros(len(doelzinnen), dtype=np.int64)
+        self._link_stop = np.zeros(len(doelzinnen), dtype=np.int64)
+        self._link_start[self._linked] = self._starts
+        self._link_stop[self._linked] = np.append(self._starts[1:], len(self._links))
+
+        # Int8 codes per matrix when quantized (see quantize())
+        self._codes: Dict[str, QuantizedMatrix] = {}
+        self.recall: Dict[str, float] = {}
+
+        # Boolean masks per filter value, so filtered searches cost the same as unfiltered ones
+        self._masks = {
+            'doelzin': {
+                'prefix': value_masks([d['prefix'] for d in doelzinnen]),
+                'soort': value_masks([d['soort'] for d in doelzinnen]),
+                'status': value_masks([d.get('status') for d in doelzinnen]),
+                'niveau_ids': value_masks(doelzin_niveaus),
+            },
+            'uitwerking': {
+                'prefix': value_masks([uitwerkingen[u]['prefix'] for u in uitwerking_rows]),
+                'status': value_masks([uitwerking_filters[u].get('status') for u in uitwerking_rows]),
+                'niveau_ids': value_masks([uitwerking_filters[u].get('niveau_ids') or [] for u in uitwerking_rows]),
+            },
+        }
+        self._combined_masks: Dict = {}
+
+    @classmethod
+    def load(cls, db, snapshot: Optional[Snapshot] = None) -> 'CorpusIndex':
+        """Read the metadata from the database, and the embeddings from the snapshot or database."""
+        generation = get_generation(db)
+        version = get_active(db)
+        if snapshot is not None:
+            try:
+                snapshot.check(generation, version.model)
+            except ValueError as e:
+                print(f"⚠️  {e}; loading embeddings from the database")
+                snapshot = None
+        d_rows, u_rows = cls._select(db, version, embeddings=snapshot is None)
+
+        doelzinnen = [
+            {'id': r[0], 'fo_id': r[1], 'title': r[2], 'description': r[3], 'prefix': r[4],
+             'soort': r[5], 'uitwerking_ids': r[6] or [], 'status': r[7]}
+            for r in d_rows
+        ]
+        uitwerkingen = [
+            {'id': r[0], 'fo_id': r[1], 'title': r[2], 'description': r[3], 'prefix': r[4]}
+            for r in u_rows
+        ]
+        uitwerking_filters = [{'status': r[5], 'niveau_ids': r[6] or []} for r in u_rows]
+        embedded = [i for i, r in enumerate(u_rows) if r[7] is not None]
+
+        if snapshot is not None:
+            arrays = snapshot.arrays
+            if (np.array_equal(arrays['doelzin_ids'], [r[0] for r in d_rows])
+                    and np.array_equal(arrays['uitwerking_ids'], [u_rows[i][0] for i in embedded])):
+                return cls(generation, doelzinnen, arrays['doelzin_matrix'], uitwerkingen,
+                           arrays['uitwerking_matrix'], np.array(embedded, dtype=np.int64),
+                           uitwerking_filters, snapshot, version)
+            print("⚠️  Snapshot rows do not match the database; loading embeddings from the database")
+            return cls.load(db)
+
+        return cls(
+            generation,
+            doelzinnen,
+            stack([parse_vector(r[8]) for r in d_rows]),
+            uitwerkingen,
+            stack([parse_vector(u_rows[i][7]) for i in embedded]),
+            np.array(embedded, dtype=np.int64),
+            uitwerking_filters,
+            version=version,
+        )
+
+    @staticmethod
+    def _select(db, version: EmbeddingVersion, embeddings: bool = True):
+        """Doelzin and uitwerking rows; the last column holds the embedding (without: non-NULL when embedded)."""
+        d_embedding = "e.embedding::text" if embeddings else "NULL"
+        u_embedding = "e.embedding::text" if embeddings else "e.uitwerking_id"
+        d_rows = db.executesql(f"""
+            SELECT d.id, d.fo_id, d.title, d.description, d.prefix, d.soort, d.uitwerking_ids,
+                   d.status, {d_embedding}
+            FROM doelzin d
+            JOIN {version.doelzin_table} e ON e.doelzin_id = d.id
+            ORDER BY d.id
+        """)
+        u_rows = db.executesql(f"""
+            SELECT u.id, u.fo_id, u.title, u.description, u.prefix, u.status, u.niveau_ids,
+                   {u_embedding}
+            FROM uitwerking u
+            LEFT JOIN {version.uitwerking_table} e ON e.uitwerking_id = u.id
+            ORDER BY u.id
+        """)
+        db.commit()
+        return d_rows, u_rows
+
+    def _query(self, embedding) -> np.ndarray:
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        return query / norm if norm else query
+
+    @staticmethod
+    def _scores(matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return matrix @ query if len(matrix) else np.zeros(0, dtype=np.float32)
+
+    def mask(self, kind: str, filters: Optional[Filters]) -> Optional[np.ndarray]:
+        """Rows of the doelzin or uitwerking matrix that pass the filters (None: all)."""
+        if not filters:
+            return None
+        key = (kind, filter_key(filters))
+        combined = self._combined_masks.get(key)
+        if combined is None:
+            masks = self._masks[kind]
+            size = len(self.doelzinnen) if kind == 'doelzin' else len(self.uitwerking_rows)
+            combined = np.ones(size, dtype=bool)
+            for field, values in filters.items():
+                allowed = np.zeros(size, dtype=bool)
+                for value in values:
+                    if value in masks[field]:
+                        allowed |= masks[field][value]
+                combined &= allowed
+            if len(self._combined_masks) >= 1024:
+                self._combined_masks.clear()
+            self._combined_masks[key] = combined
+        return combined
+
+    @staticmethod
+    def _apply(scores: np.ndarray, mask: Optional[np.ndarray]) -> np.ndarray:
+        """Scores with filtered-out rows at -inf (below any threshold)."""
+        return scores if mask is None else np.where(mask, scores, -np.inf)
+
+    def doelzin_scores(self, query: np.ndarray) -> np.ndarray:
+        return self._scores(self.doelzin_matrix, query)
+
+    def uitwerking_scores(self, query: np.ndarray, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Best linked-uitwerking similarity per doelzin (0 without embedded uitwerkingen).
+
+        With a mask, only the uitwerkingen it selects count.
+        """
+        return self._best_linked(self._scores(self.uitwerking_matrix, query), mask)
+
+    def _best_linked(self, sims: np.ndarray, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Per doelzin the best of the given uitwerking similarities (as uitwerking_scores)."""
+        best = np.zeros(len(self.doelzinnen), dtype=np.float32)
+        if len(self._links):
+            sims = self._apply(sims, mask)
+            best[self._linked] = np.maximum.reduceat(sims[self._links], self._starts)
+            if mask is not None:
+                best[np.isneginf(best)] = 0.0
+        return best
+
+    def _exact_linked(self, rows: np.ndarray, query: np.ndarray, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """uitwerking_scores for some doelzinnen only, from the float vectors of their uitwerkingen."""
+        best = np.zeros(len(rows), dtype=np.float32)
+        starts, stops = self._link_start[rows], self._link_stop[rows]
+        linked = stops > starts
+        if linked.any():
+            segments = [self._links[start:stop] for start, stop in zip(starts[linked], stops[linked])]
+            links = np.concatenate(segments)
+            sims = self._apply(self.uitwerking_matrix[links] @ query, None if mask is None else mask[links])
+            offsets = np.cumsum([0] + [len(segment) for segment in segments[:-1]])
+            best[linked] = np.maximum.reduceat(sims, offsets)
+            best[np.isneginf(best)] = 0.0
+        return best
+
+    @property
+    def quantized(self) -> bool:
+        return bool(self._codes)
+
+    def _matrix(self, kind: str) -> np.ndarray:
+        return self.doelzin_matrix if kind == 'doelzin' else self.uitwerking_matrix
+
+    def _first_pass(self, kind: str, queries: np.ndarray) -> np.ndarray:
+        """Scores of one query (rows,) or several (rows, queries): approximate when quantized."""
+        if kind in self._codes:
+            return self._codes[kind].scores(queries)
+        matrix = self._matrix(kind)
+        if not len(matrix):
+            return np.zeros((0,) + queries.shape[:-1], dtype=np.float32)
+        return matrix @ queries.T
+
+    def _shortlist(self, scores: np.ndarray, limit: int) -> np.ndarray:
+        """Rows worth rescoring exactly: the best limit × INDEX_RESCORE_OVERSAMPLE, without filtered-out rows."""
+        rows = top_k(scores, limit * max(config.INDEX_RESCORE_OVERSAMPLE, 1))
+        return rows[~np.isneginf(scores[rows])]
+
+    def _rank(self, kind: str, query: np.ndarray, scores: np.ndarray, mask: Optional[np.ndarray],
+              limit: int) -> Tuple[np.ndarray, np.ndarray]:
+        """The `limit` best rows by exact score, best first, and their exact scores.
+
+        `scores` come from _first_pass; approximate ones are only used to pick
+        the shortlist that is rescored.
+        """
+        scores = self._apply(scores, mask)
+        if kind not in self._codes:
+            rows = top_k(scores, limit)
+            return rows, scores[rows]
+        shortlist = self._shortlist(scores, limit)
+        exact = self._matrix(kind)[shortlist] @ query
+        order = top_k(exact, limit)
+        return shortlist[order], exact[order]
+
+    def search_combined(self, embedding, limit: int = 10, threshold: float = 0.0,
+                        doelzin_weight: float = 0.7, filters: Optional[Filters] = None) -> List[Dict]:
+        """Same results as search.search_combined."""
+        query = self._query(embedding)
+        niveau_mask = None
+        if filters and 'niveau_ids' in filters:
+            niveau_mask = self.mask('uitwerking', {'niveau_ids': filters['niveau_ids']})
+        doelzin_sim = self._first_pass('doelzin', query)
+        uitwerking_sim = self._best_linked(self._first_pass('uitwerking', query), niveau_mask)
+        combined = self._apply(
+            doelzin_weight * doelzin_sim + (1 - doelzin_weight) * uitwerking_sim,
+            self.mask('doelzin', filters)
+        )
+
+        if self.quantized:
+            # Rescore the shortlist exactly; its similarities replace the approximate ones
+            rows = self._shortlist(combined, limit)
+            doelzin_sim = self.doelzin_matrix[rows] @ query
+            uitwerking_sim = self._exact_linked(rows, query, niveau_mask)
+            exact = doelzin_weight * doelzin_sim + (1 - doelzin_weight) * uitwerking_sim
+            order = top_k(exact, limit)
+            ranked = zip(rows[order], order)
+            combined = np.full(len(self.doelzinnen), -np.inf, dtype=np.float32)
+            combined[rows] = exact
+        else:
+            ranked = ((i, i) for i in top_k(combined, limit))
+
+        results = []
+        for i, j in ranked:
+            if combined[i] < threshold:
+                break
+            doelzin = self.doelzinnen[i]
+            results.append({
+                'id': doelzin['id'],
+                'fo_id': doelzin['fo_id'],
+                'title': doelzin['title'],
+                'description': doelzin['description'],
+                'prefix': doelzin['prefix'],
+                'soort': doelzin['soort'],
+                'doelzin_similarity': float(doelzin_sim[j]),
+                'uitwerking_similarity': float(uitwerking_sim[j]),
+                'similarity': float(combined[i]),
+                'uitwerking_texts': list(doelzin['uitwerking_texts']),
+            })
+        return results
+
+    def search_doelzinnen(self, embedding, limit: int = 10, threshold: float = 0.0,
+                          filters: Optional[Filters] = None) -> List[Dict]:
+        """Same results as search.search_doelzinnen."""
+        query = self._query(embedding)
+        return self._doelzin_results(query, self._first_pass('doelzin', query), limit, threshold, filters)
+
+    def search_doelzinnen_batch(self, embeddings: List, limit: int = 10, threshold: float = 0.0,
+                                filters: Optional[Filters] = None) -> List[List[Dict]]:
+        """search_doelzinnen for many queries, scored in one pass over the matrix."""
+        if not len(embeddings):
+            return []
+        queries = np.vstack([self._query(embedding) for embedding in embeddings])
+        scores = self._first_pass('doelzin', queries)
+        return [
+            self._doelzin_results(query, scores[:, column], limit, threshold, filters)
+            for column, query in enumerate(queries)
+        ]
+
+    def _doelzin_results(self, query: np.ndarray, scores: np.ndarray, limit: int, threshold: float,
+                         filters: Optional[Filters]) -> List[Dict]:
+        rows, similarities = self._rank('doelzin', query, scores, self.mask('doelzin', filters), limit)
+        results = []
+        for i, similarity in zip(rows, similarities):
+            if similarity < threshold:
+                break
+            doelzin = self.doelzinnen[i]
+            results.append({
+                'id': doelzin['id'],
+                'fo_id': doelzin['fo_id'],
+                'title': doelzin['title'],
+                'description': doelzin['description'],
+                'prefix': doelzin['prefix'],
+                'soort': doelzin['soort'],
+                'similarity': float(similarity),
+            })
+        return results
+
+    def search_uitwerkingen(self, embedding, limit: int = 10, threshold: float = 0.0,
+                            filters: Optional[Filters] = None) -> List[Dict]:
+        """Same results as search.search_uitwerkingen."""
+        check_uitwerking_filters(filters)
+        query = self._query(embedding)
+        rows, similarities = self._rank(
+            'uitwerking', query, self._first_pass('uitwerking', query), self.mask('uitwerking', filters), limit
+        )
+        results = []
+        for row, similarity in zip(rows, similarities):
+            if similarity < threshold:
+                break
+            uitwerking = self.uitwerkingen[self.uitwerking_rows[row]]
+            results.append(dict(uitwerking, similarity=float(similarity)))
+        return results
+
+    def quantize(self, samples: int = 100, k: int = 10):
+        """Switch to int8 codes with exact rescoring, if that keeps recall@k at INDEX_MIN_RECALL.
+
+        Recall is measured against exact search with `samples` queries per
+        matrix, each the mean of two random rows (so not a row itself).
+        """
+        self._codes = {kind: QuantizedMatrix.from_matrix(self._matrix(kind))
+                       for kind in ('doelzin', 'uitwerking') if len(self._matrix(kind))}
+        rng = np.random.default_rng(0)
+        recall = {}
+        for kind, quantized in self._codes.items():
+            matrix = self._matrix(kind)
+            pairs = rng.integers(0, len(matrix), size=(samples, 2))
+            queries = normalize_rows(matrix[pairs[:, 0]] + matrix[pairs[:, 1]])
+            exact, approximate = matrix @ queries.T, quantized.scores(queries)
+            found = 0
+            for column, query in enumerate(queries):
+                truth = top_k(exact[:, column], k)
+                rows, _ = self._rank(kind, query, approximate[:, column], None, k)
+                found += len(np.intersect1d(truth, rows)) / len(truth)
+            recall[kind] = round(found / samples, 4)
+        self.recall = recall
+
+        if any(value < config.INDEX_MIN_RECALL for value in recall.values()):
+            self._codes = {}
+            print(f"⚠️  Int8 recall@{k} {recall} is below INDEX_MIN_RECALL={config.INDEX_MIN_RECALL}; "
+                  f"searching exactly")
+            return
+        if self.snapshot is None:
+            # Rescoring reads a few rows; keep the float vectors out of the process memory
+            self.doelzin_matrix = spill(self.doelzin_matrix)
+            self.uitwerking_matrix = spill(self.uitwerking_matrix)
+
+    def info(self) -> Dict:
+        return {
+            'generation': self.generation,
+            'doelzinnen': len(self.doelzinnen),
+            'uitwerkingen': len(self.uitwerking_rows),
+            # Matrix memory of this worker: the int8 codes when quantized, else the float matrices
+            'bytes': (sum(codes.nbytes for codes in self._codes.values()) if self.quantized
+                      else int(self.doelzin_matrix.nbytes + self.uitwerking_matrix.nbytes)),
+            'quantization': 'int8' if self.quantized else None,
+            'recall': self.recall or None,
+            # mmapped matrices live in the page cache, shared by all workers
+            'shared': self.snapshot is not None,
+            'embedding_version': self.version.id if self.version else None,
+            'loaded_at': self.loaded_at,
+        }
+
+
+def save_snapshot(db, path: str = None) -> Dict:
+    """Write the current embeddings to a snapshot (atomically replacing the previous one)."""
+    path = path or config.SNAPSHOT_PATH
+    generation = get_generation(db)
+    version = get_active(db)
+    d_rows = db.executesql(f"""
+        SELECT d.id, e.embedding::text
+        FROM doelzin d
+        JOIN {version.doelzin_table} e ON e.doelzin_id = d.id
+        ORDER BY d.id
+    """)
+    u_rows = db.executesql(f"""
+        SELECT u.id, e.embedding::text
+        FROM uitwerking u
+        JOIN {version.uitwerking_table} e ON e.uitwerking_id = u.id
+        ORDER BY u.id
+    """)
+    db.commit()
+    size = write_snapshot(path, {
+        'doelzin_ids': np.array([r[0] for r in d_rows], dtype=np.int64),
+        'doelzin_matrix': stack([parse_vector(r[1]) for r in d_rows]),
+        'uitwerking_ids': np.array([r[0] for r in u_rows], dtype=np.int64),
+        'uitwerking_matrix': stack([parse_vector(r[1]) for r in u_rows]),
+    }, generation, version.model)
+    return {'path': path, 'generation': generation, 'doelzinnen': len(d_rows),
+            'uitwerkingen': len(u_rows), 'bytes': size}
+
+
+def _open_snapshot() -> Optional[Snapshot]:
+    """The snapshot at SNAPSHOT_PATH, or None if there is none (or it cannot be used)."""
+    if not config.SNAPSHOT_PATH:
+        return None
+    try:
+        snapshot = read_snapshot(config.SNAPSHOT_PATH)
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        print(f"⚠️  Ignoring snapshot: {e}")
+        return None
+    return snapshot
+
+
+def _snapshot_changed(index: CorpusIndex) -> bool:
+    """A different snapshot file than the one the index was loaded with is in place."""
+    return bool(config.SNAPSHOT_PATH) and file_identity(config.SNAPSHOT_PATH) != index.snapshot_seen
+
+
+def load_index(db) -> CorpusIndex:
+    """(Re)load the index now; concurrent callers wait for the same load."""
+    global _index
+    with _loading:
+        generation = get_generation(db)
+        if _index is None or _index.generation != generation or _snapshot_changed(_index):
+            start = time.perf_counter()
+            # Note the file before opening it, so a swap during the load triggers another reload
+            snapshot_seen = file_identity(config.SNAPSHOT_PATH) if config.SNAPSHOT_PATH else None
+            index = CorpusIndex.load(db, _open_snapshot())
+            index.snapshot_seen = snapshot_seen
+            if config.INDEX_QUANTIZATION == 'int8':
+                index.quantize()
+            _index = index
+            print(f"✅ Loaded in-memory index: {_index.info()} in {time.perf_counter() - start:.1f}s")
+    return _index
+
+
+def _reload_in_background():
+    from database import get_database
+    try:
+        load_index(get_database())
+    except Exception as e:
+        print(f"⚠️  Reloading in-memory index failed: {e}")
+
+
+def get_index(db=None) -> Optional[CorpusIndex]:
+    """The loaded index if SEARCH_ENGINE=memory, else None.
+
+    When the corpus generation has moved on (or a new snapshot was swapped
+    in), a reload starts in the background and the current index keeps
+    serving until it completes.
+    """
+    if config.SEARCH_ENGINE != 'memory' or _index is None:
+        return None
+    stale = db is not None and get_generation(db) != _index.generation
+    if (stale or _snapshot_changed(_index)) and not _loading.locked():
+        threading.Thread(target=_reload_in_background, name='index-reload', daemon=True).start()
+    return _index
+
+
+def is_loaded() -> bool:
+    return _index is not None
+
+
+if __name__ == '__main__':
+    # Write a snapshot of the current corpus without re-ingesting: python index.py [path]
+    import sys
+    from database import get_database
+    path = sys.argv[1] if len(sys.argv) > 1 else config.SNAPSHOT_PATH
+    if not path:
+        sys.exit("Set SNAPSHOT_PATH or pass the snapshot path")
+    print(f"✅ Wrote embedding snapshot: {save_snapshot(get_database(), path)}")
@@ -13,6 +13,7 @@ log("Starting ingest script...")
 log("Importing modules...")
 from models import get_db
 from embeddings import create_embeddings_batch, combine_text_for_embedding
+from embedding_versions import store_embeddings, refresh_progress, target_versions
 log("✓ Modules imported")
 
 
@@ -22,7 +23,29 @@ def load_json(filepath: Path) -> list:
         return json.load(f)
 
 
-def ingest_doelzinnen(db, data_dir: Path, model_name=None):
+def embed_into_versions(db, kind: str, ids: list, texts: list, versions=None):
+    """Embed texts with the model of every target version and store them in its tables.
+    
+    The active version comes first; versions that are building or ready
+    (see embedding_versions.py) are kept up to date as well.
+    """
+    for version in versions or target_versions(db):
+        log(f"Generating {kind} embeddings using model: {version.model} (version {version.id}, {version.status})")
+        log(f"Total texts to embed: {len(texts)}")
+        embeddings = create_embeddings_batch(texts, version.model, dimensions=version.dimensions)
+        log(f"✓ Generated {len(embeddings)} embeddings")
+        
+        # Store with batch commits for progress tracking
+        log("Storing embeddings in database...")
+        for i in range(0, len(ids), 100):
+            store_embeddings(db, version, kind, ids[i:i + 100], embeddings[i:i + 100])
+            db.commit()
+            log(f"  Stored {min(i + 100, len(ids))}/{len(embeddings)} embeddings")
+        refresh_progress(db, version)
+        db.commit()
+
+
+def ingest_doelzinnen(db, data_dir: Path, versions=None):
     """Ingest doelzinnen with embeddings."""
     log(f"Reading doelzinnen from {data_dir / 'doelzinnen.json'}")
     doelzinnen = load_json(data_dir / 'doelzinnen.json')
@@ -61,36 +84,11 @@ def ingest_doelzinnen(db, data_dir: Path, model_name=None):
     
     db.commit()
     
-    # Generate embeddings in batch
-    model = model_name or config.EMBEDDING_MODEL
-    log(f"Generating embeddings using model: {model}")
-    log(f"Total texts to embed: {len(texts)}")
-    embeddings = create_embeddings_batch(texts, model)
-    log(f"✓ Generated {len(embeddings)} embeddings")
-    
-    # Insert embeddings with batch commits
-    log("Storing embeddings in database...")
-    for i, (doelzin_id, embedding) in enumerate(zip(inserted_ids, embeddings)):
-        existing = db(db.doelzin_embedding.doelzin_id == doelzin_id).select().first()
-        if existing:
-            db(db.doelzin_embedding.doelzin_id == doelzin_id).update(embedding=embedding)
-        else:
-            db.doelzin_embedding.insert(
-                doelzin_id=doelzin_id, 
-                embedding_model=model,
-                embedding=embedding
-            )
-        
-        # Commit every 100 records for progress tracking
-        if (i + 1) % 100 == 0:
-            db.commit()
-            log(f"  Stored {i + 1}/{len(embeddings)} embeddings")
-    
-    db.commit()
+    embed_into_versions(db, 'doelzin', inserted_ids, texts, versions)
     print(f"✓ Loaded {len(doelzinnen)} doelzinnen with embeddings")
 
 
-def ingest_uitwerkingen(db, data_dir: Path, model_name=None):
+def ingest_uitwerkingen(db, data_dir: Path, versions=None):
     """Ingest uitwerkingen with embeddings."""
     uitwerkingen = load_json(data_dir / 'uitwerkingen.json')
     
@@ -127,29 +125,12 @@ def ingest_uitwerkingen(db, data_dir: Path, model_name=None):
     
     db.commit()
     
-    # Generate embeddings
-    model = model_name or config.EMBEDDING_MODEL
-    print("Generating embeddings...")
-    embeddings = create_embeddings_batch(texts, model)
-    
-    # Insert embeddings
-    print("Storing embeddings...")
-    for uitwerking_id, embedding in zip(inserted_ids, embeddings):
-        existing = db(db.uitwerking_embedding.uitwerking_id == uitwerking_id).select().first()
-        if existing:
-            db(db.uitwerking_embedding.uitwerking_id == uitwerking_id).update(embedding=embedding)
-        else:
-            db.uitwerking_embedding.insert(
-                uitwerking_id=uitwerking_id,
-                embedding_model=model,
-                embedding=embedding
-            )
-    
-    db.commit()
+    embed_into_versions(db, 'uitwerking', inserted_ids, texts, versions)
     print(f"✓ Loaded {len(uitwerkingen)} uitwerkingen with embeddings")
 
 
 from config import config
+from corpus import record_ingest
 
 def main(data_dir=None, db_uri=None):
     """Run full ingestion pipeline."""
@@ -157,8 +138,27 @@ def main(data_dir=None, db_uri=None):
     db = get_db(db_uri)
     data_path = Path(data_dir)
     
-    ingest_doelzinnen(db, data_path)
-    ingest_uitwerkingen(db, data_path)
+    versions = target_versions(db)
+    ingest_doelzinnen(db, data_path, versions)
+    ingest_uitwerkingen(db, data_path, versions)
+    
+    # Before bumping the generation, so cached responses never pair the new corpus with the old graph
+    from related import build_related
+    log(f"✓ Stored {build_related(db)} related-doelzin links")
+    
+    # Record counts for /api/stats and invalidate caches keyed on the corpus
+    generation = record_ingest(db)
+    log(f"✓ Corpus generation is now {generation}")
+    
+    if config.SNAPSHOT_PATH:
+        # Workers with SEARCH_ENGINE=memory pick up the new snapshot without a restart
+        from index import save_snapshot
+        try:
+            snapshot = save_snapshot(db, config.SNAPSHOT_PATH)
+            log(f"✓ Wrote embedding snapshot: {snapshot}")
+        except OSError as e:
+            # The corpus is committed; workers load the embeddings from the database instead
+            log(f"⚠️  Writing the embedding snapshot failed: {e}")
     
     print("\n✓ Ingestion complete!")
     db.close()
@@ -1,125 +1,442 @@
-"""MCP Server for SLO Curriculum Search - API Proxy Version.
+"""MCP Server for SLO Curriculum Search.
 
-Proxies requests to the FastAPI server instead of direct database access.
+Runs in one of two modes (MCP_MODE):
+- inprocess: calls the search library directly, sharing the database pool
+  and in-process caches with the rest of the service
+- proxy (default): forwards tool calls to the FastAPI server over a pooled
+  async HTTP client, for deployments where the MCP server runs separately
 """
-from fastmcp import FastMCP
-import requests
-import json
+import asyncio
 import os
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from fastmcp import FastMCP, Context
+import httpx
+import orjson
+import cursors
+from cache import TTLCache
 
 # Initialize MCP server
 mcp = FastMCP("slo-curriculum-search")
 
-# API base URL (configurable via environment)
+# Backend mode and API base URL (configurable via environment)
+MCP_MODE = os.getenv("MCP_MODE", "proxy")
 API_BASE = os.getenv("API_BASE_URL", "http://localhost:8000/api")
 
 
+# Pagination: how many pages of results are cached, and for how long (seconds)
+RESULT_CACHE_SIZE = int(os.getenv("MCP_RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_TTL = float(os.getenv("MCP_RESULT_CACHE_TTL", "600"))
+
+# Compact records truncate descriptions to this many characters
+DESCRIPTION_CHARS = int(os.getenv("MCP_DESCRIPTION_CHARS", "200"))
+
+# Seconds the corpus generation is reused before the backend is asked again
+GENERATION_TTL = float(os.getenv("MCP_GENERATION_TTL", "5"))
+
+# Full result sets per query and corpus generation, so later pages don't re-run the search
+_result_sets = TTLCache(maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
+
+
+def dumps(payload) -> str:
+    """Serialize a tool result (compact JSON, non-ASCII kept as-is)."""
+    return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+
+def api_params(params: Dict) -> Dict:
+    """Translate tool arguments to REST query parameters."""
+    translated = {key: value for key, value in params.items() if key != "query"}
+    translated["q"] = params["query"]
+    if "rerank" in translated:
+        translated["rerank"] = str(translated["rerank"]).lower()
+    return translated
+
+
+def filter_params(**filters: Optional[List[str]]) -> Dict:
+    """Tool filter arguments as comma-separated parameters (omitted when empty)."""
+    return {field: ",".join(values) for field, values in filters.items() if values}
+
+
+def compact_record(result: Dict) -> Dict:
+    """Reduce a search result to the fields an assistant needs to pick from."""
+    description = result.get("description") or ""
+    if len(description) > DESCRIPTION_CHARS:
+        description = description[:DESCRIPTION_CHARS].rstrip() + "…"
+    return {
+        "id": result["id"],
+        "fo_id": result["fo_id"],
+        "title": result["title"],
+        "score": round(result["similarity"], 3),
+        "description": description,
+    }
+
+
+# Parameters each paginated tool stores in its cursors
+CURSOR_PARAMS = {
+    "search": {"query", "limit", "threshold", "weight", "rerank", "prefix", "soort", "status", "niveau_ids",
+               "budget_ms"},
+    "search_goals": {"query", "limit", "threshold", "prefix", "soort", "status", "niveau_ids"},
+    "search_elaborations": {"query", "limit", "threshold", "prefix", "status", "niveau_ids"},
+}
+
+
+def encode_cursor(tool: str, params: Dict, offset: int, generation: int) -> str:
+    """Opaque, signed cursor; carries the search parameters so it survives cache eviction."""
+    return cursors.encode_cursor({"t": tool, "p": params, "o": offset, "g": generation})
+
+
+def decode_cursor(tool: str, cursor: str) -> Tuple[Dict, int, int]:
+    """Parameters, offset and corpus generation of a cursor produced by encode_cursor for the same tool."""
+    payload = cursors.decode_cursor(cursor)
+    try:
+        params, offset, generation = payload["p"], int(payload["o"]), int(payload["g"])
+        if (payload["t"] != tool or offset < 0 or not isinstance(params, dict) or "query" not in params
+                or not set(params) <= CURSOR_PARAMS[tool]):
+            raise ValueError
+        return params, offset, generation
+    except (ValueError, KeyError, TypeError):
+        raise ValueError(cursors.INVALID) from None
+
+
+async def paginate(
+    tool: str,
+    params: Dict,
+    page_size: int,
+    cursor: Optional[str],
+    fetch: Callable[[Dict], Awaitable[Tuple[List[Dict], List[str]]]]
+) -> str:
+    """Return one page of compact records from the (cached) full result set.
+
+    fetch returns the results and the degradations applied to meet the
+    latency budget. Degraded result sets are not cached, so later calls get
+    a full ranking again.
+    """
+    offset = 0
+    generation = await backend.generation()
+    if cursor:
+        params, offset, cursor_generation = decode_cursor(tool, cursor)
+        if cursor_generation != generation:
+            raise ValueError(cursors.STALE)
+
+    key = (tool, orjson.dumps(params, option=orjson.OPT_SORT_KEYS), generation)
+    results = _result_sets.get(key)
+    if results is None:
+        results, degradations = await fetch(params)
+        if not degradations:
+            _result_sets.set(key, results)
+
+    page = results[offset:offset + page_size]
+    next_offset = offset + len(page)
+    return dumps({
+        "query": params["query"],
+        "total": len(results),
+        "offset": offset,
+        "results": [compact_record(result) for result in page],
+        "next_cursor": encode_cursor(tool, params, next_offset, generation) if next_offset < len(results) else None,
+    })
+
+
+class ProxyBackend:
+    """Forward tool calls to the REST API over one pooled HTTP client."""
+
+    def __init__(self, base_url: str):
+        self.client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/") + "/",
+            timeout=httpx.Timeout(120.0, connect=5.0),
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+        )
+        self._generation = None  # (monotonic time read, generation)
+
+    async def get(self, path: str, params: Dict = None) -> httpx.Response:
+        response = await self.client.get(path, params=params)
+        response.raise_for_status()
+        return response
+
+    async def generation(self) -> int:
+        """The corpus generation, from /api/stats (reused for MCP_GENERATION_TTL seconds)."""
+        now = time.monotonic()
+        if self._generation is None or now - self._generation[0] >= GENERATION_TTL:
+            response = await self.get("stats")
+            self._generation = (now, orjson.loads(response.content)["generation"])
+        return self._generation[1]
+
+    async def search_events(self, params: Dict) -> AsyncIterator[Dict]:
+        """Yield events from the streaming search endpoint."""
+        timeout = self.client.timeout
+        if params.get("budget_ms"):
+            # The API degrades to meet the budget; allow a little extra for the transfer
+            timeout = httpx.Timeout(params["budget_ms"] / 1000 + 5.0, connect=5.0)
+        params = dict(api_params(params), view="compact")
+        async with self.client.stream("GET", "search/stream", params=params, timeout=timeout) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line:
+                    yield orjson.loads(line)
+
+    async def search_goals(self, params: Dict) -> List[Dict]:
+        response = await self.get("search/doelzinnen", dict(api_params(params), view="compact"))
+        return orjson.loads(response.content)["results"]
+
+    async def search_elaborations(self, params: Dict) -> List[Dict]:
+        response = await self.get("search/uitwerkingen", dict(api_params(params), view="compact"))
+        return orjson.loads(response.content)["results"]
+
+    async def get_goals(self, doelzin_ids: List[int]) -> str:
+        # Pass the API body through unchanged
+        response = await self.get("doelzinnen", {"ids": ",".join(map(str, doelzin_ids))})
+        return response.text
+
+    async def stats(self) -> str:
+        return (await self.get("stats")).text
+
+
+class InProcessBackend:
+    """Call the search library directly in worker threads."""
+
+    def __init__(self):
+        import warmup
+        warmup.start()
+
+    @property
+    def db(self):
+        from database import get_database
+        return get_database()
+
+    async def generation(self) -> int:
+        from corpus import get_generation
+        return await asyncio.to_thread(get_generation, self.db)
+
+    async def search_events(self, params: Dict) -> AsyncIterator[Dict]:
+        """Yield events from the search pipeline without blocking the event loop."""
+        from pipeline import stream_search
+        from filters import pop_filters
+        from budget import Budget
+        from config import config
+        params = dict(params)
+        budget_ms = params.pop("budget_ms", None)
+        budget = Budget(config.SEARCH_BUDGET_MS if budget_ms is None else budget_ms)
+        # Retrieval runs when stream_search is called, the rerank as events are consumed
+        events = await asyncio.to_thread(
+            stream_search, self.db, filters=pop_filters(params), budget=budget, **params
+        )
+        while True:
+            event = await asyncio.to_thread(next, events, None)
+            if event is None:
+                break
+            yield event
+
+    async def search_goals(self, params: Dict) -> List[Dict]:
+        from search import search_doelzinnen
+        from filters import pop_filters
+        params = dict(params)
+        return await asyncio.to_thread(search_doelzinnen, self.db, filters=pop_filters(params), **params)
+
+    async def search_elaborations(self, params: Dict) -> List[Dict]:
+        from search import search_uitwerkingen
+        from filters import pop_filters
+        params = dict(params)
+        return await asyncio.to_thread(search_uitwerkingen, self.db, filters=pop_filters(params), **params)
+
+    async def get_goals(self, doelzin_ids: List[int]) -> str:
+        from search import get_doelzinnen_with_uitwerkingen
+        results = await asyncio.to_thread(get_doelzinnen_with_uitwerkingen, self.db, doelzin_ids)
+        found = {result["id"] for result in results}
+        return dumps({
+            "count": len(results),
+            "results": results,
+            "missing": [doelzin_id for doelzin_id in doelzin_ids if doelzin_id not in found]
+        })
+
+    async def stats(self) -> str:
+        from corpus import get_stats
+        return dumps(await asyncio.to_thread(get_stats, self.db))
+
+
+backend = InProcessBackend() if MCP_MODE == "inprocess" else ProxyBackend(API_BASE)
+
+
 @mcp.tool()
-def search(
+async def search(
     query: str,
     limit: int = 100,
     threshold: float = 0.4,
     weight: float = 0.7,
-    rerank: bool = True
+    rerank: bool = True,
+    prefix: Optional[List[str]] = None,
+    soort: Optional[List[str]] = None,
+    status: Optional[List[str]] = None,
+    niveau_ids: Optional[List[str]] = None,
+    budget_ms: Optional[int] = None,
+    page_size: int = 10,
+    cursor: Optional[str] = None,
+    ctx: Context = None
 ) -> str:
     """Search SLO curriculum (doelzinnen and uitwerkingen).
-    
+
+    Returns compact records (id, fo_id, title, score, truncated description),
+    one page at a time. Use get_goals for full details of interesting hits.
+
     Args:
         query: Search query
-        limit: Max results (default: 100)
+        limit: Max results in the full result set (default: 100)
         threshold: Min similarity 0-1 (default: 0.4)
         weight: Doelzin weight 0-1 (default: 0.7)
         rerank: Use LLM re-ranking (default: True)
-    
+        prefix: Only goals with one of these prefixes
+        soort: Only goals of one of these kinds (soort)
+        status: Only goals with one of these statuses
+        niveau_ids: Only goals with an elaboration on one of these niveaus
+        budget_ms: Latency budget in ms; rerank is cut short to meet it (default: server setting)
+        page_size: Results per page (default: 10)
+        cursor: next_cursor from a previous call, to fetch the next page
+
     Returns:
-        JSON with search results
+        JSON with one page of results and next_cursor (null on the last page)
     """
-    response = requests.get(f"{API_BASE}/search", params={
-        "q": query,
+    async def fetch(params: Dict) -> Tuple[List[Dict], List[str]]:
+        # Consume the streaming pipeline so rerank progress reaches the client
+        final = None
+        async for event in backend.search_events(params):
+            if event["event"] == "rerank" and ctx:
+                await ctx.report_progress(event["scored"], event["total"])
+            elif event["event"] == "final":
+                final = event
+
+        if final is None:
+            raise RuntimeError("Search stream ended without a final result")
+        degradations = final.get("degradations") or []
+        if degradations and ctx:
+            await ctx.warning(f"Latency budget reached: {', '.join(degradations)}")
+        return final["results"], degradations
+
+    params = {
+        "query": query,
         "limit": limit,
         "threshold": threshold,
         "weight": weight,
-        "rerank": str(rerank).lower()
-    }, timeout=120)
-    response.raise_for_status()
-    return json.dumps(response.json(), indent=2, ensure_ascii=False)
+        "rerank": rerank,
+        **filter_params(prefix=prefix, soort=soort, status=status, niveau_ids=niveau_ids)
+    }
+    if budget_ms is not None:
+        params["budget_ms"] = budget_ms
+    return await paginate("search", params, page_size, cursor, fetch)
 
 
 @mcp.tool()
-def search_goals(
+async def search_goals(
     query: str,
     limit: int = 10,
-    threshold: float = 0.0
+    threshold: float = 0.0,
+    prefix: Optional[List[str]] = None,
+    soort: Optional[List[str]] = None,
+    status: Optional[List[str]] = None,
+    niveau_ids: Optional[List[str]] = None,
+    page_size: int = 10,
+    cursor: Optional[str] = None
 ) -> str:
     """Search only in learning goals (doelzinnen).
-    
+
     Args:
         query: Search query
         limit: Max results
         threshold: Min similarity
-    
+        prefix: Only goals with one of these prefixes
+        soort: Only goals of one of these kinds (soort)
+        status: Only goals with one of these statuses
+        niveau_ids: Only goals with an elaboration on one of these niveaus
+        page_size: Results per page (default: 10)
+        cursor: next_cursor from a previous call, to fetch the next page
+
     Returns:
-        JSON with results
+        JSON with one page of compact results and next_cursor
     """
-    response = requests.get(f"{API_BASE}/search/doelzinnen", params={
-        "q": query,
+    params = {
+        "query": query,
         "limit": limit,
-        "threshold": threshold
-    }, timeout=60)
-    response.raise_for_status()
-    return json.dumps(response.json(), indent=2, ensure_ascii=False)
+        "threshold": threshold,
+        **filter_params(prefix=prefix, soort=soort, status=status, niveau_ids=niveau_ids)
+    }
+    async def fetch(params: Dict) -> Tuple[List[Dict], List[str]]:
+        return await backend.search_goals(params), []
+
+    return await paginate("search_goals", params, page_size, cursor, fetch)
 
 
 @mcp.tool()
-def search_elaborations(
+async def search_elaborations(
     query: str,
     limit: int = 10,
-    threshold: float = 0.0
+    threshold: float = 0.0,
+    prefix: Optional[List[str]] = None,
+    status: Optional[List[str]] = None,
+    niveau_ids: Optional[List[str]] = None,
+    page_size: int = 10,
+    cursor: Optional[str] = None
 ) -> str:
     """Search only in elaborations (uitwerkingen).
-    
+
     Args:
         query: Search query
         limit: Max results
         threshold: Min similarity
-    
+        prefix: Only elaborations with one of these prefixes
+        status: Only elaborations with one of these statuses
+        niveau_ids: Only elaborations on one of these niveaus
+        page_size: Results per page (default: 10)
+        cursor: next_cursor from a previous call, to fetch the next page
+
     Returns:
-        JSON with results
+        JSON with one page of compact results and next_cursor
     """
-    response = requests.get(f"{API_BASE}/search/uitwerkingen", params={
-        "q": query,
+    params = {
+        "query": query,
         "limit": limit,
-        "threshold": threshold
-    }, timeout=60)
-    response.raise_for_status()
-    return json.dumps(response.json(), indent=2, ensure_ascii=False)
+        "threshold": threshold,
+        **filter_params(prefix=prefix, status=status, niveau_ids=niveau_ids)
+    }
+    async def fetch(params: Dict) -> Tuple[List[Dict], List[str]]:
+        return await backend.search_elaborations(params), []
+
+    return await paginate("search_elaborations", params, page_size, cursor, fetch)
 
 
 @mcp.tool()
-def get_goal(doelzin_id: int) -> str:
+async def get_goal(doelzin_id: int) -> str:
     """Get a specific learning goal with all its elaborations.
-    
+
     Args:
         doelzin_id: Learning goal ID
-    
+
     Returns:
         JSON with goal and elaborations
     """
-    response = requests.get(f"{API_BASE}/doelzin/{doelzin_id}", timeout=30)
-    response.raise_for_status()
-    return json.dumps(response.json(), indent=2, ensure_ascii=False)
+    result = orjson.loads(await backend.get_goals([doelzin_id]))
+    if not result["results"]:
+        raise ValueError(f"Doelzin {doelzin_id} not found")
+    return dumps(result["results"][0])
 
 
 @mcp.tool()
-def stats() -> str:
+async def get_goals(doelzin_ids: List[int]) -> str:
+    """Get full details for several learning goals at once (e.g. search hits).
+
+    Args:
+        doelzin_ids: Learning goal IDs
+
+    Returns:
+        JSON with the goals, their elaborations and any missing IDs
+    """
+    return await backend.get_goals(doelzin_ids)
+
+
+@mcp.tool()
+async def stats() -> str:
     """Get database statistics.
-    
+
     Returns:
         JSON with counts
     """
-    response = requests.get(f"{API_BASE}/stats", timeout=10)
-    response.raise_for_status()
-    return json.dumps(response.json(), indent=2, ensure_ascii=False)
+    return await backend.stats()
 
 
 if __name__ == "__main__":
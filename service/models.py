@@ -2,15 +2,18 @@
 from pydal import DAL, Field
 from config import config
 
-def get_db(db_uri=None, fake_migrate=False):
+def get_db(db_uri=None, fake_migrate=False, migrate=True):
     """Initialize database with curriculum tables.
     
     Args:
         db_uri: Database connection string
         fake_migrate: If True, recreate .table files without running migrations
+        migrate: If False, assume the tables exist (no DDL, no .table files)
     """
     db_uri = db_uri or config.DATABASE_URI
-    db = DAL(db_uri, folder='.', migrate=not fake_migrate, fake_migrate=fake_migrate, pool_size=1)
+    db = DAL(
+        db_uri, folder='.', migrate=migrate and not fake_migrate, fake_migrate=fake_migrate, pool_size=1
+    )
     
     # Define tables - pydal handles everything
     db.define_table('doelzin',
@@ -50,4 +53,54 @@ def get_db(db_uri=None, fake_migrate=False):
         migrate=False
     )
     
+    # Embedding sets per model/dimensions; the active one is searched (see embedding_versions.py)
+    db.define_table('embedding_version',
+        Field('embedding_model', 'string'),
+        Field('dimensions', 'integer'),  # requested from the API; None: the model's own size
+        Field('doelzin_table', 'string'),
+        Field('uitwerking_table', 'string'),
+        Field('status', 'string'),  # building, ready, active or retired
+        Field('doelzin_embedded', 'integer', default=0),
+        Field('uitwerking_embedded', 'integer', default=0),
+        Field('created_at', 'datetime'),
+        Field('updated_at', 'datetime'),
+        Field('activated_at', 'datetime'),
+    )
+    
+    # k nearest doelzinnen per doelzin, precomputed by ingest (see related.py)
+    db.define_table('doelzin_related',
+        Field('doelzin_id', 'reference doelzin'),
+        Field('related_id', 'reference doelzin'),
+        Field('rank', 'integer'),
+        Field('similarity', 'double'),
+    )
+    
+    # Searches with their parameters and timings, written asynchronously (see querylog.py)
+    db.define_table('query_log',
+        Field('created_at', 'datetime'),
+        Field('endpoint', 'string'),
+        Field('query', 'text'),
+        Field('params', 'json'),
+        Field('result_count', 'integer'),
+        Field('total_ms', 'double'),
+        Field('timings', 'json'),
+    )
+    
+    # Single-row table describing the ingested corpus (bumped by ingest)
+    db.define_table('corpus_stats',
+        Field('generation', 'integer', default=0),
+        Field('doelzin_count', 'integer'),
+        Field('uitwerking_count', 'integer'),
+        Field('doelzin_embedded', 'integer'),
+        Field('uitwerking_embedded', 'integer'),
+        Field('embedding_model', 'string'),
+        Field('last_ingest', 'datetime'),
+    )
+    
     return db
+
+
+if __name__ == '__main__':
+    # Create/upgrade the tables (serving processes run with DB_MIGRATE off)
+    get_db()
+    print("✅ Database schema up to date")
@@ -0,0 +1,170 @@
+"""Cursor pagination over a cached, ranked candidate set.
+
+The first page retrieves the whole candidate set (`limit` results), ranks
+it with qb_cosine and caches it per worker. The returned cursor encodes the
+search parameters and the next offset, so later pages slice the cached set
+without embedding or querying again (and a worker that does not have the
+set rebuilds it from the cursor). Cursors are signed, and are rejected once
+the corpus generation has changed. With rerank, only the candidates on the
+requested page are scored by the LLM; scores are kept with the set, so
+revisiting a page costs nothing.
+
+Page boundaries follow the vector + qb_cosine ranking; the LLM reranks the
+results within a page. The threshold is applied when the set is built, to
+the vector + qb_cosine scores (run_search applies it after the rerank), so
+paged and unpaged searches can return different results.
+"""
+from typing import Dict, List, Optional, Tuple
+import cursors
+from cache import TTLCache
+from config import config
+from corpus import get_generation
+from filters import Filters, filter_key, parse_filters
+from budget import Budget
+from pipeline import finalize_results, normalize_query
+from qb_cosine import enhance_with_qb_cosine
+from rerank import iter_rerank_scores, apply_llm_score, rank_by_llm_score
+from search import search_combined
+from singleflight import SingleFlight
+from timing import stage, count_cache
+
+_result_sets = TTLCache(maxsize=config.SEARCH_PAGE_CACHE_SIZE, ttl=config.SEARCH_PAGE_CACHE_TTL)
+
+# Concurrent first pages share one retrieval; concurrent requests for a page share its rerank
+_builds = SingleFlight('search_set')
+_pages = SingleFlight('search_page')
+
+
+class ResultSet:
+    """Ranked candidates of one search, plus the LLM scores computed so far."""
+
+    def __init__(self, candidates: List[Dict], ranked: List[Dict]):
+        self.candidates = {result['id']: result for result in candidates}  # vector scores, untouched
+        self.ranked = ranked                                                # qb_cosine ranking
+        self.llm_scores: Dict[int, float] = {}
+
+
+def encode_cursor(params: Dict, offset: int) -> str:
+    """Opaque, signed cursor carrying the search parameters, so it survives cache eviction."""
+    return cursors.encode_cursor({'p': params, 'o': offset})
+
+
+def decode_cursor(cursor: str) -> Tuple[Dict, int]:
+    """The search parameters and offset of a cursor made by encode_cursor; ValueError if it was altered."""
+    payload = cursors.decode_cursor(cursor)
+    try:
+        params, offset = payload['p'], int(payload['o'])
+        if offset < 0 or not isinstance(params, dict) or 'query' not in params:
+            raise ValueError
+        params['filters'] = parse_filters(**params['filters'])
+        return params, offset
+    except (ValueError, KeyError, TypeError):
+        raise ValueError(cursors.INVALID) from None
+
+
+def _set_key(params: Dict, filters: Filters) -> Tuple:
+    return (normalize_query(params['query']), params['limit'], params['threshold'], params['weight'],
+            filter_key(filters), params['generation'])
+
+
+def _build(db, params: Dict, filters: Filters, budget: Budget) -> ResultSet:
+    candidates = search_combined(
+        db,
+        params['query'],
+        limit=params['limit'],
+        threshold=params['threshold'],
+        doelzin_weight=params['weight'],
+        filters=filters,
+        budget=budget
+    )
+    # qb_cosine rewrites 'similarity', so rank copies and keep the candidates for reranking
+    ranked = finalize_results(params['query'], [dict(r) for r in candidates], params['limit'], params['threshold'])
+    return ResultSet(candidates, ranked)
+
+
+def _result_set(db, params: Dict, filters: Filters, budget: Budget) -> ResultSet:
+    key = _set_key(params, filters)
+    result_set = _result_sets.get(key)
+    count_cache('search_page', result_set is not None)
+    if result_set is None:
+        result_set, _ = _builds.do(key, lambda: _build(db, params, filters, budget))
+        _result_sets.set(key, result_set)
+    return result_set
+
+
+def _rerank_page(query: str, result_set: ResultSet, page: List[Dict], budget: Budget) -> List[Dict]:
+    """LLM-score the page's candidates that have no score yet; order the page by score.
+
+    Results left unscored by the budget keep their similarity for this
+    response, and are scored when the page is requested again.
+    """
+    unscored = [result['id'] for result in page if result['id'] not in result_set.llm_scores]
+    if unscored:
+        with stage('rerank'):
+            candidates = [result_set.candidates[doelzin_id] for doelzin_id in unscored]
+            for index, llm_score in iter_rerank_scores(query, candidates, budget):
+                result_set.llm_scores[unscored[index]] = llm_score
+
+    scored = []
+    for result in page:
+        candidate = result_set.candidates[result['id']]
+        scored.append(apply_llm_score(dict(candidate), result_set.llm_scores.get(result['id'], candidate['similarity'])))
+    with stage('qb_cosine'):
+        return enhance_with_qb_cosine(query, rank_by_llm_score(scored))
+
+
+def search_page(
+    db,
+    query: Optional[str] = None,
+    limit: int = 100,
+    threshold: float = 0.6,
+    weight: float = 0.7,
+    rerank: bool = True,
+    filters: Optional[Filters] = None,
+    page_size: int = 10,
+    cursor: Optional[str] = None,
+    budget: Optional[Budget] = None
+) -> Dict:
+    """One page of the combined search; with a cursor, the search parameters come from it.
+
+    Raises ValueError for an invalid cursor, or one from before the corpus
+    changed (its pages would no longer line up).
+    """
+    budget = budget or Budget()
+    if cursor:
+        params, offset = decode_cursor(cursor)
+        filters = params['filters']
+        if params.get('generation') != get_generation(db):
+            raise ValueError(cursors.STALE)
+    else:
+        filters = filters or {}
+        offset = 0
+        params = {
+            'query': query,
+            'limit': limit,
+            'threshold': threshold,
+            'weight': weight,
+            'rerank': rerank,
+            'filters': filters,
+            # Pin the corpus generation, so pages of one search come from the same ranking
+            'generation': get_generation(db),
+        }
+
+    result_set = _result_set(db, params, filters, budget)
+    page = result_set.ranked[offset:offset + page_size]
+    if params['rerank'] and page:
+        key = _set_key(params, filters) + (offset, page_size, budget.ms)
+        page, _ = _pages.do(key, lambda: _rerank_page(params['query'], result_set, page, budget))
+
+    next_offset = offset + len(page)
+    return {
+        "query": params['query'],
+        "count": len(page),
+        "total": len(result_set.ranked),
+        "offset": offset,
+        "results": [dict(result) for result in page],
+        "reranked": params['rerank'] and 'rerank_skipped' not in budget.degradations,
+        "enhanced": True,
+        "degradations": list(budget.degradations),
+        "next_cursor": encode_cursor(params, next_offset) if next_offset < len(result_set.ranked) else None,
+    }
@@ -0,0 +1,168 @@
+"""Combined search pipeline: retrieve → LLM rerank → qb_cosine → threshold.
+
+Shared by the REST endpoints (regular and streaming) so every entry point
+ranks results the same way.
+"""
+from typing import Dict, Iterator, List, Optional
+from search import search_combined
+from rerank import iter_rerank_scores, apply_llm_score, apply_fallback_scores, rank_by_llm_score, rerank_results
+from qb_cosine import enhance_with_qb_cosine
+from timing import stage
+from singleflight import SingleFlight
+from filters import Filters, filter_key
+from budget import Budget
+
+# Identical concurrent searches share one computation
+_searches = SingleFlight('search')
+
+
+def finalize_results(query: str, results: List[Dict], limit: int, threshold: float,
+                     budget: Optional[Budget] = None) -> List[Dict]:
+    """Apply qb_cosine, the threshold and the limit to (reranked) results."""
+    if budget is not None and budget.exhausted():
+        # Out of time: keep the vector (or rerank) order
+        budget.degrade('qb_cosine_skipped')
+    else:
+        # Apply query-boosted cosine for hybrid semantic + lexical search
+        with stage('qb_cosine'):
+            results = enhance_with_qb_cosine(query, results)
+
+    # Apply threshold filtering after all enhancements
+    results = [r for r in results if r['similarity'] >= threshold]
+
+    return results[:limit]
+
+
+def normalize_query(query: str) -> str:
+    """Collapse whitespace and case, so trivially different queries coalesce."""
+    return ' '.join(query.split()).casefold()
+
+
+def run_search(
+    db,
+    query: str,
+    limit: int = 100,
+    threshold: float = 0.6,
+    weight: float = 0.7,
+    rerank: bool = True,
+    filters: Optional[Filters] = None,
+    budget: Optional[Budget] = None
+) -> Dict:
+    """Run the full combined search and return the API response payload.
+    
+    Concurrent calls with the same normalized parameters attach to the
+    search already in progress instead of repeating it. Stages degrade to
+    stay within the budget (see budget.py); the payload lists how.
+    
+    An attached call gets the result of a search that started earlier, under
+    that search's deadline rather than its own: if that search degraded, the
+    payload lists `shared_budget` after its degradations.
+    """
+    budget = budget or Budget()
+    key = (normalize_query(query), limit, threshold, weight, rerank, filter_key(filters), budget.ms)
+    payload, shared = _searches.do(key, lambda: _run_search(db, query, limit, threshold, weight, rerank, filters, budget))
+    if shared and payload['degradations']:
+        budget.degrade('shared_budget')
+        payload = dict(payload, degradations=payload['degradations'] + budget.degradations)
+    # Callers may replace fields (e.g. view=compact), so each gets its own dict
+    return dict(payload, query=query)
+
+
+def _run_search(db, query: str, limit: int, threshold: float, weight: float, rerank: bool,
+                filters: Optional[Filters], budget: Budget) -> Dict:
+    results = search_combined(
+        db,
+        query,
+        limit=limit,
+        threshold=threshold,
+        doelzin_weight=weight,
+        filters=filters,
+        budget=budget
+    )
+
+    # Optional LLM re-ranking
+    if rerank:
+        results = rerank_results(query, results, limit=limit, budget=budget)
+
+    results = finalize_results(query, results, limit, threshold, budget)
+
+    return {
+        "query": query,
+        "count": len(results),
+        "results": results,
+        "reranked": rerank and 'rerank_skipped' not in budget.degradations,
+        "enhanced": 'qb_cosine_skipped' not in budget.degradations,
+        "degradations": list(budget.degradations)
+    }
+
+
+def stream_search(
+    db,
+    query: str,
+    limit: int = 100,
+    threshold: float = 0.6,
+    weight: float = 0.7,
+    rerank: bool = True,
+    filters: Optional[Filters] = None,
+    budget: Optional[Budget] = None
+) -> Iterator[Dict]:
+    """Run the combined search progressively, returning events as results improve.
+
+    Events:
+        results: vector + qb_cosine ranking, available before any LLM call
+        rerank:  one LLM score ({id, llm_score, scored, total}) as it arrives
+        final:   the same payload run_search() returns
+
+    Retrieval runs before this returns, so its errors (a TimeoutError when
+    the query cannot be embedded within the budget) are raised here, before
+    a response has started; only the rerank is consumed lazily.
+    """
+    budget = budget or Budget()
+    candidates = search_combined(
+        db,
+        query,
+        limit=limit,
+        threshold=threshold,
+        doelzin_weight=weight,
+        filters=filters,
+        budget=budget
+    )
+    return _stream_events(query, candidates, limit, threshold, rerank, budget)
+
+
+def _stream_events(query: str, candidates: List[Dict], limit: int, threshold: float, rerank: bool,
+                   budget: Budget) -> Iterator[Dict]:
+    # qb_cosine rewrites 'similarity', so rank copies and keep the candidates intact
+    preview = finalize_results(query, [dict(r) for r in candidates], limit, threshold)
+    yield {
+        "event": "results",
+        "query": query,
+        "count": len(preview),
+        "results": preview,
+        "reranked": False,
+        "enhanced": True
+    }
+
+    results = candidates
+    if rerank and candidates:
+        for scored, (index, llm_score) in enumerate(iter_rerank_scores(query, candidates, budget), 1):
+            apply_llm_score(candidates[index], llm_score)
+            yield {
+                "event": "rerank",
+                "id": candidates[index]['id'],
+                "llm_score": llm_score,
+                "scored": scored,
+                "total": len(candidates)
+            }
+        results = rank_by_llm_score(apply_fallback_scores(candidates), limit)
+
+    results = finalize_results(query, results, limit, threshold, budget)
+    yield {
+        "event": "final",
+        "query": query,
+        "count": len(results),
+        "results": results,
+        "reranked": rerank and 'rerank_skipped' not in budget.degradations,
+        "enhanced": 'qb_cosine_skipped' not in budget.degradations,
+        "degradations": list(budget.degradations)
+    }
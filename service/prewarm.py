@@ -0,0 +1,89 @@
+"""Pre-warm a worker's caches by replaying the most frequent recent searches.
+
+At startup (see warmup.py) and whenever the corpus generation changes, the
+PREWARM_QUERIES most frequent (query, parameters) combinations of the last
+PREWARM_DAYS days in the query log are replayed in process:
+
+- their query embeddings are computed in batched API requests and cached
+  (that cache is keyed on the model, so it survives an ingest; after a
+  switch of embedding version they are computed for the new model)
+- paginated searches get their ranked result set rebuilt (vector search
+  and qb_cosine), so the first page comes from cache; with PREWARM_RERANK
+  the first page is LLM-scored as well
+
+A full, unpaginated search is not cached as a whole, so for those only the
+embedding is warmed.
+"""
+import threading
+import time
+from typing import Dict
+from config import config
+from corpus import get_generation
+from embedding_versions import get_active
+from embeddings import prime_query_cache
+from filters import parse_filters
+from querylog import top_queries
+
+_watcher = None
+
+
+def prewarm(db) -> Dict:
+    """Replay the top queries of the query log; returns what was warmed."""
+    start = time.perf_counter()
+    entries = top_queries(db, config.PREWARM_QUERIES, config.PREWARM_DAYS)
+    version = get_active(db)
+    embedded = prime_query_cache([entry['query'] for entry in entries],
+                                 model=version.model, dimensions=version.dimensions)
+
+    result_sets = 0
+    for entry in entries:
+        if entry['endpoint'] != 'search/page':
+            continue
+        from paging import search_page
+        params = entry['params']
+        try:
+            search_page(
+                db,
+                entry['query'],
+                limit=params['limit'],
+                threshold=params['threshold'],
+                weight=params['weight'],
+                rerank=params['rerank'] and config.PREWARM_RERANK,
+                filters=parse_filters(**params.get('filters', {})),
+                page_size=params['page_size'],
+            )
+            result_sets += 1
+        except Exception as e:
+            print(f"⚠️  Pre-warming {entry['query']!r} failed: {e}")
+
+    return {
+        'queries': len(entries),
+        'embedded': embedded,
+        'result_sets': result_sets,
+        'seconds': round(time.perf_counter() - start, 2),
+    }
+
+
+def _watch(db, generation: int):
+    """Pre-warm again after every ingest (checked every PREWARM_CHECK_SECONDS)."""
+    while True:
+        time.sleep(config.PREWARM_CHECK_SECONDS)
+        try:
+            current = get_generation(db)
+            if current != generation:
+                generation = current
+                print(f"✅ Pre-warmed caches for generation {generation}: {prewarm(db)}")
+        except Exception as e:
+            print(f"⚠️  Pre-warming failed: {e}")
+
+
+def start(db):
+    """Pre-warm now, then keep watching for new corpus generations (once per process)."""
+    global _watcher
+    if config.PREWARM_QUERIES <= 0:
+        return
+    generation = get_generation(db)
+    print(f"✅ Pre-warmed caches: {prewarm(db)}")
+    if _watcher is None:
+        _watcher = threading.Thread(target=_watch, args=(db, generation), name='prewarm', daemon=True)
+        _watcher.start()
@@ -0,0 +1,201 @@
+"""Opt-in per-request profiling for debugging slow queries on the live corpus.
+
+A request carrying ``X-Debug-Profile: <PROFILE_TOKEN>`` (or
+``?profile=<PROFILE_TOKEN>``) runs under a profiler while it executes the
+instrumented stages (see ``timing.stage``), and every SQL statement is
+captured with its duration. Modes (``X-Debug-Profile-Mode`` or
+``?profile_mode=``):
+
+    sample    stack sampling every PROFILE_INTERVAL_MS, as collapsed stacks
+              (flamegraph.pl, speedscope, inferno)
+    cprofile  deterministic cProfile, as a .prof file (snakeviz, pstats)
+
+With PROFILE_DIR set the profile is written there and the normal response
+is returned with an X-Debug-Profile-File header; otherwise the response
+body is replaced by the profile as JSON. Without PROFILE_TOKEN nothing is
+checked or started, and unprofiled requests never touch this module.
+"""
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+import orjson
+from starlette.responses import Response
+from config import config
+import timing
+
+MODES = ('sample', 'cprofile')
+
+# pgvector literals are ~30 KB each; keep the statements readable
+VECTOR_LITERAL = re.compile(r"'\[[-0-9.eE, ]{64,}\]'")
+
+
+class RequestProfile:
+    """Profiles the threads that execute stages of one request."""
+
+    def __init__(self, mode: str = 'sample', interval: float = None):
+        self.mode = mode
+        self.interval = (interval or config.PROFILE_INTERVAL_MS) / 1000
+        self.sql: List[Dict] = []
+        self.samples = Counter()
+        self._depth = Counter()
+        self._profilers: Dict[int, cProfile.Profile] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+        if mode == 'sample':
+            self._sampler = threading.Thread(target=self._sample, name='request-profiler', daemon=True)
+            self._sampler.start()
+
+    def enter(self):
+        """Called when the current thread starts a stage."""
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._depth[thread_id] += 1
+            first = self._depth[thread_id] == 1
+        if first and self.mode == 'cprofile':
+            self._profilers.setdefault(thread_id, cProfile.Profile()).enable()
+
+    def exit(self):
+        """Called when the current thread finishes a stage."""
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._depth[thread_id] -= 1
+            last = self._depth[thread_id] == 0
+            if last:
+                del self._depth[thread_id]
+        if last and self.mode == 'cprofile':
+            self._profilers[thread_id].disable()
+
+    def record_sql(self, sql, seconds: float):
+        self.sql.append({'sql': VECTOR_LITERAL.sub("'[…]'", str(sql)), 'ms': round(seconds * 1000, 3)})
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                threads = list(self._depth)
+            frames = sys._current_frames()
+            for thread_id in threads:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self.samples[collapse(frame)] += 1
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler:
+            self._sampler.join()
+
+    def collapsed(self) -> str:
+        """Samples in collapsed-stack format: 'root;caller;callee count' per line."""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def stats(self) -> Optional[pstats.Stats]:
+        profilers = list(self._profilers.values())
+        if not profilers:
+            return None
+        stats = pstats.Stats(profilers[0])
+        for profiler in profilers[1:]:
+            stats.add(profiler)
+        return stats
+
+    def stats_text(self, limit: int = 40) -> str:
+        stats = self.stats()
+        if stats is None:
+            return ''
+        out = io.StringIO()
+        stats.stream = out
+        stats.sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+
+
+def collapse(frame) -> str:
+    """One sampled stack as 'outer;...;inner' frame names."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def requested_token(request) -> Optional[str]:
+    return request.headers.get('x-debug-profile') or request.query_params.get('profile')
+
+
+def is_authorized(token: str) -> bool:
+    return bool(config.PROFILE_TOKEN) and hmac.compare_digest(token, config.PROFILE_TOKEN)
+
+
+def requested_mode(request) -> str:
+    mode = request.headers.get('x-debug-profile-mode') or request.query_params.get('profile_mode') or 'sample'
+    if mode not in MODES:
+        raise ValueError(f"profile mode must be one of: {', '.join(MODES)}")
+    return mode
+
+
+def save(profile: RequestProfile, request, report: Dict) -> str:
+    """Write the profile and its SQL/timing report to PROFILE_DIR; return the base name."""
+    slug = re.sub(r'[^a-zA-Z0-9]+', '-', request.url.path).strip('-') or 'root'
+    name = f"{datetime.now():%Y%m%d-%H%M%S}-{slug}-{uuid.uuid4().hex[:6]}"
+    os.makedirs(config.PROFILE_DIR, exist_ok=True)
+    base = os.path.join(config.PROFILE_DIR, name)
+
+    if profile.mode == 'sample':
+        with open(base + '.collapsed', 'w') as f:
+            f.write(profile.collapsed())
+    elif profile.stats() is not None:
+        profile.stats().dump_stats(base + '.prof')
+    with open(base + '.json', 'wb') as f:
+        f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+    return name
+
+
+def build_report(profile: RequestProfile, request, status: int, server_timing: str, elapsed: float) -> Dict:
+    report = {
+        'method': request.method,
+        'url': str(request.url.remove_query_params('profile')),
+        'status': status,
+        'mode': profile.mode,
+        'elapsed_ms': round(elapsed * 1000, 3),
+        'server_timing': server_timing,
+        'sql': profile.sql,
+    }
+    if profile.mode == 'sample':
+        report['interval_ms'] = profile.interval * 1000
+        report['samples'] = sum(profile.samples.values())
+    return report
+
+
+def start_profile(request) -> RequestProfile:
+    """Profile for this request; PermissionError/ValueError for a bad token or mode."""
+    if not is_authorized(requested_token(request)):
+        raise PermissionError("Invalid profile token")
+    return RequestProfile(requested_mode(request))
+
+
+async def finish_profile(profile: RequestProfile, request, response: Response, start: float) -> Response:
+    """Stop profiling and store or return the profile."""
+    # Streaming endpoints run their stages while the body is sent, so drain it first
+    body = b''.join([chunk async for chunk in response.body_iterator])
+    profile.stop()
+    server_timing = timing.server_timing()
+    report = build_report(profile, request, response.status_code, server_timing, time.perf_counter() - start)
+
+    if config.PROFILE_DIR:
+        name = save(profile, request, report)
+        headers = dict(response.headers)
+        headers['Server-Timing'] = server_timing
+        headers['X-Debug-Profile-File'] = name
+        return Response(body, status_code=response.status_code, headers=headers)
+
+    report['profile'] = profile.collapsed() if profile.mode == 'sample' else profile.stats_text()
+    return Response(orjson.dumps(report), media_type='application/json', headers={'Server-Timing': server_timing})
@@ -0,0 +1,74 @@
+"""Int8 scalar quantization of embedding matrices for the in-memory index.
+
+Every dimension gets its own scale: the largest absolute value in that
+dimension maps to ±127. A matrix is kept as C-contiguous int8 codes (a
+quarter of float32) plus one float32 scale per dimension.
+
+Approximate scores are codes @ (query * scales). The codes are converted
+to float32 a block of rows at a time, into a buffer small enough to stay
+in the CPU cache, so each block is one BLAS product and a search never
+materializes a float copy of the matrix. Several queries are scored in
+the same pass over the codes.
+"""
+import tempfile
+import numpy as np
+
+# Size of the float32 buffer one block of codes is converted into
+BLOCK_BYTES = 768 * 1024
+
+
+class QuantizedMatrix:
+    """Int8 codes and per-dimension scales of a matrix with normalized rows."""
+
+    def __init__(self, codes: np.ndarray, scales: np.ndarray):
+        self.codes = np.ascontiguousarray(codes, dtype=np.int8)
+        self.scales = np.asarray(scales, dtype=np.float32)
+        self.block_rows = max(1, BLOCK_BYTES // (4 * max(self.codes.shape[1], 1)))
+
+    @classmethod
+    def from_matrix(cls, matrix: np.ndarray, block_rows: int = 65536) -> 'QuantizedMatrix':
+        """Quantize a float matrix (block by block, so a mmapped matrix is not copied whole)."""
+        scales = np.zeros(matrix.shape[1], dtype=np.float32)
+        for start in range(0, len(matrix), block_rows):
+            np.maximum(scales, np.abs(matrix[start:start + block_rows]).max(axis=0), out=scales)
+        scales = scales / 127
+        scales[scales == 0] = 1.0
+        codes = np.empty(matrix.shape, dtype=np.int8)
+        for start in range(0, len(matrix), block_rows):
+            block = np.rint(matrix[start:start + block_rows] / scales)
+            codes[start:start + block_rows] = np.clip(block, -127, 127)
+        return cls(codes, scales)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.codes.nbytes + self.scales.nbytes)
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """Approximate dot products: shape (rows,) for one query, (rows, queries) for a 2-d array."""
+        queries = np.asarray(queries, dtype=np.float32)
+        scaled = np.ascontiguousarray((queries * self.scales).T)
+        out = np.empty((len(self.codes),) + scaled.shape[1:], dtype=np.float32)
+        buffer = np.empty((self.block_rows, self.codes.shape[1]), dtype=np.float32)
+        for start in range(0, len(self.codes), self.block_rows):
+            block = self.codes[start:start + self.block_rows]
+            np.copyto(buffer[:len(block)], block, casting='unsafe')
+            np.matmul(buffer[:len(block)], scaled, out=out[start:start + len(block)])
+        return out
+
+
+def spill(matrix: np.ndarray) -> np.ndarray:
+    """A read-only memory map of matrix, backed by an unlinked temporary file.
+
+    Its pages belong to the file, not to the process: the kernel can drop
+    them, and only the rows that are read (the rescored shortlist) come back.
+    """
+    if not matrix.size:
+        return matrix
+    with tempfile.TemporaryFile(prefix='slo-index-') as f:
+        np.ascontiguousarray(matrix).tofile(f)
+        f.flush()
+        # The mapping stays valid after the file is closed
+        return np.memmap(f, dtype=matrix.dtype, mode='r', shape=matrix.shape)
@@ -0,0 +1,134 @@
+"""Asynchronous query log: which searches are run, how fast, with how many results.
+
+The search endpoints call ``log_search`` with the query, its parameters and
+the result count; the entry gets the per-stage timings of the request (see
+timing.py) and goes onto a bounded in-memory queue. A background thread
+writes the queue to the query_log table in batches (one INSERT per batch),
+so a search never waits for the log. When the queue is full, or the
+database is unavailable, entries are dropped and counted in
+slo_search_query_log_entries_total.
+
+Queries are logged with whitespace collapsed but case kept, so replaying
+them (prewarm.py) warms the same embedding-cache entries users hit.
+"""
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import orjson
+import psycopg2.errors
+from config import config
+from timing import count_query_log, request_timings
+
+# Most entries written in one INSERT
+MAX_BATCH = 500
+
+_queue: Optional[queue.Queue] = None
+_writer = None
+_start_lock = threading.Lock()
+_last_prune = None
+
+
+def log_search(endpoint: str, query: str, params: Dict, result_count: int, degradations: List[str] = ()):
+    """Queue a log entry for a search (never blocks; no-op when QUERY_LOG is off)."""
+    if not config.QUERY_LOG:
+        return
+    timings = request_timings() or {}
+    entry = (
+        datetime.now(),
+        endpoint,
+        ' '.join(query.split()),
+        orjson.dumps(params, option=orjson.OPT_SORT_KEYS).decode(),
+        result_count,
+        timings.pop('total_ms', None),
+        orjson.dumps(dict(timings, degradations=list(degradations))).decode(),
+    )
+    try:
+        _start().put_nowait(entry)
+    except queue.Full:
+        count_query_log('dropped')
+
+
+def _start() -> queue.Queue:
+    """Create the queue and start the writer thread (once per process)."""
+    global _queue, _writer
+    if _writer is None:
+        with _start_lock:
+            if _writer is None:
+                _queue = queue.Queue(maxsize=config.QUERY_LOG_QUEUE_SIZE)
+                _writer = threading.Thread(target=_write_loop, name='query-log', daemon=True)
+                _writer.start()
+    return _queue
+
+
+def _write_loop():
+    from database import get_database
+    while True:
+        batch = [_queue.get()]
+        # Gather what arrives within the flush interval into the same INSERT
+        deadline = time.monotonic() + config.QUERY_LOG_FLUSH_SECONDS
+        while len(batch) < MAX_BATCH:
+            try:
+                batch.append(_queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        try:
+            _write(get_database(), batch)
+            result = 'written'
+        except Exception as e:
+            result = 'failed'
+            print(f"⚠️  Writing {len(batch)} query log entries failed: {e}")
+        for _ in batch:
+            count_query_log(result)
+
+
+def _write(db, batch: List[Tuple]):
+    global _last_prune
+    columns = list(zip(*batch))
+    try:
+        db.executesql("""
+            INSERT INTO query_log (created_at, endpoint, query, params, result_count, total_ms, timings)
+            SELECT * FROM unnest(%(created_at)s::timestamp[], %(endpoint)s::text[], %(query)s::text[],
+                                 %(params)s::json[], %(result_count)s::int[], %(total_ms)s::float8[],
+                                 %(timings)s::json[])
+        """, placeholders=dict(zip(
+            ('created_at', 'endpoint', 'query', 'params', 'result_count', 'total_ms', 'timings'),
+            map(list, columns)
+        )))
+        # Drop entries past their retention once an hour
+        if config.QUERY_LOG_RETENTION_DAYS > 0 and (_last_prune is None or time.monotonic() - _last_prune > 3600):
+            db.executesql(
+                "DELETE FROM query_log WHERE created_at < now() - make_interval(days => %(days)s)",
+                placeholders={'days': config.QUERY_LOG_RETENTION_DAYS}
+            )
+            _last_prune = time.monotonic()
+        db.commit()
+    except psycopg2.errors.UndefinedTable:
+        # Serving processes do not migrate; the table appears with the next ingest or `python models.py`
+        db.rollback()
+        raise RuntimeError("query_log table does not exist yet") from None
+    except Exception:
+        db.rollback()
+        raise
+
+
+def top_queries(db, limit: int, days: int = 7) -> List[Dict]:
+    """The most frequent (query, parameters) combinations of the last `days` days."""
+    try:
+        rows = db.executesql("""
+            SELECT query, endpoint, params::text, count(*) AS searches
+            FROM query_log
+            WHERE created_at > now() - make_interval(days => %(days)s)
+            GROUP BY query, endpoint, params::text
+            ORDER BY searches DESC, query
+            LIMIT %(limit)s
+        """, placeholders={'days': days, 'limit': limit})
+        db.commit()
+    except psycopg2.errors.UndefinedTable:
+        db.rollback()
+        return []
+    return [
+        {'query': r[0], 'endpoint': r[1], 'params': orjson.loads(r[2]), 'searches': r[3]}
+        for r in rows
+    ]
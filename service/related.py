@@ -0,0 +1,111 @@
+"""Precomputed "related doelzinnen": a k-nearest-neighbour graph over the embeddings.
+
+Ingest computes, for every doelzin, the RELATED_K most similar other
+doelzinnen (cosine similarity of their embeddings) and stores them in
+doelzin_related. /api/doelzin/{id}/related then answers with one indexed
+query: no embedding or LLM call, and no vector search.
+
+The all-pairs similarities are computed in blocks of RELATED_BLOCK_SIZE
+rows (one matrix product of the block against the whole matrix), so memory
+stays at block × n scores instead of n × n.
+"""
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import psycopg2.errors
+from config import config
+from embedding_versions import get_active
+from index import parse_vector, stack
+
+
+def nearest_neighbours(matrix: np.ndarray, k: int, block_size: int = 1024) -> Tuple[np.ndarray, np.ndarray]:
+    """Row indices and similarities of the k most similar other rows, best first.
+
+    `matrix` must have normalized rows, so the dot product is the cosine similarity.
+    """
+    n = len(matrix)
+    k = max(min(k, n - 1), 0)
+    indices = np.zeros((n, k), dtype=np.int64)
+    scores = np.zeros((n, k), dtype=np.float32)
+    if k == 0:
+        return indices, scores
+
+    for start in range(0, n, block_size):
+        block = matrix[start:start + block_size] @ matrix.T
+        rows = np.arange(len(block))
+        block[rows, start + rows] = -np.inf  # a doelzin is not related to itself
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(block, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        indices[start:start + len(block)] = np.take_along_axis(top, order, axis=1)
+        scores[start:start + len(block)] = np.take_along_axis(top_scores, order, axis=1)
+    return indices, scores
+
+
+def build_related(db, version=None, k: int = None, block_size: int = None, commit: bool = True) -> int:
+    """Recompute the doelzin_related graph from the stored embeddings; returns the number of links.
+
+    Uses the embeddings of `version` (default: the active embedding version).
+    The old graph is replaced in one transaction, so readers never see a
+    partial graph; with commit=False the caller commits it.
+    """
+    version = version or get_active(db)
+    k = k or config.RELATED_K
+    rows = db.executesql(f"""
+        SELECT doelzin_id, embedding::text
+        FROM {version.doelzin_table}
+        ORDER BY doelzin_id
+    """)
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    indices, scores = nearest_neighbours(
+        stack([parse_vector(r[1]) for r in rows]), k, block_size or config.RELATED_BLOCK_SIZE
+    )
+
+    db(db.doelzin_related).delete()
+    if indices.size:
+        # One INSERT for the whole graph; the arrays are unnested server-side
+        db.executesql("""
+            INSERT INTO doelzin_related (doelzin_id, related_id, rank, similarity)
+            SELECT * FROM unnest(%(doelzin_ids)s::int[], %(related_ids)s::int[],
+                                 %(ranks)s::int[], %(similarities)s::float8[])
+        """, placeholders={
+            'doelzin_ids': np.repeat(ids, indices.shape[1]).tolist(),
+            'related_ids': ids[indices].ravel().tolist(),
+            'ranks': np.tile(np.arange(1, indices.shape[1] + 1), len(ids)).tolist(),
+            'similarities': scores.ravel().astype(float).tolist(),
+        })
+    db.executesql("CREATE INDEX IF NOT EXISTS doelzin_related_lookup_idx ON doelzin_related (doelzin_id, rank)")
+    if commit:
+        db.commit()
+    return int(indices.size)
+
+
+def get_related(db, doelzin_id: int, limit: int = 10) -> Optional[List[Dict]]:
+    """The doelzinnen most similar to `doelzin_id`, best first (None if the doelzin does not exist)."""
+    try:
+        rows = db.executesql("""
+            SELECT d.id, d.fo_id, d.title, d.description, d.prefix, d.soort, r.similarity
+            FROM doelzin_related r
+            JOIN doelzin d ON d.id = r.related_id
+            WHERE r.doelzin_id = %(doelzin_id)s
+            ORDER BY r.rank
+            LIMIT %(limit)s
+        """, placeholders={'doelzin_id': doelzin_id, 'limit': limit})
+    except psycopg2.errors.UndefinedTable:
+        # Serving processes do not migrate; the table appears with the first ingest
+        db.rollback()
+        rows = []
+
+    if not rows and not db(db.doelzin.id == doelzin_id).count():
+        return None
+    return [
+        {
+            'id': r[0],
+            'fo_id': r[1],
+            'title': r[2],
+            'description': r[3],
+            'prefix': r[4],
+            'soort': r[5],
+            'similarity': float(r[6]),
+        }
+        for r in rows
+    ]
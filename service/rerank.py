@@ -1,63 +1,118 @@
 """LLM-based reranking using OpenRouter."""
 import re
-from typing import List, Dict
-from openai import OpenAI
+from typing import Dict, Iterator, List, Optional, Tuple
+from openai import OpenAI, APITimeoutError
 from config import config
+from timing import stage, count_llm_call
+from budget import Budget
 
-def rerank_results(query: str, results: List[Dict], limit: int = None) -> List[Dict]:
-    """Rerank search results using OpenRouter LLM scoring with streaming and timeout."""
-    if not results:
-        return results
-    
-    client = OpenAI(
-        base_url=config.OPENROUTER_BASE_URL,
-        api_key=config.OPENROUTER_API_KEY,
-        timeout=5.0  # 5-second timeout per request
-    )
-    
-    scored_results = []
+_llm_client = None
+
+def get_llm_client() -> OpenAI:
+    """Get the LLM client (singleton, so connections are reused across requests)."""
+    global _llm_client
+    if _llm_client is None:
+        _llm_client = OpenAI(
+            base_url=config.OPENROUTER_BASE_URL,
+            api_key=config.OPENROUTER_API_KEY,
+            timeout=config.RERANK_TIMEOUT  # per request; a search budget can lower it
+        )
+    return _llm_client
+
+def score_result(client: OpenAI, query: str, result: Dict, timeout: Optional[float] = None) -> float:
+    """Score a single result 0-1 with the LLM, falling back to its similarity.
     
-    for result in results:
-        # Create prompt for direct scoring (no reasoning)
-        prompt = f"""Score relevance 0-10. Only output the number.
+    With a timeout (the remaining search budget) the request is not retried,
+    so it cannot take longer than that timeout.
+    """
+    # Create prompt for direct scoring (no reasoning)
+    prompt = f"""Score relevance 0-10. Only output the number.
 Query: {query}
 Title: {result['title']}
 Description: {result['description']}"""
 
-        try:
-            # Use streaming to get results faster
-            stream = client.chat.completions.create(
-                model=config.LLM_MODEL,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.1,
-                max_tokens=3,  # Just need 1-2 digits
-                stream=True
-            )
-            
-            # Accumulate streamed response
-            score_text = ""
-            for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    score_text += chunk.choices[0].delta.content
-                    # Try to extract number as soon as we have it
-                    match = re.search(r'\d+\.?\d*', score_text)
-                    if match:
-                        llm_score = float(match.group()) / 10.0
-                        break
-            else:
-                # No number found in stream
-                llm_score = result['similarity']
-                
-        except Exception:
-            # Fallback to original similarity on timeout or error
-            llm_score = result['similarity']
-        
-        result['llm_score'] = llm_score
-        result['original_similarity'] = result['similarity']
-        result['similarity'] = llm_score  # Replace similarity with LLM score
-        scored_results.append(result)
-    
-    # Sort by LLM score
-    scored_results.sort(key=lambda x: x['llm_score'], reverse=True)
+    count_llm_call()
+    if timeout is not None:
+        client = client.with_options(timeout=timeout, max_retries=0)
+    try:
+        # Use streaming to get results faster
+        stream = client.chat.completions.create(
+            model=config.LLM_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.1,
+            max_tokens=3,  # Just need 1-2 digits
+            stream=True
+        )
+
+        # Accumulate streamed response
+        score_text = ""
+        for chunk in stream:
+            if chunk.choices[0].delta.content:
+                score_text += chunk.choices[0].delta.content
+                # Try to extract number as soon as we have it
+                match = re.search(r'\d+\.?\d*', score_text)
+                if match:
+                    return float(match.group()) / 10.0
+
+        # No number found in stream
+        return result['similarity']
+
+    except APITimeoutError:
+        # Fallback to original similarity when the budget or RERANK_TIMEOUT runs out
+        return result['similarity']
+    except Exception:
+        # Fallback to original similarity on error
+        return result['similarity']
+
+def iter_rerank_scores(
+    query: str,
+    results: List[Dict],
+    budget: Optional[Budget] = None
+) -> Iterator[Tuple[int, float]]:
+    """Yield (index, llm_score) for each result as soon as it has been scored.
     
+    Stops early (marking the budget rerank_skipped/rerank_truncated) when
+    less than RERANK_MIN_MS of the budget is left.
+    """
+    if not results:
+        return
+
+    budget = budget or Budget()
+    client = get_llm_client()
+    for index, result in enumerate(results):
+        if not budget.allows(config.RERANK_MIN_MS / 1000):
+            budget.degrade('rerank_truncated' if index else 'rerank_skipped')
+            return
+        # Without a budget the client's own timeout (RERANK_TIMEOUT) and retries apply
+        timeout = budget.timeout(config.RERANK_TIMEOUT) if budget.deadline is not None else None
+        yield index, score_result(client, query, result, timeout)
+
+def apply_llm_score(result: Dict, llm_score: float) -> Dict:
+    """Store the LLM score on a result, keeping the original similarity."""
+    result['llm_score'] = llm_score
+    result['original_similarity'] = result['similarity']
+    result['similarity'] = llm_score  # Replace similarity with LLM score
+    return result
+
+def rank_by_llm_score(results: List[Dict], limit: int = None) -> List[Dict]:
+    """Sort scored results by LLM score."""
+    scored_results = sorted(results, key=lambda x: x['llm_score'], reverse=True)
     return scored_results[:limit] if limit else scored_results
+
+def apply_fallback_scores(results: List[Dict]) -> List[Dict]:
+    """Results the LLM did not score (budget ran out) keep their similarity, as on LLM errors."""
+    for result in results:
+        if 'llm_score' not in result:
+            apply_llm_score(result, result['similarity'])
+    return results
+
+def rerank_results(query: str, results: List[Dict], limit: int = None, budget: Optional[Budget] = None) -> List[Dict]:
+    """Rerank search results using OpenRouter LLM scoring with streaming and timeout."""
+    if not results:
+        return results
+
+    with stage('rerank'):
+        for index, llm_score in iter_rerank_scores(query, results, budget):
+            apply_llm_score(results[index], llm_score)
+
+    return rank_by_llm_score(apply_fallback_scores(results), limit)
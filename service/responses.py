@@ -0,0 +1,53 @@
+"""Fast JSON serialization and field selection for API responses."""
+from typing import Dict, List, Optional
+import orjson
+from fastapi import HTTPException, Response
+from fastapi.responses import JSONResponse
+
+# Fields kept by view=compact: no uitwerking texts, no intermediate scores
+COMPACT_FIELDS = ('id', 'fo_id', 'title', 'description', 'prefix', 'soort', 'similarity')
+
+VIEWS = ('compact', 'full')
+
+
+def dumps(payload) -> bytes:
+    """Serialize a payload with orjson."""
+    return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson."""
+    
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def json_response(payload, response: Optional[Response] = None) -> ORJSONResponse:
+    """Return payload as an orjson response, skipping FastAPI's jsonable_encoder pass.
+
+    Headers already set on the injected `response` (ETag, Cache-Control, ...)
+    are carried over, since FastAPI ignores them for returned responses.
+    """
+    headers = None
+    if response is not None:
+        headers = {
+            key: value for key, value in response.headers.items()
+            if key not in ('content-length', 'content-type')
+        }
+    return ORJSONResponse(payload, headers=headers)
+
+
+def parse_fields(view: str = 'full', fields: Optional[str] = None) -> Optional[tuple]:
+    """Resolve view/fields query parameters to the fields to keep (None keeps all)."""
+    if fields:
+        return tuple(field.strip() for field in fields.split(',') if field.strip())
+    if view not in VIEWS:
+        raise HTTPException(400, f"view must be one of: {', '.join(VIEWS)}")
+    return COMPACT_FIELDS if view == 'compact' else None
+
+
+def select_fields(results: List[Dict], keep: Optional[tuple]) -> List[Dict]:
+    """Drop every field not in `keep` from each result."""
+    if keep is None:
+        return results
+    return [{key: result[key] for key in keep if key in result} for result in results]
@@ -2,24 +2,63 @@
 import numpy as np
 from typing import List, Dict, Optional
 from models import get_db
-from embeddings import get_embeddings
+from embeddings import get_embeddings, embed_query
+from embedding_versions import EmbeddingVersion, get_active
+from timing import stage
+from index import CorpusIndex, get_index
+from filters import Filters, doelzin_conditions, uitwerking_conditions, niveau_condition
+from budget import Budget
 
 def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
     """Calculate cosine similarity between two vectors."""
     return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
 
+def to_pgvector(embedding) -> str:
+    """Format an embedding as a pgvector literal."""
+    return '[' + ','.join(map(str, embedding)) + ']'
+
+def and_conditions(conditions: List[str]) -> str:
+    return ''.join(f"\n          AND {condition}" for condition in conditions)
+
+def search_version(db, index: Optional[CorpusIndex]) -> EmbeddingVersion:
+    """The embedding version to search: the loaded in-memory index's, else the active one.
+    
+    Queries are embedded with its model, so they compare with vectors of the same model.
+    """
+    return index.version if index is not None else get_active(db)
+
+def nearest_first(distance: str, filters: Optional[Filters]) -> str:
+    """ORDER BY for a top-k vector query.
+    
+    Ordering by the distance operator lets pgvector use its ANN index, but
+    the index scan filters afterwards and can return fewer than `limit`
+    matching rows. With filters, order by the similarity instead: the
+    index cannot serve that, so the filter runs first and the (smaller)
+    set of matching rows is scanned exactly.
+    """
+    return "similarity DESC" if filters else distance
+
 def search_doelzinnen(
     db,
     query: str,
     limit: int = 10,
-    threshold: float = 0.0
+    threshold: float = 0.0,
+    filters: Optional[Filters] = None
 ) -> List[Dict]:
     """Search doelzinnen using pgvector."""
     
+    index = get_index(db)
+    version = search_version(db, index)
+    
     # Get query embedding
-    embedder = get_embeddings()
-    query_embedding = embedder.encode(query, convert_to_numpy=True)
-    vector_str = '[' + ','.join(map(str, query_embedding)) + ']'
+    with stage('embed'):
+        query_embedding = embed_query(query, model=version.model, dimensions=version.dimensions)
+    
+    if index is not None:
+        with stage('memory_search'):
+            return index.search_doelzinnen(query_embedding, limit, threshold, filters)
+    vector_str = to_pgvector(query_embedding)
+    conditions, params = doelzin_conditions(filters)
     
     # Use pgvector for similarity search (1 - cosine_distance = cosine_similarity)
     sql = f"""
@@ -27,14 +66,17 @@ def search_doelzinnen(
             d.id, d.fo_id, d.title, d.description, d.prefix, d.soort,
             1 - (e.embedding <=> '{vector_str}'::vector) as similarity
         FROM doelzin d
-        JOIN doelzin_embedding e ON e.doelzin_id = d.id
-        WHERE 1 - (e.embedding <=> '{vector_str}'::vector) >= {threshold}
-        ORDER BY e.embedding <=> '{vector_str}'::vector
+        JOIN {version.doelzin_table} e ON e.doelzin_id = d.id
+        WHERE 1 - (e.embedding <=> '{vector_str}'::vector) >= {threshold}{and_conditions(conditions)}
+        ORDER BY {nearest_first(f"e.embedding <=> '{vector_str}'::vector", filters)}
         LIMIT {limit}
     """
     
+    with stage('vector_sql'):
+        rows = db.executesql(sql, placeholders=params or None)
+    
     results = []
-    for row in db.executesql(sql):
+    for row in rows:
         results.append({
             'id': row[0],
             'fo_id': row[1],
@@ -47,18 +89,90 @@ def search_doelzinnen(
     
     return results
 
+def search_doelzinnen_batch(
+    db,
+    queries: List[str],
+    limit: int = 10,
+    threshold: float = 0.0,
+    filters: Optional[Filters] = None
+) -> List[List[Dict]]:
+    """Search doelzinnen for many queries with one embedding call and one SQL statement.
+    
+    Returns one result list per query, in the order of the queries.
+    """
+    if not queries:
+        return []
+    
+    index = get_index(db)
+    version = search_version(db, index)
+    
+    # Embed all queries in a single API request
+    embedder = get_embeddings(version.model, version.dimensions)
+    with stage('embed'):
+        query_embeddings = embedder.encode(queries, convert_to_numpy=False)
+    
+    if index is not None:
+        with stage('memory_search'):
+            return index.search_doelzinnen_batch(query_embeddings, limit, threshold, filters)
+    vectors = ', '.join(f"'{to_pgvector(embedding)}'" for embedding in query_embeddings)
+    conditions, params = doelzin_conditions(filters)
+    
+    # Top-k per query through a LATERAL join, so each query can still use the vector index
+    sql = f"""
+        SELECT 
+            q.ord, m.id, m.fo_id, m.title, m.description, m.prefix, m.soort, m.similarity
+        FROM unnest(ARRAY[{vectors}]::vector[]) WITH ORDINALITY AS q(embedding, ord)
+        CROSS JOIN LATERAL (
+            SELECT 
+                d.id, d.fo_id, d.title, d.description, d.prefix, d.soort,
+                1 - (e.embedding <=> q.embedding) as similarity
+            FROM doelzin d
+            JOIN {version.doelzin_table} e ON e.doelzin_id = d.id
+            WHERE 1 - (e.embedding <=> q.embedding) >= {threshold}{and_conditions(conditions)}
+            ORDER BY {nearest_first("e.embedding <=> q.embedding", filters)}
+            LIMIT {limit}
+        ) m
+        ORDER BY q.ord, m.similarity DESC
+    """
+    
+    with stage('vector_sql'):
+        rows = db.executesql(sql, placeholders=params or None)
+    
+    results = [[] for _ in queries]
+    for row in rows:
+        results[row[0] - 1].append({
+            'id': row[1],
+            'fo_id': row[2],
+            'title': row[3],
+            'description': row[4],
+            'prefix': row[5],
+            'soort': row[6],
+            'similarity': float(row[7])
+        })
+    
+    return results
+
 def search_uitwerkingen(
     db,
     query: str,
     limit: int = 10,
-    threshold: float = 0.0
+    threshold: float = 0.0,
+    filters: Optional[Filters] = None
 ) -> List[Dict]:
     """Search uitwerkingen using pgvector."""
+    conditions, params = uitwerking_conditions(filters)
+    
+    index = get_index(db)
+    version = search_version(db, index)
     
     # Get query embedding
-    embedder = get_embeddings()
-    query_embedding = embedder.encode(query, convert_to_numpy=True)
-    vector_str = '[' + ','.join(map(str, query_embedding)) + ']'
+    with stage('embed'):
+        query_embedding = embed_query(query, model=version.model, dimensions=version.dimensions)
+    
+    if index is not None:
+        with stage('memory_search'):
+            return index.search_uitwerkingen(query_embedding, limit, threshold, filters)
+    vector_str = to_pgvector(query_embedding)
     
     # Use pgvector for similarity search
     sql = f"""
@@ -66,14 +180,17 @@ def search_uitwerkingen(
             u.id, u.fo_id, u.title, u.description, u.prefix,
             1 - (e.embedding <=> '{vector_str}'::vector) as similarity
         FROM uitwerking u
-        JOIN uitwerking_embedding e ON e.uitwerking_id = u.id
-        WHERE 1 - (e.embedding <=> '{vector_str}'::vector) >= {threshold}
-        ORDER BY e.embedding <=> '{vector_str}'::vector
+        JOIN {version.uitwerking_table} e ON e.uitwerking_id = u.id
+        WHERE 1 - (e.embedding <=> '{vector_str}'::vector) >= {threshold}{and_conditions(conditions)}
+        ORDER BY {nearest_first(f"e.embedding <=> '{vector_str}'::vector", filters)}
         LIMIT {limit}
     """
     
+    with stage('vector_sql'):
+        rows = db.executesql(sql, placeholders=params or None)
+    
     results = []
-    for row in db.executesql(sql):
+    for row in rows:
         results.append({
             'id': row[0],
             'fo_id': row[1],
@@ -90,13 +207,40 @@ def search_combined(
     query: str,
     limit: int = 10,
     threshold: float = 0.0,
-    doelzin_weight: float = 0.7
+    doelzin_weight: float = 0.7,
+    filters: Optional[Filters] = None,
+    budget: Optional[Budget] = None
 ) -> List[Dict]:
-    """Combined search using pgvector with weighted scoring."""
+    """Combined search using pgvector with weighted scoring.
+    
+    With a budget, embedding the query raises TimeoutError when it does not
+    finish within the remaining time.
+    """
+    
+    index = get_index(db)
+    version = search_version(db, index)
+    
+    with stage('embed'):
+        query_embedding = embed_query(
+            query, timeout=budget.timeout() if budget else None,
+            model=version.model, dimensions=version.dimensions
+        )
+    
+    if index is not None:
+        with stage('memory_search'):
+            return index.search_combined(query_embedding, limit, threshold, doelzin_weight, filters)
+    vector_str = to_pgvector(query_embedding)
     
-    embedder = get_embeddings()
-    query_embedding = embedder.encode(query, convert_to_numpy=True)
-    vector_str = '[' + ','.join(map(str, query_embedding)) + ']'
+    # Filters restrict the rows scored in both CTEs, not the final result
+    conditions, params = doelzin_conditions(filters)
+    linked_conditions = conditions + ([niveau_condition('u')] if 'niveau_ids' in params else [])
+    doelzin_filter = uitwerking_filter = ''
+    if conditions:
+        doelzin_filter = f"""
+            JOIN doelzin d ON d.id = de.doelzin_id
+            WHERE {' AND '.join(conditions)}"""
+        uitwerking_filter = f"""
+            WHERE {' AND '.join(linked_conditions)}"""
     
     # Use pgvector to get both doelzin and best uitwerking similarity
     sql = f"""
@@ -104,7 +248,7 @@ def search_combined(
             SELECT 
                 de.doelzin_id,
                 1 - (de.embedding <=> '{vector_str}'::vector) as doelzin_sim
-            FROM doelzin_embedding de
+            FROM {version.doelzin_table} de{doelzin_filter}
         ),
         uitwerking_scores AS (
             SELECT 
@@ -113,14 +257,15 @@ def search_combined(
             FROM doelzin d
             CROSS JOIN LATERAL jsonb_array_elements_text(d.uitwerking_ids::jsonb) AS uit_id
             JOIN uitwerking u ON u.fo_id = uit_id
-            JOIN uitwerking_embedding ue ON ue.uitwerking_id = u.id
+            JOIN {version.uitwerking_table} ue ON ue.uitwerking_id = u.id{uitwerking_filter}
             GROUP BY d.id
         )
         SELECT 
             d.id, d.fo_id, d.title, d.description, d.prefix, d.soort,
             ds.doelzin_sim,
             COALESCE(us.uitwerking_sim, 0) as uitwerking_sim,
-            ({doelzin_weight} * ds.doelzin_sim + {1-doelzin_weight} * COALESCE(us.uitwerking_sim, 0)) as combined
+            ({doelzin_weight} * ds.doelzin_sim + {1-doelzin_weight} * COALESCE(us.uitwerking_sim, 0)) as combined,
+            d.uitwerking_ids
         FROM doelzin d
         JOIN doelzin_scores ds ON ds.doelzin_id = d.id
         LEFT JOIN uitwerking_scores us ON us.doelzin_id = d.id
@@ -129,18 +274,22 @@ def search_combined(
         LIMIT {limit * 2}
     """
     
+    with stage('vector_sql'):
+        rows = db.executesql(sql, placeholders=params or None)
+    
+    # Get uitwerking texts for qb_cosine (one query for all rows)
+    with stage('uitwerkingen'):
+        uitwerkingen = _uitwerkingen_by_fo_id(
+            db, (fo_id for row in rows for fo_id in row[9] or [])
+        )
+    
     results = []
-    for row in db.executesql(sql):
-        doelzin_id = row[0]
-        
-        # Get uitwerking texts for qb_cosine
-        uitwerking_texts = []
-        doelzin = db.doelzin[doelzin_id]
-        if doelzin and doelzin.uitwerking_ids:
-            for fo_id in doelzin.uitwerking_ids:
-                uitw = db(db.uitwerking.fo_id == fo_id).select().first()
-                if uitw and uitw.description:
-                    uitwerking_texts.append(uitw.description)
+    for row in rows:
+        uitwerking_texts = [
+            uitwerkingen[fo_id]['description']
+            for fo_id in row[9] or []
+            if fo_id in uitwerkingen and uitwerkingen[fo_id]['description']
+        ]
         
         results.append({
             'id': row[0],
@@ -157,36 +306,71 @@ def search_combined(
     
     return results[:limit]
 
-def get_doelzin_with_uitwerkingen(db, doelzin_id: int) -> Optional[Dict]:
-    """Get a doelzin with all its uitwerkingen."""
-    
-    doelzin = db.doelzin[doelzin_id]
-    if not doelzin:
-        return None
-    
-    # Get linked uitwerkingen
-    uitwerkingen = []
-    if doelzin.uitwerking_ids:
-        for fo_id in doelzin.uitwerking_ids:
-            uitwerking = db(db.uitwerking.fo_id == fo_id).select().first()
-            if uitwerking:
-                uitwerkingen.append({
-                    'id': uitwerking.id,
-                    'fo_id': uitwerking.fo_id,
-                    'title': uitwerking.title,
-                    'description': uitwerking.description,
-                    'prefix': uitwerking.prefix,
-                })
+def _uitwerkingen_by_fo_id(db, fo_ids) -> Dict[str, Dict]:
+    """Load uitwerkingen for a set of fo_ids in a single query."""
+    fo_ids = list(set(fo_ids))
+    if not fo_ids:
+        return {}
     
+    rows = db(db.uitwerking.fo_id.belongs(fo_ids)).select(
+        db.uitwerking.id,
+        db.uitwerking.fo_id,
+        db.uitwerking.title,
+        db.uitwerking.description,
+        db.uitwerking.prefix,
+    )
     return {
-        'id': doelzin.id,
-        'fo_id': doelzin.fo_id,
-        'title': doelzin.title,
-        'description': doelzin.description,
-        'prefix': doelzin.prefix,
-        'soort': doelzin.soort,
-        'ce': doelzin.ce,
-        'se': doelzin.se,
-        'status': doelzin.status,
-        'uitwerkingen': uitwerkingen
+        row.fo_id: {
+            'id': row.id,
+            'fo_id': row.fo_id,
+            'title': row.title,
+            'description': row.description,
+            'prefix': row.prefix,
+        }
+        for row in rows
     }
+
+def get_doelzinnen_with_uitwerkingen(db, doelzin_ids: List[int]) -> List[Dict]:
+    """Get many doelzinnen with all their uitwerkingen in two queries.
+    
+    Results follow the order of doelzin_ids; unknown ids are skipped.
+    """
+    doelzin_ids = list(dict.fromkeys(doelzin_ids))
+    if not doelzin_ids:
+        return []
+    
+    doelzinnen = {row.id: row for row in db(db.doelzin.id.belongs(doelzin_ids)).select()}
+    uitwerkingen = _uitwerkingen_by_fo_id(
+        db,
+        (fo_id for doelzin in doelzinnen.values() for fo_id in doelzin.uitwerking_ids or [])
+    )
+    
+    results = []
+    for doelzin_id in doelzin_ids:
+        doelzin = doelzinnen.get(doelzin_id)
+        if not doelzin:
+            continue
+        
+        results.append({
+            'id': doelzin.id,
+            'fo_id': doelzin.fo_id,
+            'title': doelzin.title,
+            'description': doelzin.description,
+            'prefix': doelzin.prefix,
+            'soort': doelzin.soort,
+            'ce': doelzin.ce,
+            'se': doelzin.se,
+            'status': doelzin.status,
+            'uitwerkingen': [
+                uitwerkingen[fo_id]
+                for fo_id in doelzin.uitwerking_ids or []
+                if fo_id in uitwerkingen
+            ]
+        })
+    
+    return results
+
+def get_doelzin_with_uitwerkingen(db, doelzin_id: int) -> Optional[Dict]:
+    """Get a doelzin with all its uitwerkingen."""
+    results = get_doelzinnen_with_uitwerkingen(db, [doelzin_id])
+    return results[0] if results else None
@@ -0,0 +1,62 @@
+"""Request coalescing: concurrent calls with the same key share one computation.
+
+When a class searches the same topic at the same moment, only the first
+request embeds, queries and reranks; the others wait for it and receive
+the same result. Coalescing is per process (per uvicorn worker).
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+from timing import count_coalesced
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Deduplicate in-flight calls by key (like Go's singleflight.Group)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run fn once per in-flight key; return (result, shared).
+
+        `shared` is True for callers that attached to another caller's
+        computation. Exceptions are raised in every caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            count_coalesced(self.name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # Later callers start a fresh computation instead of reusing this result
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        return len(self._calls)
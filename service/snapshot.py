@@ -0,0 +1,150 @@
+"""Read-only on-disk snapshot of the embedding matrices, shared by all workers.
+
+Ingest writes the normalized embedding matrices plus their id arrays to
+one file (SNAPSHOT_PATH). Workers with SEARCH_ENGINE=memory mmap it, so
+the arrays are views on the page cache: N workers share one copy instead
+of each holding their own.
+
+File format (version 1, little-endian):
+
+    8 bytes   magic b'SLOSNAP\\0'
+    4 bytes   format version (uint32)
+    4 bytes   header length (uint32)
+    header    JSON: generation, embedding_model, created_at and, per array,
+              its dtype, shape and offset into the data section
+    data      raw array data; the section and every array start at a
+              multiple of 64 bytes
+
+A new snapshot is written next to the old one and renamed over it, so
+readers see either the old or the new file, never a partial one. Workers
+that still map the old file keep using it until they reload; the kernel
+frees it once the last mapping is gone.
+"""
+import mmap
+import os
+import struct
+import time
+from typing import Dict, Optional, Tuple
+import numpy as np
+import orjson
+
+MAGIC = b'SLOSNAP\0'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+_PREAMBLE = struct.Struct('<8sII')
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _identity(stat: os.stat_result) -> Tuple:
+    return (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def file_identity(path: str) -> Optional[Tuple]:
+    """Identifies the file currently at `path` (None if there is none); changes on every swap."""
+    try:
+        return _identity(os.stat(path))
+    except FileNotFoundError:
+        return None
+
+
+class Snapshot:
+    """A mapped snapshot: header fields plus read-only array views."""
+
+    def __init__(self, path: str, header: Dict, arrays: Dict[str, np.ndarray], identity: Tuple):
+        self.path = path
+        self.header = header
+        self.arrays = arrays
+        self.identity = identity
+
+    @property
+    def generation(self) -> int:
+        return self.header['generation']
+
+    @property
+    def embedding_model(self) -> Optional[str]:
+        return self.header.get('embedding_model')
+
+    def check(self, generation: int, embedding_model: Optional[str] = None):
+        """Raise ValueError unless the snapshot holds this corpus generation (and embedding model)."""
+        if self.generation != generation:
+            raise ValueError(f"Snapshot is for generation {self.generation}, corpus is at {generation}")
+        if embedding_model and self.embedding_model and self.embedding_model != embedding_model:
+            raise ValueError(f"Snapshot is of {self.embedding_model}, serving {embedding_model}")
+
+
+def write_snapshot(path: str, arrays: Dict[str, np.ndarray], generation: int,
+                   embedding_model: Optional[str] = None) -> int:
+    """Write the arrays to a new snapshot and atomically replace `path`; returns its size."""
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        layout[name] = {'dtype': array.dtype.newbyteorder('<').str, 'shape': list(array.shape), 'offset': offset}
+        offset = _aligned(offset + array.nbytes)
+    encoded = orjson.dumps({
+        'generation': generation,
+        'embedding_model': embedding_model,
+        'created_at': time.time(),
+        'arrays': layout,
+    })
+    data_start = _aligned(_PREAMBLE.size + len(encoded))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(encoded)))
+            f.write(encoded)
+            for name, array in arrays.items():
+                f.seek(data_start + layout[name]['offset'])
+                f.write(array.astype(layout[name]['dtype'], copy=False).tobytes())
+            f.truncate(data_start + offset)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    # Make the rename itself durable
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+    return data_start + offset
+
+
+def read_snapshot(path: str) -> Snapshot:
+    """Map a snapshot read-only. Raises FileNotFoundError, or ValueError for an invalid file."""
+    with open(path, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        size = stat.st_size
+        if size < _PREAMBLE.size:
+            raise ValueError(f"{path} is not a snapshot")
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, header_length = _PREAMBLE.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a snapshot")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Snapshot format version {version} is not supported (expected {FORMAT_VERSION})")
+    try:
+        header = orjson.loads(buffer[_PREAMBLE.size:_PREAMBLE.size + header_length])
+        data_start = _aligned(_PREAMBLE.size + header_length)
+        arrays = {}
+        for name, entry in header['arrays'].items():
+            dtype, shape = np.dtype(entry['dtype']), tuple(entry['shape'])
+            count, offset = int(np.prod(shape)), data_start + entry['offset']
+            if offset + count * dtype.itemsize > size:
+                raise ValueError(f"Array {name} extends past the end of the file")
+            # np.frombuffer on a read-only mmap gives read-only, zero-copy views
+            arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset).reshape(shape)
+    except (KeyError, TypeError, orjson.JSONDecodeError) as e:
+        raise ValueError(f"Corrupt snapshot header in {path}: {e}") from None
+    return Snapshot(path, header, arrays, _identity(stat))
@@ -0,0 +1,190 @@
+"""Typeahead suggestions from an in-memory sorted array (no embedding call).
+
+Built per worker from the corpus: terms of the doelzin and uitwerking
+descriptions (counted by the number of texts containing them), doelzin
+titles and prefixes. Searched queries are counted too; a query searched at
+least SUGGEST_MIN_QUERY_COUNT times is suggested as well, above corpus
+entries, so popular searches come first.
+
+A lookup is a binary search for the typed text in the sorted, normalized
+keys (lowercase, accents removed) followed by a top-k over the matches.
+One- and two-character prefixes, which match a large part of the array,
+are answered from precomputed top lists. Either way a lookup takes
+microseconds.
+"""
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, List, Tuple
+from config import config
+from corpus import get_generation
+
+# Most suggestions a lookup can return
+MAX_LIMIT = 50
+
+# Prefixes up to this length get precomputed top lists
+SHORT_PREFIX = 2
+
+# Frequent Dutch function words; never suggested as terms
+STOPWORDS = frozenset("""
+    aan als bij dat de deze die dit door een eens en er het hun in is kan
+    met na naar niet of om onder op over te ten ter tot uit van voor wat
+    wel worden wordt zich zij zijn zoals
+""".split())
+
+WORD = re.compile(r'\w+')
+
+_suggester = None
+_building = threading.Lock()
+
+# Searched queries: normalized key → [display text, count]; survives rebuilds
+_queries: Dict[str, list] = {}
+_popular: List[str] = []  # sorted keys of queries counted at least SUGGEST_MIN_QUERY_COUNT times
+_queries_lock = threading.Lock()
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and collapse whitespace ('Geïntegreerd  X' → 'geintegreerd x')."""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ' '.join(''.join(c for c in decomposed if not unicodedata.combining(c)).split())
+
+
+def prefix_range(keys: List[str], prefix: str) -> Tuple[int, int]:
+    """Slice of the sorted keys that start with prefix."""
+    return bisect_left(keys, prefix), bisect_left(keys, prefix + '\U0010ffff')
+
+
+class Suggester:
+    """Sorted suggestion keys with parallel entries (text, kind, count)."""
+
+    def __init__(self, generation: int, entries: Dict[str, Tuple[str, str, int]]):
+        self.generation = generation
+        self.keys = sorted(entries)
+        self.entries = [entries[key] for key in self.keys]
+        self.built_at = time.time()
+
+        # Top suggestions per short prefix, so 'b' does not rank half the array
+        short: Dict[str, List[int]] = {}
+        for position, key in enumerate(self.keys):
+            for length in range(1, SHORT_PREFIX + 1):
+                if len(key) >= length:
+                    short.setdefault(key[:length], []).append(position)
+        self._short = {
+            prefix: heapq.nlargest(MAX_LIMIT, positions, key=self._count)
+            for prefix, positions in short.items()
+        }
+
+    def _count(self, position: int) -> int:
+        return self.entries[position][2]
+
+    @classmethod
+    def build(cls, db) -> 'Suggester':
+        """Collect terms, titles and prefixes from the corpus."""
+        generation = get_generation(db)
+        doelzinnen = db.executesql("SELECT title, description, prefix FROM doelzin")
+        uitwerkingen = db.executesql("SELECT description FROM uitwerking")
+        db.commit()
+
+        terms, term_text = Counter(), {}
+        for text in [r[1] for r in doelzinnen] + [r[0] for r in uitwerkingen]:
+            words = {word for word in WORD.findall((text or '').lower())
+                     if len(word) >= 3 and not word.isdigit() and word not in STOPWORDS}
+            for word in words:
+                key = normalize(word)
+                terms[key] += 1
+                term_text.setdefault(key, word)
+
+        titles = Counter(normalize(r[0]) for r in doelzinnen if r[0])
+        title_text = {normalize(r[0]): r[0] for r in doelzinnen if r[0]}
+        prefixes = Counter(normalize(r[2]) for r in doelzinnen if r[2])
+        prefix_text = {normalize(r[2]): r[2] for r in doelzinnen if r[2]}
+
+        # Titles and prefixes win over a term with the same key
+        entries = {key: (term_text[key], 'term', count) for key, count in terms.items()}
+        entries.update({key: (prefix_text[key], 'prefix', count) for key, count in prefixes.items()})
+        entries.update({key: (title_text[key], 'title', count) for key, count in titles.items()})
+        return cls(generation, entries)
+
+    def _matches(self, prefix: str, limit: int) -> List[int]:
+        if len(prefix) <= SHORT_PREFIX:
+            return self._short.get(prefix, [])[:limit]
+        lo, hi = prefix_range(self.keys, prefix)
+        return heapq.nlargest(limit, range(lo, hi), key=self._count)
+
+    def suggest(self, text: str, limit: int = 10) -> List[Dict]:
+        """Suggestions starting with text: popular past queries first, then by frequency."""
+        prefix = normalize(text)
+        if not prefix:
+            return []
+        limit = min(limit, MAX_LIMIT)
+
+        suggestions, seen = [], set()
+        for key, (query, count) in popular_queries(prefix, limit):
+            suggestions.append({'text': query, 'kind': 'query', 'count': count})
+            seen.add(key)
+        for position in self._matches(prefix, limit):
+            if len(suggestions) >= limit:
+                break
+            if self.keys[position] not in seen:
+                text, kind, count = self.entries[position]
+                suggestions.append({'text': text, 'kind': kind, 'count': count})
+        return suggestions
+
+    def info(self) -> Dict:
+        return {'generation': self.generation, 'entries': len(self.keys), 'built_at': self.built_at}
+
+
+def record_query(query: str):
+    """Count a searched query; from SUGGEST_MIN_QUERY_COUNT searches on it is suggested."""
+    key = normalize(query)
+    if not key or len(key) > 200 or config.SUGGEST_MIN_QUERY_COUNT <= 0:
+        return
+    with _queries_lock:
+        entry = _queries.get(key)
+        if entry is None:
+            if len(_queries) >= config.SUGGEST_MAX_QUERIES:
+                return
+            entry = _queries[key] = [' '.join(query.split()), 0]
+        entry[1] += 1
+        if entry[1] == config.SUGGEST_MIN_QUERY_COUNT:
+            insort(_popular, key)
+
+
+def popular_queries(prefix: str, limit: int) -> List[Tuple[str, tuple]]:
+    """Popular queries starting with prefix, most searched first."""
+    with _queries_lock:
+        lo, hi = prefix_range(_popular, prefix)
+        matches = [(key, tuple(_queries[key])) for key in _popular[lo:hi]]
+    return heapq.nlargest(limit, matches, key=lambda match: match[1][1])
+
+
+def load_suggester(db) -> Suggester:
+    """(Re)build the suggestions now; concurrent callers wait for the same build."""
+    global _suggester
+    with _building:
+        if _suggester is None or _suggester.generation != get_generation(db):
+            start = time.perf_counter()
+            _suggester = Suggester.build(db)
+            print(f"✅ Built suggestions: {_suggester.info()} in {time.perf_counter() - start:.1f}s")
+    return _suggester
+
+
+def _rebuild_in_background():
+    from database import get_database
+    try:
+        load_suggester(get_database())
+    except Exception as e:
+        print(f"⚠️  Rebuilding suggestions failed: {e}")
+
+
+def get_suggester(db) -> Suggester:
+    """The current suggestions; built on first use, rebuilt in the background after an ingest."""
+    if _suggester is None:
+        return load_suggester(db)
+    if get_generation(db) != _suggester.generation and not _building.locked():
+        threading.Thread(target=_rebuild_in_background, name='suggest-rebuild', daemon=True).start()
+    return _suggester
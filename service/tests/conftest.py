@@ -0,0 +1,27 @@
+"""Unit tests for the service modules (python -m pytest from service/ or the repository root).
+
+The modules import each other by name, as they do in the container, where
+service/ is the working directory.
+"""
+import os
+import sys
+import time
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A monotonic clock that only moves when the test advances it (clock[0] is the time)."""
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    return now
+
+
+def wait_for(condition, timeout: float = 5.0):
+    """Poll until condition() holds, for tests that coordinate threads."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for the other threads"
+        time.sleep(0.001)
@@ -0,0 +1,48 @@
+"""Per-request latency budget."""
+import pytest
+from budget import Budget
+
+
+def test_remaining_and_exhausted(clock):
+    b = Budget(500)
+    assert b.remaining() == pytest.approx(0.5)
+    assert not b.exhausted()
+    assert b.allows(0.3)
+
+    clock[0] += 0.4
+    assert b.remaining() == pytest.approx(0.1)
+    assert not b.allows(0.3)
+    assert not b.exhausted()
+
+    clock[0] = 1000.5
+    assert b.exhausted()
+    clock[0] += 1
+    assert b.remaining() == pytest.approx(-1.0)
+    assert b.exhausted()
+
+
+def test_timeout_is_the_remaining_budget_capped(clock):
+    b = Budget(2000)
+    assert b.timeout() == pytest.approx(2.0)
+    assert b.timeout(5) == pytest.approx(2.0)
+    assert b.timeout(0.5) == 0.5
+    clock[0] += 3
+    assert b.timeout() == 0.0
+    assert b.timeout(5) == 0.0
+
+
+def test_without_milliseconds_never_runs_out(clock):
+    for b in (Budget(), Budget(0)):
+        clock[0] += 1e6
+        assert b.remaining() == float('inf')
+        assert not b.exhausted()
+        assert b.timeout() is None
+        assert b.timeout(5) == 5
+
+
+def test_degradations_are_recorded_once():
+    b = Budget(100)
+    b.degrade('rerank_truncated')
+    b.degrade('qb_cosine_skipped')
+    b.degrade('rerank_truncated')
+    assert b.degradations == ['rerank_truncated', 'qb_cosine_skipped']
@@ -0,0 +1,48 @@
+"""TTLCache: per-entry expiry and least-recently-used eviction."""
+from cache import TTLCache
+
+
+def test_entries_expire_after_ttl(clock):
+    c = TTLCache(maxsize=10, ttl=60)
+    c.set('a', 1)
+    clock[0] += 30
+    c.set('b', 2)
+    clock[0] += 30
+    assert c.get('a') == 1
+    clock[0] += 0.001
+    assert c.get('a') is None
+    assert c.get('a', 'missing') == 'missing'
+    assert c.get('b') == 2
+    assert len(c) == 1
+
+
+def test_set_restarts_the_ttl(clock):
+    c = TTLCache(maxsize=10, ttl=60)
+    c.set('a', 1)
+    clock[0] += 50
+    c.set('a', 2)
+    clock[0] += 50
+    assert c.get('a') == 2
+
+
+def test_least_recently_used_is_evicted():
+    c = TTLCache(maxsize=2, ttl=60)
+    c.set('a', 1)
+    c.set('b', 2)
+    assert c.get('a') == 1  # 'b' is now the least recently used
+    c.set('c', 3)
+    assert c.get('b') is None
+    assert c.get('a') == 1
+    assert c.get('c') == 3
+    assert len(c) == 2
+
+
+def test_pop_and_clear():
+    c = TTLCache(maxsize=10, ttl=60)
+    c.set('a', 1)
+    c.set('b', 2)
+    assert c.pop('a') == 1
+    assert c.pop('a', 'missing') == 'missing'
+    c.clear()
+    assert len(c) == 0
+    assert c.get('b') is None
@@ -0,0 +1,50 @@
+"""Embedding version guards: refused operations fail before touching any table."""
+from types import SimpleNamespace
+import pytest
+from embedding_versions import activate, drop_version
+
+VERSIONS = {
+    1: SimpleNamespace(id=1, embedding_model='openai/text-embedding-3-small', dimensions=None,
+                       doelzin_table='doelzin_embedding', uitwerking_table='uitwerking_embedding', status='retired'),
+    2: SimpleNamespace(id=2, embedding_model='openai/text-embedding-3-large', dimensions=1536,
+                       doelzin_table='doelzin_embedding_v2', uitwerking_table='uitwerking_embedding_v2',
+                       status='active'),
+    3: SimpleNamespace(id=3, embedding_model='openai/text-embedding-3-large', dimensions=512,
+                       doelzin_table='doelzin_embedding_v3', uitwerking_table='uitwerking_embedding_v3',
+                       status='building'),
+}
+
+
+class RegistryDB:
+    """Serves embedding_version rows by id; any other database access fails the test."""
+
+    def embedding_version(self, version_id):
+        return VERSIONS.get(version_id)
+
+    def executesql(self, sql, *args, **kwargs):
+        pytest.fail(f"unexpected SQL: {sql}")
+
+    def __call__(self, *args):
+        pytest.fail("unexpected query")
+
+    def __getitem__(self, table):
+        pytest.fail(f"unexpected access to {table}")
+
+
+@pytest.mark.parametrize('version_id, message', [
+    (1, 'uses the original doelzin_embedding table'),
+    (2, 'is active; activate another version first'),
+    (4, 'does not exist'),
+])
+def test_drop_version_refuses(version_id, message):
+    with pytest.raises(ValueError, match=message):
+        drop_version(RegistryDB(), version_id)
+
+
+@pytest.mark.parametrize('version_id, message', [
+    (3, 'is still building; run backfill first'),
+    (4, 'does not exist'),
+])
+def test_activate_refuses(version_id, message):
+    with pytest.raises(ValueError, match=message):
+        activate(RegistryDB(), version_id)
@@ -0,0 +1,101 @@
+"""Query-embedding batches: every caller keeps its own deadline; a lone query is not held back."""
+import threading
+import pytest
+import embeddings
+from conftest import wait_for
+from embeddings import EmbeddingBatcher
+
+
+class BlockingEmbeddings:
+    """Answers only once released; records the timeout of every request."""
+
+    model = 'test/blocking'
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.timeouts = []
+
+    def encode(self, texts, convert_to_numpy=False, timeout=None):
+        self.timeouts.append(timeout)
+        assert self.release.wait(5)
+        return [[float(len(text))] for text in texts]
+
+
+@pytest.fixture
+def embedder(monkeypatch):
+    embedder = BlockingEmbeddings()
+    monkeypatch.setattr(embeddings, '_embedder', embedder)
+    return embedder
+
+
+def encode_pair(batcher: EmbeddingBatcher, leader_timeout, follower_timeout) -> dict:
+    """Leader and follower in one batch (max_batch=2); outcomes by role once both have returned.
+
+    Another query counts as in flight, so the leader waits for the follower
+    instead of sending at once.
+    """
+    outcomes, threads = {}, []
+    batcher._active += 1
+
+    def run(role, text, timeout):
+        try:
+            outcomes[role] = batcher.encode(text, timeout).tolist()
+        except TimeoutError as e:
+            outcomes[role] = e
+
+    for role, text, timeout in (('leader', 'aa', leader_timeout), ('follower', 'bbb', follower_timeout)):
+        threads.append(threading.Thread(target=run, args=(role, text, timeout)))
+        threads[-1].start()
+        if role == 'leader':
+            wait_for(lambda: batcher._pending is not None)
+    wait_for(lambda: batcher._pending is None)
+    batcher._active -= 1
+    return outcomes, threads
+
+
+def finish(embedder, outcomes, threads, first: str):
+    """Wait until `first` has given up, then let the request complete."""
+    wait_for(lambda: first in outcomes)
+    embedder.release.set()
+    for thread in threads:
+        thread.join(5)
+    return outcomes
+
+
+def test_follower_without_budget_outlives_the_leaders_deadline(embedder):
+    batcher = EmbeddingBatcher(window_ms=5000, max_batch=2)
+    outcomes = finish(embedder, *encode_pair(batcher, 0.05, None), first='leader')
+    assert isinstance(outcomes['leader'], TimeoutError)
+    assert outcomes['follower'] == [3.0]
+    assert embedder.timeouts == [None]
+
+
+def test_short_follower_budget_does_not_fail_the_leader(embedder):
+    batcher = EmbeddingBatcher(window_ms=5000, max_batch=2)
+    outcomes = finish(embedder, *encode_pair(batcher, None, 0.05), first='follower')
+    assert isinstance(outcomes['follower'], TimeoutError)
+    assert outcomes['leader'] == [2.0]
+    assert embedder.timeouts == [None]
+
+
+def test_request_gets_the_latest_deadline(embedder):
+    batcher = EmbeddingBatcher(window_ms=5000, max_batch=2)
+    outcomes, threads = encode_pair(batcher, 1.0, 30.0)
+    wait_for(lambda: embedder.timeouts)
+    embedder.release.set()
+    for thread in threads:
+        thread.join(5)
+    assert outcomes == {'leader': [2.0], 'follower': [3.0]}
+    assert 25 < embedder.timeouts[0] <= 30
+
+
+def test_lone_query_does_not_wait_for_the_window(embedder):
+    batcher = EmbeddingBatcher(window_ms=5000, max_batch=2)
+    outcome = []
+    thread = threading.Thread(target=lambda: outcome.append(batcher.encode('aa').tolist()))
+    thread.start()
+    wait_for(lambda: embedder.timeouts, timeout=1)
+    embedder.release.set()
+    thread.join(5)
+    assert outcome == [[2.0]]
+    assert batcher._active == 0
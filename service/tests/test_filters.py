@@ -0,0 +1,122 @@
+"""Metadata filters on the in-memory index: every field, and their combination, narrows the results."""
+import numpy as np
+import pytest
+from filters import parse_filters
+from index import CorpusIndex, normalize_rows
+
+PREFIXES = ('REK', 'NED')
+SOORTEN = ('kerndoel', 'eindterm')
+STATUSES = ('actief', 'vervallen')
+NIVEAUS = ('po', 'vmbo', 'havo')
+DOELZINNEN, UITWERKINGEN = 40, 60
+
+# Filter-only uitwerking metadata: status alternates per two, niveaus cycle through every subset
+UITWERKING_FILTERS = [
+    {'status': STATUSES[u // 2 % 2], 'niveau_ids': [n for bit, n in enumerate(NIVEAUS) if (u % 8) >> bit & 1]}
+    for u in range(UITWERKINGEN)
+]
+
+
+def linked(d: int) -> list:
+    """Zero to three uitwerkingen per doelzin."""
+    return [(d * 7 + step * 11) % UITWERKINGEN for step in range(d % 4)]
+
+
+@pytest.fixture(scope='module')
+def index() -> CorpusIndex:
+    rng = np.random.default_rng(0)
+    uitwerkingen = [{'id': u + 1, 'fo_id': f'u{u}', 'title': '', 'description': f'uitwerking {u}',
+                     'prefix': PREFIXES[u % 2]} for u in range(UITWERKINGEN)]
+    doelzinnen = [
+        {'id': d + 1, 'fo_id': f'd{d}', 'title': f'doelzin {d}', 'description': '', 'prefix': PREFIXES[d % 2],
+         'soort': SOORTEN[d // 2 % 2], 'status': STATUSES[d // 4 % 2], 'uitwerking_ids': [f'u{u}' for u in linked(d)]}
+        for d in range(DOELZINNEN)
+    ]
+    return CorpusIndex(1, doelzinnen, normalize_rows(rng.standard_normal((DOELZINNEN, 16)).astype(np.float32)),
+                       uitwerkingen, normalize_rows(rng.standard_normal((UITWERKINGEN, 16)).astype(np.float32)),
+                       np.arange(UITWERKINGEN, dtype=np.int64), UITWERKING_FILTERS)
+
+
+@pytest.fixture(scope='module')
+def query() -> np.ndarray:
+    return np.random.default_rng(1).standard_normal(16)
+
+
+def doelzin_matches(index: CorpusIndex, d: int, filters: dict) -> bool:
+    doelzin = index.doelzinnen[d]
+    for field, values in filters.items():
+        if field == 'niveau_ids':
+            on_niveau = {n for u in linked(d) for n in UITWERKING_FILTERS[u]['niveau_ids']}
+            if not on_niveau & set(values):
+                return False
+        elif doelzin[field] not in values:
+            return False
+    return True
+
+
+def uitwerking_matches(index: CorpusIndex, u: int, filters: dict) -> bool:
+    for field, values in filters.items():
+        if field == 'prefix':
+            value = {index.uitwerkingen[u]['prefix']}
+        elif field == 'status':
+            value = {UITWERKING_FILTERS[u]['status']}
+        else:
+            value = set(UITWERKING_FILTERS[u]['niveau_ids'])
+        if not value & set(values):
+            return False
+    return True
+
+
+DOELZIN_FILTERS = [
+    parse_filters(prefix='REK'),
+    parse_filters(soort='eindterm'),
+    parse_filters(status='actief'),
+    parse_filters(niveau_ids='havo'),
+    parse_filters(niveau_ids='po,vmbo'),
+    parse_filters(prefix='NED', soort='kerndoel', status='vervallen', niveau_ids='vmbo'),
+]
+
+
+@pytest.mark.parametrize('filters', DOELZIN_FILTERS, ids=str)
+@pytest.mark.parametrize('search', ['search_doelzinnen', 'search_combined'])
+def test_doelzin_filters_narrow_the_results(index, query, filters, search):
+    everything = getattr(index, search)(query, limit=DOELZINNEN, threshold=-1.0)
+    filtered = getattr(index, search)(query, limit=DOELZINNEN, threshold=-1.0, filters=filters)
+
+    expected = {d + 1 for d in range(DOELZINNEN) if doelzin_matches(index, d, filters)}
+    assert expected and len(expected) < DOELZINNEN
+    assert {r['id'] for r in filtered} == expected
+    if search == 'search_doelzinnen':
+        # Filtering only drops rows: the rest keep their order and similarity
+        assert filtered == [r for r in everything if r['id'] in expected]
+
+
+def test_niveau_filter_only_counts_uitwerkingen_on_the_niveau(index, query):
+    scores = normalize_rows(index.uitwerking_matrix) @ (query / np.linalg.norm(query))
+    results = index.search_combined(query, limit=DOELZINNEN, threshold=-1.0, filters=parse_filters(niveau_ids='havo'))
+    assert results
+    for result in results:
+        on_niveau = [u for u in linked(result['id'] - 1) if 'havo' in UITWERKING_FILTERS[u]['niveau_ids']]
+        assert result['uitwerking_similarity'] == pytest.approx(max(scores[on_niveau]), abs=1e-5)
+
+
+@pytest.mark.parametrize('filters', [
+    parse_filters(prefix='NED'),
+    parse_filters(status='vervallen'),
+    parse_filters(niveau_ids='vmbo'),
+    parse_filters(prefix='REK', status='actief', niveau_ids='po,havo'),
+], ids=str)
+def test_uitwerking_filters_narrow_the_results(index, query, filters):
+    filtered = index.search_uitwerkingen(query, limit=UITWERKINGEN, threshold=-1.0, filters=filters)
+    expected = {u + 1 for u in range(UITWERKINGEN) if uitwerking_matches(index, u, filters)}
+    assert expected and len(expected) < UITWERKINGEN
+    assert {r['id'] for r in filtered} == expected
+
+
+def test_uitwerkingen_have_no_soort(index, query):
+    with pytest.raises(ValueError, match='soort'):
+        index.search_uitwerkingen(query, filters=parse_filters(soort='kerndoel'))
+
+
+def test_unknown_filter_value_matches_nothing(index, query):
+    assert index.search_doelzinnen(query, limit=DOELZINNEN, threshold=-1.0, filters=parse_filters(prefix='XYZ')) == []
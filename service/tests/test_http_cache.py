@@ -0,0 +1,45 @@
+"""Conditional requests: ETags per generation and parameters, If-None-Match matching."""
+import pytest
+from fastapi import Request
+from http_cache import etag_matches, make_etag
+
+ETAG = make_etag(3, 'search', 'rekenen', 10)
+
+
+def request(if_none_match=None) -> Request:
+    headers = [] if if_none_match is None else [(b'if-none-match', if_none_match.encode())]
+    return Request({'type': 'http', 'method': 'GET', 'path': '/', 'headers': headers, 'query_string': b''})
+
+
+def test_etag_depends_on_generation_and_parameters():
+    assert ETAG == make_etag(3, 'search', 'rekenen', 10)
+    assert ETAG.startswith('"g3-') and ETAG.endswith('"')
+    assert ETAG != make_etag(4, 'search', 'rekenen', 10)
+    assert ETAG != make_etag(3, 'search', 'rekenen', 20)
+    assert make_etag(1, ('a', 'b')) != make_etag(1, ('b', 'a'))
+
+
+@pytest.mark.parametrize('header', [
+    ETAG,
+    f'  {ETAG}  ',
+    f'W/{ETAG}',
+    '*',
+    ' * ',
+    f'"other", {ETAG}',
+    f'"other",W/{ETAG} , "more"',
+])
+def test_matching_validators(header):
+    assert etag_matches(request(header), ETAG)
+
+
+@pytest.mark.parametrize('header', [
+    None,
+    '',
+    '"other"',
+    ETAG.strip('"'),
+    make_etag(4, 'search', 'rekenen', 10),
+    f'"other", W/"{ETAG}"',
+    '"other", *',
+])
+def test_other_validators_do_not_match(header):
+    assert not etag_matches(request(header), ETAG)
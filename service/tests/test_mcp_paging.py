@@ -0,0 +1,101 @@
+"""MCP pagination: cached result sets per corpus generation, never degraded ones."""
+import asyncio
+import orjson
+import pytest
+import mcp_server
+from cache import TTLCache
+
+RESULTS = [{'id': i, 'fo_id': f'd{i}', 'title': f'Doelzin {i}', 'description': 'rekenen',
+            'similarity': 1 - i / 100} for i in range(25)]
+
+
+class FakeBackend:
+    def __init__(self):
+        self.corpus_generation = 1
+
+    async def generation(self) -> int:
+        return self.corpus_generation
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    backend = FakeBackend()
+    monkeypatch.setattr(mcp_server, 'backend', backend)
+    monkeypatch.setattr(mcp_server, '_result_sets', TTLCache(maxsize=16, ttl=600))
+    return backend
+
+
+def counting_fetch(degradations=()):
+    calls = []
+
+    async def fetch(params):
+        calls.append(params)
+        return [dict(r) for r in RESULTS], list(degradations)
+    return fetch, calls
+
+
+def page(fetch, cursor=None, page_size=10):
+    params = {'query': 'rekenen', 'limit': 25, 'threshold': 0.0}
+    return orjson.loads(asyncio.run(mcp_server.paginate('search', params, page_size, cursor, fetch)))
+
+
+def test_later_pages_reuse_the_result_set(backend):
+    fetch, calls = counting_fetch()
+    first = page(fetch)
+    second = page(fetch, first['next_cursor'])
+    third = page(fetch, second['next_cursor'])
+    assert len(calls) == 1
+    assert [r['id'] for p in (first, second, third) for r in p['results']] == list(range(25))
+    assert third['next_cursor'] is None
+
+
+def test_degraded_result_sets_are_not_cached(backend):
+    fetch, calls = counting_fetch(['rerank_truncated'])
+    page(fetch)
+    page(fetch)
+    assert len(calls) == 2
+
+
+def test_new_generation_runs_the_search_again(backend):
+    fetch, calls = counting_fetch()
+    page(fetch)
+    backend.corpus_generation += 1
+    page(fetch)
+    assert len(calls) == 2
+
+
+def test_cursor_round_trip():
+    params = {'query': 'rekenen', 'limit': 25, 'threshold': 0.0, 'prefix': 'REK'}
+    cursor = mcp_server.encode_cursor('search_goals', params, 10, 3)
+    assert mcp_server.decode_cursor('search_goals', cursor) == (params, 10, 3)
+
+
+@pytest.mark.parametrize('tool, params, offset', [
+    ('search_goals', {'query': 'rekenen'}, 10),                         # another tool's cursor
+    ('search', {'limit': 25}, 10),                                      # no query
+    ('search', {'query': 'rekenen', 'page_size': 1000}, 10),            # not a cursor parameter
+    ('search', {'query': 'rekenen', 'db': 'other'}, 10),
+    ('search', {'query': 'rekenen'}, -10),
+])
+def test_unusable_cursor_payloads_are_rejected(tool, params, offset):
+    cursor = mcp_server.encode_cursor(tool, params, offset, 1)
+    with pytest.raises(ValueError, match='Invalid cursor'):
+        mcp_server.decode_cursor('search', cursor)
+
+
+def test_altered_cursor_is_rejected(backend):
+    fetch, _ = counting_fetch()
+    cursor = page(fetch)['next_cursor']
+    encoded, signature = cursor.split('.')
+    forged = mcp_server.encode_cursor('search', {'query': 'rekenen', 'limit': 10_000}, 0, 1).split('.')[0]
+    for altered in (f"{forged}.{signature}", encoded, 'eyJ0IjoxfQ'):
+        with pytest.raises(ValueError, match='Invalid cursor'):
+            page(fetch, altered)
+
+
+def test_cursor_from_an_older_generation_is_rejected(backend):
+    fetch, _ = counting_fetch()
+    cursor = page(fetch)['next_cursor']
+    backend.corpus_generation += 1
+    with pytest.raises(ValueError, match='corpus has changed'):
+        page(fetch, cursor)
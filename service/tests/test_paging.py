@@ -0,0 +1,125 @@
+"""Cursor pagination: signed cursors and pages that tile the ranked set."""
+import base64
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+import paging
+from paging import decode_cursor, encode_cursor, search_page
+
+GENERATION = 7
+TOPICS = ['rekenen', 'breuken', 'lezen', 'schrijven', 'spelling', 'meten']
+
+
+def fake_search_combined(db, query, limit=100, threshold=0.6, doelzin_weight=0.7, filters=None, budget=None):
+    results = [
+        {'id': i, 'title': f"Doelzin {i} {TOPICS[i % len(TOPICS)]}",
+         'description': f"Omschrijving {TOPICS[(i * 5) % len(TOPICS)]}", 'similarity': 1 - i / 100}
+        for i in range(60)
+    ]
+    return [r for r in results if r['similarity'] >= threshold][:limit]
+
+
+@pytest.fixture
+def corpus(monkeypatch):
+    """No database: a fixed candidate list, the corpus at GENERATION and a deterministic LLM."""
+    state = {'generation': GENERATION, 'searches': 0}
+
+    def search(*args, **kwargs):
+        state['searches'] += 1
+        return fake_search_combined(*args, **kwargs)
+
+    def rerank_scores(query, results, budget=None):
+        for index, result in enumerate(results):
+            yield index, (result['id'] * 7 % 10) / 10
+
+    monkeypatch.setattr(paging, 'search_combined', search)
+    monkeypatch.setattr(paging, 'get_generation', lambda db: state['generation'])
+    monkeypatch.setattr(paging, 'iter_rerank_scores', rerank_scores)
+    monkeypatch.setattr(paging, '_result_sets', paging.TTLCache(maxsize=16, ttl=60))
+    return state
+
+
+def all_pages(page_size: int, rerank: bool, **params):
+    page = search_page(None, 'rekenen met breuken', rerank=rerank, page_size=page_size, **params)
+    pages = [page]
+    while page['next_cursor']:
+        page = search_page(None, page_size=page_size, cursor=page['next_cursor'])
+        pages.append(page)
+    return pages
+
+
+def test_cursor_round_trip():
+    params = {'query': 'rekenen', 'limit': 50, 'threshold': 0.5, 'weight': 0.7, 'rerank': True,
+              'filters': {'prefix': ['REK']}, 'generation': GENERATION}
+    decoded, offset = decode_cursor(encode_cursor(params, 20))
+    assert offset == 20
+    assert decoded['filters'] == {'prefix': ('REK',)}
+    assert {k: v for k, v in decoded.items() if k != 'filters'} == {k: v for k, v in params.items() if k != 'filters'}
+
+
+@pytest.mark.parametrize('tamper', [
+    lambda cursor: cursor.split('.')[0],                   # signature removed
+    lambda cursor: cursor + 'A',                           # signature changed
+    lambda cursor: 'not a cursor',
+    lambda cursor: '',
+])
+def test_invalid_cursor_is_rejected(tamper):
+    cursor = encode_cursor({'query': 'rekenen', 'filters': {}, 'generation': GENERATION}, 10)
+    with pytest.raises(ValueError, match='Invalid cursor'):
+        decode_cursor(tamper(cursor))
+
+
+def test_altered_parameters_are_rejected():
+    cursor = encode_cursor({'query': 'rekenen', 'limit': 100, 'filters': {}, 'generation': GENERATION}, 10)
+    payload = orjson.loads(base64.urlsafe_b64decode(cursor.split('.')[0] + '=='))
+    payload['p']['limit'] = 'all'
+    payload['o'] = 0
+    encoded = base64.urlsafe_b64encode(orjson.dumps(payload)).decode().rstrip('=')
+    with pytest.raises(ValueError, match='Invalid cursor'):
+        decode_cursor(f"{encoded}.{cursor.split('.')[1]}")
+
+
+@pytest.mark.parametrize('rerank', [False, True])
+@pytest.mark.parametrize('page_size', [1, 7, 10, 45])
+def test_pages_neither_overlap_nor_leave_gaps(corpus, rerank, page_size):
+    pages = all_pages(page_size, rerank, limit=45, threshold=0.5)
+    ranked = paging.finalize_results('rekenen met breuken',
+                                     fake_search_combined(None, 'rekenen met breuken', 45, 0.5), 45, 0.5)
+
+    ids = [result['id'] for page in pages for result in page['results']]
+    assert len(ids) == len(set(ids))
+    assert sorted(ids) == sorted(result['id'] for result in ranked)
+    assert [page['offset'] for page in pages] == list(range(0, len(ranked), page_size))
+    assert all(page['total'] == len(ranked) for page in pages)
+    for page in pages:
+        # Page boundaries follow the ranking; the rerank only reorders within a page
+        boundary = [result['id'] for result in ranked[page['offset']:page['offset'] + page_size]]
+        assert sorted(result['id'] for result in page['results']) == sorted(boundary)
+    assert pages[-1]['next_cursor'] is None
+    assert corpus['searches'] == 1
+
+
+def test_cursor_from_an_older_generation_is_rejected(corpus):
+    first = search_page(None, 'rekenen', rerank=False, page_size=10)
+    corpus['generation'] += 1
+    with pytest.raises(ValueError, match='corpus has changed'):
+        search_page(None, page_size=10, cursor=first['next_cursor'])
+
+
+def test_api_answers_bad_cursors_with_400(corpus, monkeypatch):
+    import api_fastapi
+    monkeypatch.setattr(api_fastapi, 'get_database', lambda: None)
+    monkeypatch.setattr(api_fastapi, 'check_etag', lambda *args, **kwargs: None)
+    monkeypatch.setattr(api_fastapi.config, 'QUERY_LOG', False)
+    client = TestClient(api_fastapi.app)
+
+    first = client.get('/api/search', params={'q': 'rekenen', 'page_size': 10, 'rerank': 'false'})
+    assert first.status_code == 200
+    cursor = first.json()['next_cursor']
+    assert client.get('/api/search', params={'cursor': cursor}).status_code == 200
+
+    assert client.get('/api/search', params={'cursor': cursor[:-2]}).status_code == 400
+    corpus['generation'] += 1
+    response = client.get('/api/search', params={'cursor': cursor})
+    assert response.status_code == 400
+    assert 'corpus has changed' in response.json()['detail']
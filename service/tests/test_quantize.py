@@ -0,0 +1,128 @@
+"""Int8 quantization: recall of the quantized first pass with exact rescoring, scales and spill()."""
+import numpy as np
+import pytest
+from config import config
+from index import CorpusIndex, normalize_rows, top_k
+from quantize import QuantizedMatrix, spill
+
+K = 10
+
+
+def clustered(rows: int, dimensions: int = 128, clusters: int = 40, seed: int = 0) -> np.ndarray:
+    """Normalized rows around a few topics, like curriculum embeddings."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimensions))
+    noise = rng.standard_normal((rows, dimensions))
+    return normalize_rows((centers[rng.integers(0, clusters, rows)] + 0.8 * noise).astype(np.float32))
+
+
+def queries_near(matrix: np.ndarray, count: int = 50, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    pairs = rng.integers(0, len(matrix), size=(count, 2))
+    return normalize_rows(matrix[pairs[:, 0]] + matrix[pairs[:, 1]])
+
+
+def recall(truth: list, found: list) -> float:
+    return np.mean([len(np.intersect1d(t, f)) / len(t) for t, f in zip(truth, found)])
+
+
+def test_quantized_shortlist_with_exact_rescoring_finds_the_exact_top_k():
+    matrix = clustered(3000)
+    queries = queries_near(matrix)
+    quantized = QuantizedMatrix.from_matrix(matrix)
+
+    exact, approximate = matrix @ queries.T, quantized.scores(queries)
+    truth, found = [], []
+    for column, query in enumerate(queries):
+        truth.append(top_k(exact[:, column], K))
+        shortlist = top_k(approximate[:, column], K * config.INDEX_RESCORE_OVERSAMPLE)
+        rescored = matrix[shortlist] @ query
+        found.append(shortlist[top_k(rescored, K)])
+    assert recall(truth, found) >= config.INDEX_MIN_RECALL
+
+
+def test_scores_of_one_query_and_of_several_agree():
+    matrix = clustered(500)
+    queries = queries_near(matrix, 3)
+    quantized = QuantizedMatrix.from_matrix(matrix)
+    together = quantized.scores(queries)
+    assert together.shape == (500, 3)
+    for column, query in enumerate(queries):
+        np.testing.assert_allclose(quantized.scores(query), together[:, column], rtol=1e-5, atol=1e-6)
+    # Approximate scores stay close to the exact ones
+    assert np.abs(together - matrix @ queries.T).max() < 0.02
+
+
+def test_per_dimension_scales_round_trip():
+    matrix = clustered(1000, dimensions=64)
+    matrix[:, 5] = 0  # a dimension that is never used
+    quantized = QuantizedMatrix.from_matrix(matrix, block_rows=128)
+
+    assert quantized.codes.dtype == np.int8 and quantized.codes.shape == matrix.shape
+    assert quantized.scales.shape == (64,)
+    np.testing.assert_allclose(quantized.scales, np.where(
+        np.abs(matrix).max(axis=0) > 0, np.abs(matrix).max(axis=0) / 127, 1.0
+    ), rtol=1e-6)
+    # The largest value of every used dimension maps to ±127
+    assert (np.abs(quantized.codes).max(axis=0)[np.arange(64) != 5] == 127).all()
+    assert (quantized.codes[:, 5] == 0).all()
+    # Dequantized values are within half a step of the originals
+    error = np.abs(quantized.codes * quantized.scales - matrix)
+    assert (error <= quantized.scales / 2 + 1e-6).all()
+    assert quantized.nbytes == matrix.size + 64 * 4
+
+
+def test_spill_returns_identical_scores():
+    matrix = clustered(800)
+    queries = queries_near(matrix, 5)
+    spilled = spill(matrix)
+
+    assert isinstance(spilled, np.memmap)
+    assert not spilled.flags.writeable
+    np.testing.assert_array_equal(spilled, matrix)
+    np.testing.assert_array_equal(spilled @ queries.T, matrix @ queries.T)
+    rows = np.array([3, 700, 42])
+    np.testing.assert_array_equal(spilled[rows] @ queries[0], matrix[rows] @ queries[0])
+    np.testing.assert_array_equal(
+        QuantizedMatrix.from_matrix(spilled).scores(queries), QuantizedMatrix.from_matrix(matrix).scores(queries)
+    )
+    empty = np.zeros((0, 16), dtype=np.float32)
+    assert spill(empty) is empty
+
+
+def corpus_index(doelzin_matrix: np.ndarray, uitwerking_matrix: np.ndarray, seed: int = 2) -> CorpusIndex:
+    rng = np.random.default_rng(seed)
+    uitwerkingen = [{'id': i + 1, 'fo_id': f'u{i}', 'title': '', 'description': f'uitwerking {i}', 'prefix': 'REK'}
+                    for i in range(len(uitwerking_matrix))]
+    doelzinnen = [
+        {'id': i + 1, 'fo_id': f'd{i}', 'title': f'doelzin {i}', 'description': '', 'prefix': 'REK',
+         'soort': 'kerndoel', 'status': 'actief',
+         'uitwerking_ids': [f'u{u}' for u in rng.choice(len(uitwerkingen), size=rng.integers(0, 4), replace=False)]}
+        for i in range(len(doelzin_matrix))
+    ]
+    return CorpusIndex(1, doelzinnen, doelzin_matrix, uitwerkingen, uitwerking_matrix,
+                       np.arange(len(uitwerkingen), dtype=np.int64))
+
+
+@pytest.mark.parametrize('search', ['search_combined', 'search_doelzinnen', 'search_uitwerkingen'])
+def test_quantized_index_matches_exact_search(search):
+    doelzin_matrix, uitwerking_matrix = clustered(1500, seed=3), clustered(4000, seed=4)
+    exact = corpus_index(doelzin_matrix, uitwerking_matrix)
+    quantized = corpus_index(doelzin_matrix.copy(), uitwerking_matrix.copy())
+    quantized.quantize()
+    assert quantized.quantized
+    assert min(quantized.recall.values()) >= config.INDEX_MIN_RECALL
+
+    queries = queries_near(doelzin_matrix, 30, seed=5)
+    truth, found = [], []
+    for query in queries:
+        expected = getattr(exact, search)(query, limit=K)
+        results = getattr(quantized, search)(query, limit=K)
+        truth.append([r['id'] for r in expected])
+        found.append([r['id'] for r in results])
+        # Returned similarities are exact, not approximate
+        by_id = {r['id']: r['similarity'] for r in expected}
+        for result in results:
+            if result['id'] in by_id:
+                assert result['similarity'] == pytest.approx(by_id[result['id']], abs=1e-5)
+    assert recall(truth, found) >= config.INDEX_MIN_RECALL
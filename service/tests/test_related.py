@@ -0,0 +1,70 @@
+"""Related doelzinnen: the nearest-neighbour graph, and the ETag of the endpoint."""
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+import http_cache
+from index import normalize_rows
+from related import nearest_neighbours
+from responses import COMPACT_FIELDS
+
+RELATED = [{'id': 2, 'fo_id': 'fo-2', 'title': 'Twee', 'description': 'Tweede doelzin', 'prefix': 'A',
+            'soort': 'kern', 'similarity': 0.9, 'uitwerkingen': []}]
+
+
+def unit_rows(rows: int, dimensions: int = 8, seed: int = 0) -> np.ndarray:
+    return normalize_rows(np.random.default_rng(seed).standard_normal((rows, dimensions)).astype(np.float32))
+
+
+@pytest.mark.parametrize('block_size', [1024, 3])
+def test_neighbours_are_the_most_similar_other_rows(block_size):
+    matrix = unit_rows(20)
+    indices, scores = nearest_neighbours(matrix, 5, block_size=block_size)
+    assert indices.shape == scores.shape == (20, 5)
+
+    similarities = matrix @ matrix.T
+    np.fill_diagonal(similarities, -np.inf)
+    for row in range(20):
+        assert row not in indices[row]
+        np.testing.assert_array_equal(indices[row], np.argsort(-similarities[row], kind='stable')[:5])
+        np.testing.assert_allclose(scores[row], similarities[row, indices[row]], rtol=1e-6)
+        assert (np.diff(scores[row]) <= 0).all()
+
+
+def test_duplicate_rows_are_neighbours_but_not_of_themselves():
+    matrix = unit_rows(4)
+    matrix[1] = matrix[0]
+    indices, scores = nearest_neighbours(matrix, 1)
+    assert indices[0, 0] == 1 and indices[1, 0] == 0
+    assert scores[0, 0] == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize('rows, k, width', [(4, 10, 3), (4, 3, 3), (1, 5, 0), (0, 5, 0), (4, 0, 0)])
+def test_k_is_capped_at_the_other_rows(rows, k, width):
+    indices, scores = nearest_neighbours(unit_rows(rows), k)
+    assert indices.shape == scores.shape == (rows, width)
+    for row in range(rows if width else 0):
+        assert sorted(indices[row]) == [other for other in range(rows) if other != row]
+
+
+def client(monkeypatch):
+    import api_fastapi
+    monkeypatch.setattr(api_fastapi, 'get_database', lambda: None)
+    monkeypatch.setattr(api_fastapi, 'get_related', lambda db, doelzin_id, limit: RELATED[:limit])
+    monkeypatch.setattr(http_cache, 'get_generation', lambda db: 1)
+    return TestClient(api_fastapi.app)
+
+
+def test_view_and_equivalent_fields_share_an_etag(monkeypatch):
+    api = client(monkeypatch)
+    compact = api.get('/api/doelzin/1/related', params={'view': 'compact'})
+    fields = api.get('/api/doelzin/1/related', params={'fields': ','.join(COMPACT_FIELDS)})
+    assert compact.status_code == fields.status_code == 200
+    assert compact.json() == fields.json()
+    assert compact.headers['etag'] == fields.headers['etag']
+
+    cached = api.get('/api/doelzin/1/related', params={'fields': ','.join(COMPACT_FIELDS)},
+                     headers={'If-None-Match': compact.headers['etag']})
+    assert cached.status_code == 304
+
+    full = api.get('/api/doelzin/1/related')
+    assert full.headers['etag'] != compact.headers['etag']
@@ -0,0 +1,54 @@
+"""LLM scoring within the latency budget."""
+from types import SimpleNamespace
+import httpx
+import pytest
+from openai import APITimeoutError
+import rerank
+from budget import Budget
+from config import config
+
+RESULT = {'title': 'Breuken', 'description': 'Rekenen met breuken', 'similarity': 0.42}
+
+
+class FakeLLM:
+    """Records the options of every call; answers '8', or raises `error`."""
+
+    def __init__(self, error: Exception = None, options: dict = None, calls: list = None):
+        self.error = error
+        self.options = options or {}
+        self.calls = [] if calls is None else calls
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def with_options(self, **options):
+        return FakeLLM(self.error, dict(self.options, **options), self.calls)
+
+    def create(self, **kwargs):
+        self.calls.append(dict(self.options, **{k: v for k, v in kwargs.items() if k == 'timeout'}))
+        if self.error:
+            raise self.error
+        return iter([SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content='8'))])])
+
+
+def test_budget_bound_calls_are_not_retried(monkeypatch):
+    llm = FakeLLM()
+    monkeypatch.setattr(rerank, '_llm_client', llm)
+    scores = list(rerank.iter_rerank_scores('breuken', [dict(RESULT)], Budget(2000)))
+    assert scores == [(0, 0.8)]
+    [call] = llm.calls
+    assert call['max_retries'] == 0
+    assert 0 < call['timeout'] <= min(2.0, config.RERANK_TIMEOUT)
+
+
+def test_calls_without_budget_keep_the_client_defaults(monkeypatch):
+    llm = FakeLLM()
+    monkeypatch.setattr(rerank, '_llm_client', llm)
+    assert list(rerank.iter_rerank_scores('breuken', [dict(RESULT)], Budget())) == [(0, 0.8)]
+    assert llm.calls == [{}]
+
+
+@pytest.mark.parametrize('error', [
+    APITimeoutError(request=httpx.Request('POST', 'http://llm/chat/completions')),
+    RuntimeError('connection reset'),
+])
+def test_timeouts_and_errors_fall_back_to_the_similarity(error):
+    assert rerank.score_result(FakeLLM(error), 'breuken', RESULT, timeout=0.5) == 0.42
@@ -0,0 +1,112 @@
+"""Request coalescing: concurrent callers share one execution and its outcome."""
+import threading
+import pytest
+import pipeline
+from budget import Budget
+from conftest import wait_for
+from singleflight import SingleFlight
+
+FOLLOWERS = 4
+
+
+def run_concurrently(flight: SingleFlight, fn):
+    """Start a leader blocked in fn, attach FOLLOWERS callers, then let fn finish."""
+    release = threading.Event()
+    outcomes = []
+
+    def blocked():
+        release.wait(5)
+        return fn()
+
+    def caller():
+        try:
+            outcomes.append(('ok',) + flight.do('key', blocked))
+        except Exception as e:
+            outcomes.append(('error', e, None))
+
+    threads = [threading.Thread(target=caller)]
+    threads[0].start()
+    wait_for(lambda: flight.in_flight() == 1)
+    threads += [threading.Thread(target=caller) for _ in range(FOLLOWERS)]
+    for thread in threads[1:]:
+        thread.start()
+    wait_for(lambda: flight._calls['key'].waiters == FOLLOWERS)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return outcomes
+
+
+def test_concurrent_callers_share_one_execution():
+    flight = SingleFlight('test')
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {'results': [1, 2, 3]}
+
+    outcomes = run_concurrently(flight, compute)
+    assert len(calls) == 1
+    assert len(outcomes) == FOLLOWERS + 1
+    results = [result for _, result, _ in outcomes]
+    assert all(result is results[0] for result in results)
+    assert sorted(shared for _, _, shared in outcomes) == [False] + [True] * FOLLOWERS
+    assert flight.in_flight() == 0
+
+
+def test_concurrent_callers_share_one_exception():
+    flight = SingleFlight('test')
+    calls = []
+
+    def fail():
+        calls.append(1)
+        raise RuntimeError('search failed')
+
+    outcomes = run_concurrently(flight, fail)
+    assert len(calls) == 1
+    assert [status for status, _, _ in outcomes] == ['error'] * (FOLLOWERS + 1)
+    errors = [error for _, error, _ in outcomes]
+    assert all(error is errors[0] for error in errors)
+    assert flight.in_flight() == 0
+
+
+def test_later_calls_run_again():
+    flight = SingleFlight('test')
+    assert flight.do('key', lambda: 1) == (1, False)
+    assert flight.do('key', lambda: 2) == (2, False)
+    with pytest.raises(ValueError):
+        flight.do('key', lambda: int('x'))
+    assert flight.do('key', lambda: 3) == (3, False)
+
+
+@pytest.mark.parametrize('degradations, follower_degradations', [
+    ([], []),
+    (['rerank_truncated'], ['rerank_truncated', 'shared_budget']),
+])
+def test_attached_search_marks_degradations_of_the_earlier_deadline(monkeypatch, degradations, follower_degradations):
+    release = threading.Event()
+
+    def run_search(db, query, limit, threshold, weight, rerank, filters, budget):
+        release.wait(5)
+        return {'query': query, 'count': 0, 'results': [], 'degradations': list(degradations)}
+
+    monkeypatch.setattr(pipeline, '_run_search', run_search)
+    payloads, budgets = {}, {'leader': Budget(1000), 'follower': Budget(1000)}
+
+    def search(role, query):
+        payloads[role] = pipeline.run_search(None, query, budget=budgets[role])
+
+    threads = [threading.Thread(target=search, args=('leader', 'fotosynthese'))]
+    threads[0].start()
+    wait_for(lambda: pipeline._searches.in_flight() == 1)
+    threads.append(threading.Thread(target=search, args=('follower', ' Fotosynthese')))
+    threads[1].start()
+    wait_for(lambda: next(iter(pipeline._searches._calls.values())).waiters == 1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert payloads['leader']['degradations'] == degradations
+    assert payloads['follower']['degradations'] == follower_degradations
+    assert payloads['follower']['query'] == ' Fotosynthese'
+    assert budgets['follower'].degradations == follower_degradations[len(degradations):]
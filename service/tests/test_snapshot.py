@@ -0,0 +1,97 @@
+"""Snapshot file format: write → read round-trip, alignment and rejection of unusable files."""
+import os
+import struct
+import numpy as np
+import pytest
+from snapshot import ALIGNMENT, FORMAT_VERSION, MAGIC, file_identity, read_snapshot, write_snapshot
+
+MODEL = 'openai/text-embedding-3-small'
+
+
+def sample_arrays():
+    rng = np.random.default_rng(1)
+    return {
+        'doelzin_ids': np.arange(1, 8, dtype=np.int32),            # 28 bytes: the next array needs padding
+        'doelzin_matrix': rng.standard_normal((7, 5)).astype(np.float32),
+        'uitwerking_ids': np.arange(100, 103, dtype=np.int64),
+        'uitwerking_matrix': rng.standard_normal((3, 5)).astype(np.float32),
+        'empty': np.zeros((0, 5), dtype=np.float32),
+    }
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'snapshots' / 'corpus.snapshot')
+
+
+def test_round_trip(path):
+    arrays = sample_arrays()
+    size = write_snapshot(path, arrays, generation=3, embedding_model=MODEL)
+
+    snapshot = read_snapshot(path)
+    assert file_identity(path)[3] == size
+    assert snapshot.generation == 3
+    assert snapshot.embedding_model == MODEL
+    assert set(snapshot.arrays) == set(arrays)
+    for name, array in arrays.items():
+        assert snapshot.arrays[name].dtype == array.dtype
+        np.testing.assert_array_equal(snapshot.arrays[name], array)
+        assert not snapshot.arrays[name].flags.writeable
+
+
+def test_data_section_and_arrays_are_aligned(path):
+    write_snapshot(path, sample_arrays(), generation=1)
+    snapshot = read_snapshot(path)
+    for name, array in snapshot.arrays.items():
+        assert snapshot.header['arrays'][name]['offset'] % ALIGNMENT == 0
+        if array.size:
+            assert array.ctypes.data % ALIGNMENT == 0, name
+
+
+def test_rewrite_replaces_the_file(path):
+    write_snapshot(path, sample_arrays(), generation=1)
+    before = file_identity(path)
+    write_snapshot(path, {'ids': np.arange(3)}, generation=2)
+    assert file_identity(path) != before
+    assert read_snapshot(path).generation == 2
+    assert os.listdir(os.path.dirname(path)) == ['corpus.snapshot']  # no temporary file left behind
+
+
+def rewrite_preamble(path, magic=MAGIC, version=FORMAT_VERSION):
+    with open(path, 'r+b') as f:
+        _, _, header_length = struct.unpack('<8sII', f.read(16))
+        f.seek(0)
+        f.write(struct.pack('<8sII', magic, version, header_length))
+
+
+def test_wrong_magic_is_rejected(path):
+    write_snapshot(path, sample_arrays(), generation=1)
+    rewrite_preamble(path, magic=b'NOTSNAP\0')
+    with pytest.raises(ValueError, match='is not a snapshot'):
+        read_snapshot(path)
+
+
+def test_wrong_format_version_is_rejected(path):
+    write_snapshot(path, sample_arrays(), generation=1)
+    rewrite_preamble(path, version=FORMAT_VERSION + 1)
+    with pytest.raises(ValueError, match='format version'):
+        read_snapshot(path)
+
+
+def test_truncated_file_is_rejected(path):
+    write_snapshot(path, sample_arrays(), generation=1)
+    with open(path, 'r+b') as f:
+        f.truncate(file_identity(path)[3] - 8)
+    with pytest.raises(ValueError, match='past the end'):
+        read_snapshot(path)
+
+
+def test_wrong_generation_or_model_is_rejected(path):
+    write_snapshot(path, sample_arrays(), generation=5, embedding_model=MODEL)
+    snapshot = read_snapshot(path)
+    snapshot.check(5, MODEL)
+    snapshot.check(5)
+    with pytest.raises(ValueError, match='generation 5, corpus is at 6'):
+        snapshot.check(6, MODEL)
+    with pytest.raises(ValueError, match='text-embedding-3-small, serving'):
+        snapshot.check(5, 'openai/text-embedding-3-large')
@@ -0,0 +1,42 @@
+"""Streaming search: retrieval errors surface before the response starts."""
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+import api_fastapi
+import pipeline
+
+RESULTS = [{'id': i, 'title': f'Doelzin {i}', 'description': 'rekenen', 'similarity': 0.9 - i / 10}
+           for i in range(3)]
+
+
+def embed_timeout(*args, **kwargs):
+    raise TimeoutError("No latency budget left to embed the query")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(api_fastapi, 'get_database', lambda: None)
+    monkeypatch.setattr(api_fastapi.config, 'QUERY_LOG', False)
+    return TestClient(api_fastapi.app)
+
+
+def test_retrieval_runs_before_the_first_event(monkeypatch):
+    monkeypatch.setattr(pipeline, 'search_combined', embed_timeout)
+    with pytest.raises(TimeoutError):
+        pipeline.stream_search(None, 'rekenen', rerank=False)
+
+
+def test_stream_answers_an_embedding_timeout_with_504(client, monkeypatch):
+    monkeypatch.setattr(pipeline, 'search_combined', embed_timeout)
+    response = client.get('/api/search/stream', params={'q': 'rekenen', 'rerank': 'false'})
+    assert response.status_code == 504
+    assert 'latency budget' in response.json()['detail']
+
+
+def test_stream_emits_results_then_final(client, monkeypatch):
+    monkeypatch.setattr(pipeline, 'search_combined', lambda *args, **kwargs: [dict(r) for r in RESULTS])
+    response = client.get('/api/search/stream', params={'q': 'rekenen', 'rerank': 'false', 'threshold': 0})
+    assert response.status_code == 200
+    events = [orjson.loads(line) for line in response.text.splitlines()]
+    assert [event['event'] for event in events] == ['results', 'final']
+    assert [r['id'] for r in events[-1]['results']] == [0, 1, 2]
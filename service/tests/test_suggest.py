@@ -0,0 +1,96 @@
+"""Typeahead suggestions: normalized prefix lookups, ranking and limits."""
+import pytest
+import suggest
+from suggest import MAX_LIMIT, Suggester, normalize, record_query
+
+
+class FakeDB:
+    """Answers the two corpus queries of Suggester.build."""
+
+    def __init__(self, doelzinnen, uitwerkingen):
+        self.doelzinnen = doelzinnen
+        self.uitwerkingen = uitwerkingen
+
+    def executesql(self, sql):
+        return self.doelzinnen if 'FROM doelzin' in sql else self.uitwerkingen
+
+    def commit(self):
+        pass
+
+
+DOELZINNEN = [
+    ('Geïntegreerd rekenen', 'De leerling past rekenen geïntegreerd toe in projecten', 'REK'),
+    ('Begrijpend lezen', 'De leerling leest teksten met begrip en reflecteert op teksten', 'NED'),
+    (None, 'De leerling reflecteert op het eigen leerproces', 'NED'),
+]
+UITWERKINGEN = [
+    ('Rekenen met breuken en rekenen met procenten',),
+    ('Reflecteren op geïntegreerde opdrachten',),
+    (None,),
+]
+
+
+@pytest.fixture
+def suggester(monkeypatch):
+    monkeypatch.setattr(suggest, 'get_generation', lambda db: 1)
+    monkeypatch.setattr(suggest, '_queries', {})
+    monkeypatch.setattr(suggest, '_popular', [])
+    return Suggester.build(FakeDB(DOELZINNEN, UITWERKINGEN))
+
+
+def texts(suggestions):
+    return [suggestion['text'] for suggestion in suggestions]
+
+
+@pytest.mark.parametrize('text', ['', '   ', '\t\n'])
+def test_empty_prefix_suggests_nothing(suggester, text):
+    assert suggester.suggest(text) == []
+
+
+def test_normalize_drops_case_accents_and_extra_whitespace():
+    assert normalize('  Geïntegreerd   REKENEN ') == 'geintegreerd rekenen'
+    assert normalize('Ça') == 'ca'
+
+
+@pytest.mark.parametrize('typed', ['geint', 'GEÏNT', 'Geïnt', '  geint'])
+def test_lookup_ignores_case_and_diacritics(suggester, typed):
+    # The display text keeps its accents
+    assert set(texts(suggester.suggest(typed))) == {'Geïntegreerd rekenen', 'geïntegreerd', 'geïntegreerde'}
+
+
+def test_terms_rank_by_the_number_of_texts_containing_them(suggester):
+    suggestions = suggester.suggest('re')
+    assert set(texts(suggestions[:2])) == {'reflecteert', 'rekenen'}
+    counts = [suggestion['count'] for suggestion in suggestions]
+    assert counts == sorted(counts, reverse=True)
+    # Longer prefixes are looked up in the sorted keys instead of the short lists
+    assert texts(suggester.suggest('reke')) == ['rekenen']
+
+
+def test_titles_and_prefixes_are_suggested_and_stopwords_are_not(suggester):
+    assert {'text': 'Begrijpend lezen', 'kind': 'title', 'count': 1} in suggester.suggest('begr')
+    assert {'text': 'NED', 'kind': 'prefix', 'count': 2} in suggester.suggest('ne')
+    assert suggester.suggest('met') == []
+
+
+def test_limit(suggester):
+    assert len(suggester.suggest('r', limit=2)) == 2
+    assert texts(suggester.suggest('r', limit=2)) == texts(suggester.suggest('r'))[:2]
+    assert suggester.suggest('r', limit=0) == []
+
+
+def test_limit_is_capped(monkeypatch):
+    monkeypatch.setattr(suggest, 'get_generation', lambda db: 1)
+    words = ' '.join(f'woord{i:03d}' for i in range(MAX_LIMIT + 20))
+    suggester = Suggester.build(FakeDB([(None, words, None)], []))
+    assert len(suggester.suggest('woord', limit=MAX_LIMIT + 20)) == MAX_LIMIT
+    assert len(suggester.suggest('wo', limit=MAX_LIMIT + 20)) == MAX_LIMIT
+
+
+def test_popular_queries_come_first(suggester, monkeypatch):
+    monkeypatch.setattr(suggest.config, 'SUGGEST_MIN_QUERY_COUNT', 2)
+    record_query('Rekenen  in projecten')
+    assert 'Rekenen in projecten' not in texts(suggester.suggest('reken'))
+    record_query('rekenen in projecten')
+    assert suggester.suggest('reken')[0] == {'text': 'Rekenen in projecten', 'kind': 'query', 'count': 2}
+    assert len(suggester.suggest('reken', limit=1)) == 1
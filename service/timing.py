@@ -0,0 +1,174 @@
+"""Per-stage timing: Server-Timing headers and Prometheus metrics.
+
+Code wraps its expensive steps in ``with stage('embed'):``. Every stage is
+observed in a Prometheus histogram; while an HTTP request is active (see
+``begin_request``) the durations are also collected per request and
+returned to the client in a ``Server-Timing`` header.
+
+With several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR to an empty,
+writable directory so ``/metrics`` aggregates all worker processes.
+"""
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Dict, Optional, Tuple
+from prometheus_client import (
+    CollectorRegistry, Counter, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+)
+
+# Stage durations range from sub-millisecond (qb_cosine) to many seconds (rerank)
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+STAGE_SECONDS = Histogram(
+    'slo_search_stage_seconds', 'Time spent in a search stage', ['stage'], buckets=BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    'slo_search_request_seconds', 'HTTP request duration', ['method', 'route', 'status'], buckets=BUCKETS
+)
+LLM_CALLS = Counter('slo_search_llm_calls_total', 'LLM rerank calls')
+DB_ROUNDTRIPS = Counter('slo_search_db_roundtrips_total', 'Database round-trips')
+CACHE_LOOKUPS = Counter('slo_search_cache_lookups_total', 'Cache lookups', ['cache', 'result'])
+EMBEDDING_BATCH_SIZE = Histogram(
+    'slo_search_embedding_batch_size', 'Queries per embeddings API request', buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+COALESCED = Counter(
+    'slo_search_coalesced_requests_total', 'Requests served by an identical in-flight computation', ['operation']
+)
+DEGRADATIONS = Counter(
+    'slo_search_degradations_total', 'Searches degraded to stay within their latency budget', ['degradation']
+)
+QUERY_LOG = Counter('slo_search_query_log_entries_total', 'Query log entries', ['result'])
+
+_request: ContextVar[Optional[dict]] = ContextVar('request_timings', default=None)
+
+
+def begin_request(profile=None) -> Token:
+    """Start collecting stage timings (and optionally a profile) for the current request."""
+    return _request.set({'start': time.perf_counter(), 'stages': {}, 'db': [0, 0.0], 'llm': 0, 'coalesced': False, 'profile': profile})
+
+
+def end_request(token: Token):
+    _request.reset(token)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as stage `name` (repeated stages add up per request)."""
+    timings = _request.get()
+    profile = timings['profile'] if timings is not None else None
+    if profile:
+        profile.enter()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(name).observe(elapsed)
+        if timings is not None:
+            timings['stages'][name] = timings['stages'].get(name, 0.0) + elapsed
+        if profile:
+            profile.exit()
+
+
+def count_llm_call():
+    LLM_CALLS.inc()
+    timings = _request.get()
+    if timings is not None:
+        timings['llm'] += 1
+
+
+def count_cache(cache: str, hit: bool):
+    CACHE_LOOKUPS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def observe_embedding_batch(size: int):
+    EMBEDDING_BATCH_SIZE.observe(size)
+
+
+def count_degradation(degradation: str):
+    DEGRADATIONS.labels(degradation).inc()
+
+
+def count_query_log(result: str):
+    """Count a query log entry as 'written', 'dropped' (queue full) or 'failed' (database error)."""
+    QUERY_LOG.labels(result).inc()
+
+
+def count_coalesced(operation: str):
+    COALESCED.labels(operation).inc()
+    timings = _request.get()
+    if timings is not None:
+        timings['coalesced'] = True
+
+
+def instrument_db(db):
+    """Count and time every statement the DAL sends to the database."""
+    adapter = db._adapter
+    if getattr(adapter, '_timed', False):
+        return db
+    execute = adapter.execute
+
+    def timed_execute(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return execute(*args, **kwargs)
+        finally:
+            DB_ROUNDTRIPS.inc()
+            elapsed = time.perf_counter() - start
+            timings = _request.get()
+            if timings is not None:
+                timings['db'][0] += 1
+                timings['db'][1] += elapsed
+                if timings['profile']:
+                    timings['profile'].record_sql(args[0] if args else kwargs.get('command'), elapsed)
+
+    adapter.execute = timed_execute
+    adapter._timed = True
+    return db
+
+
+def request_timings() -> Optional[Dict]:
+    """Stage durations (ms) and counters of the current request so far, or None outside a request."""
+    timings = _request.get()
+    if timings is None:
+        return None
+    roundtrips, db_seconds = timings['db']
+    return {
+        'stages': {name: round(seconds * 1000, 2) for name, seconds in timings['stages'].items()},
+        'db': {'roundtrips': roundtrips, 'ms': round(db_seconds * 1000, 2)},
+        'llm_calls': timings['llm'],
+        'coalesced': timings['coalesced'],
+        'total_ms': round((time.perf_counter() - timings['start']) * 1000, 2),
+    }
+
+
+def server_timing() -> str:
+    """Server-Timing header value for the current request."""
+    timings = _request.get()
+    if timings is None:
+        return ''
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings['stages'].items()]
+    roundtrips, db_seconds = timings['db']
+    if roundtrips:
+        entries.append(f'db;desc="{roundtrips} round-trips";dur={db_seconds * 1000:.1f}')
+    if timings['llm']:
+        entries.append(f'llm;desc="{timings["llm"]} calls"')
+    if timings['coalesced']:
+        entries.append('coalesced;desc="shared an identical in-flight search"')
+    entries.append(f"app;dur={(time.perf_counter() - timings['start']) * 1000:.1f}")
+    return ', '.join(entries)
+
+
+def observe_request(method: str, route: str, status: int, seconds: float):
+    REQUEST_SECONDS.labels(method, route, str(status)).observe(seconds)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Prometheus exposition of all metrics (aggregated over workers if configured)."""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,119 @@
+"""Background warmup at process start, and the readiness state behind /readyz.
+
+The API starts answering (and /healthz reports alive) immediately; this
+module connects to the database, warms the OpenRouter clients and, with
+SEARCH_ENGINE=memory, loads the in-memory index in a background thread.
+/readyz only reports ready once that has finished, so a load balancer
+sends traffic to warm workers only.
+"""
+import threading
+import time
+from typing import Dict, Tuple
+from config import config
+
+_checks = {
+    'database': False,
+    'clients': False,
+    'index': False,
+    'prewarm': False,
+}
+_errors: Dict[str, str] = {}
+_thread = None
+_started_at = None
+
+
+def _connect_database():
+    from database import get_database
+    from corpus import get_state
+    db = get_database()
+    try:
+        db.executesql("SELECT 1")
+        get_state(db)
+    finally:
+        db.commit()
+    return db
+
+
+def _warm_clients(db):
+    """Create the API clients and open a connection to OpenRouter."""
+    from embeddings import embed_query
+    from embedding_versions import get_active
+    from rerank import get_llm_client
+    get_llm_client()
+    version = get_active(db)
+    embed_query("warmup", model=version.model, dimensions=version.dimensions)
+
+
+def _retry(check: str, fn, retry_delay: float = 1.0, max_delay: float = 30.0):
+    """Call fn until it succeeds, backing off between attempts."""
+    delay = retry_delay
+    while True:
+        try:
+            result = fn()
+            _checks[check] = True
+            _errors.pop(check, None)
+            return result
+        except Exception as e:
+            _errors[check] = str(e)
+            print(f"⏳ {check} not ready yet ({e}); retrying in {delay:.0f}s")
+            time.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+
+def warm_up():
+    """Run all warmup steps; the database and index are retried until they succeed."""
+    db = _retry('database', _connect_database)
+
+    try:
+        _warm_clients(db)
+    except Exception as e:
+        # Not fatal: OpenRouter problems show up per request, the worker can still serve
+        _errors['clients'] = str(e)
+        print(f"⚠️  Warming OpenRouter clients failed: {e}")
+    _checks['clients'] = True
+
+    try:
+        # Built on first use otherwise; not a readiness check, search works without it
+        from suggest import load_suggester
+        load_suggester(db)
+    except Exception as e:
+        print(f"⚠️  Building suggestions failed: {e}")
+
+    if config.SEARCH_ENGINE == 'memory':
+        from index import load_index
+        _retry('index', lambda: load_index(db))
+    else:
+        _checks['index'] = True
+
+    try:
+        # After the index, so paginated result sets are built the way they will be served
+        import prewarm
+        prewarm.start(db)
+    except Exception as e:
+        # Not fatal: a cold cache is only slower
+        _errors['prewarm'] = str(e)
+        print(f"⚠️  Pre-warming caches failed: {e}")
+    _checks['prewarm'] = True
+
+    print(f"✅ Warmup complete in {time.monotonic() - _started_at:.1f}s")
+
+
+def start():
+    """Start warmup in a background thread (once per process)."""
+    global _thread, _started_at
+    if _thread is None:
+        _started_at = time.monotonic()
+        _thread = threading.Thread(target=warm_up, name='warmup', daemon=True)
+        _thread.start()
+    return _thread
+
+
+def readiness() -> Tuple[bool, Dict]:
+    """Whether this process is warm, with per-check details."""
+    ready = all(_checks.values())
+    return ready, {
+        'status': 'ready' if ready else 'warming',
+        'checks': dict(_checks),
+        'errors': dict(_errors),
+        'search_engine': config.SEARCH_ENGINE,
+    }
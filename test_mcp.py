@@ -1,5 +1,6 @@
 """Test MCP server functionality via HTTP streaming."""
 import asyncio
+import json
 import subprocess
 import re
 from mcp import ClientSession
@@ -76,6 +77,38 @@ async def test_mcp_server():
             })
             print(result.content[0].text)
             
+            print("\n=== Test 5: Paginate search results ===")
+            result = await session.call_tool('search', {
+                'query': 'fotosynthese',
+                'limit': 20,
+                'page_size': 5,
+                'rerank': False
+            })
+            page = json.loads(result.content[0].text)
+            print(f"Page 1: {len(page['results'])} of {page['total']} results")
+            if page['next_cursor']:
+                result = await session.call_tool('search', {
+                    'query': 'fotosynthese',
+                    'cursor': page['next_cursor'],
+                    'page_size': 5
+                })
+                page = json.loads(result.content[0].text)
+                print(f"Page 2: offset {page['offset']}, {len(page['results'])} results")
+            
+            print("\n=== Test 6: Filtered search ===")
+            result = await session.call_tool('search_goals', {
+                'query': 'wiskunde',
+                'limit': 5,
+                'soort': ['kerndoel']
+            })
+            print(result.content[0].text)
+            
+            print("\n=== Test 7: Get details for several goals ===")
+            result = await session.call_tool('get_goals', {
+                'doelzin_ids': [1, 2, 3]
+            })
+            print(result.content[0].text)
+            
             print("\n✓ All tests completed successfully!")
 
 